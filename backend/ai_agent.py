@@ -1,12 +1,20 @@
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
 from openai import OpenAI
 from dotenv import load_dotenv
+import llm_cache
+import metrics
 
 load_dotenv()
 
 # Configuration
 AI_PROVIDER = os.getenv("AI_PROVIDER", "openai").lower()
 LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
+# Max concurrent anomaly enrichment calls (shared by all requests) and per-call deadline in seconds
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "8"))
+
+_enrichment_pool = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm-enrich")
 
 if AI_PROVIDER == "ollama":
     # Ollama provides an OpenAI-compatible endpoint at /v1
@@ -19,13 +27,48 @@ if AI_PROVIDER == "ollama":
 else:
     client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-def generate_contextual_insight(view: str, data: dict):
+response_cache = llm_cache.from_env()
+
+INSIGHT_PARAMS = {"max_tokens": 2048, "temperature": 0.7}
+QUESTION_PARAMS = {"max_tokens": 1024, "temperature": 0.5}
+
+def _chat_completion(messages: list, use_cache: bool = True, **params) -> str:
+    """
+    Runs a chat completion and returns the stripped message text.
+    Identical (provider, model, messages, params) requests are served from the response cache
+    unless use_cache is False; a bypassed call still refreshes the cached entry.
+    """
+    cache_params = {k: v for k, v in params.items() if k != "timeout"}
+    key = llm_cache.LLMCache.make_key(AI_PROVIDER, LLM_MODEL, messages, **cache_params)
+    if response_cache is not None and use_cache:
+        cached = response_cache.get(key)
+        metrics.cache_lookup("llm", cached is not None)
+        if cached is not None:
+            return cached
+
+    with metrics.llm_call(AI_PROVIDER, LLM_MODEL):
+        response = client.chat.completions.create(model=LLM_MODEL, messages=messages, **params)
+    content = response.choices[0].message.content.strip()
+    if response_cache is not None:
+        response_cache.set(key, content)
+    return content
+
+def generate_contextual_insight(view: str, data: dict, use_cache: bool = True):
     """
     Generates a specialized AI insight based on the current view context.
     """
-    if AI_PROVIDER == "openai" and not os.getenv("OPENAI_API_KEY"):
-        return f"Insight: {view.capitalize()} data analysis is currently stable. (Simulation mode: Set OPENAI_API_KEY for real AI)"
+    if _simulation_mode():
+        return _simulated_insight(view)
+
+    try:
+        return _chat_completion(_insight_messages(view, data), use_cache=use_cache, **INSIGHT_PARAMS)
+    except Exception as e:
+        return f"Error generating {AI_PROVIDER} insight for {view}: {str(e)}"
 
+def _simulated_insight(view: str):
+    return f"Insight: {view.capitalize()} data analysis is currently stable. (Simulation mode: Set OPENAI_API_KEY for real AI)"
+
+def _insight_messages(view: str, data: dict):
     if view == "labor":
         prompt = f"""
         Analyze construction labor data:
@@ -129,22 +172,19 @@ def generate_contextual_insight(view: str, data: dict):
     else:
         prompt = "Provide a general construction management insight about operational efficiency."
 
-    try:
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[{"role": "system", "content": "You are a professional construction intelligence expert. Provide direct, objective data insights. NEVER use greetings (e.g., 'Hello', 'Dear PM'), email-style formatting, or signatures. Jump directly into the analysis."},
-                      {"role": "user", "content": prompt}],
-            max_tokens=2048,
-            temperature=0.7
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"Error generating {AI_PROVIDER} insight for {view}: {str(e)}"
+    return [{"role": "system", "content": "You are a professional construction intelligence expert. Provide direct, objective data insights. NEVER use greetings (e.g., 'Hello', 'Dear PM'), email-style formatting, or signatures. Jump directly into the analysis."},
+            {"role": "user", "content": prompt}]
 
-def ask_custom_question(view: str, data: dict, question: str, history: list = None):
+def ask_custom_question(view: str, data: dict, question: str, history: list = None, use_cache: bool = True):
     """
     Answers a specific user question based on the provided data context and conversation history.
     """
+    try:
+        return _chat_completion(_question_messages(view, data, question, history), use_cache=use_cache, **QUESTION_PARAMS)
+    except Exception as e:
+        return f"Error answering question: {str(e)}"
+
+def _question_messages(view: str, data: dict, question: str, history: list = None):
     context_summary = ""
     if view == "labor":
         context_summary = f"Labor Data: Billable={data.get('billable')}, Overhead={data.get('overhead')}, Projects={data.get('projects')}"
@@ -166,17 +206,50 @@ def ask_custom_question(view: str, data: dict, question: str, history: list = No
             
     # Add the current question
     messages.append({"role": "user", "content": question})
+    return messages
 
+def stream_insight(view: str, data: dict, question: str = None, history: list = None, use_cache: bool = True):
+    """
+    Streaming variant of generate_contextual_insight / ask_custom_question.
+    Yields text chunks as the model produces them. Shares the response cache with the
+    non-streaming calls: a cached answer is yielded in one chunk, and a completed stream is cached.
+    """
+    if question:
+        messages, params = _question_messages(view, data, question, history), QUESTION_PARAMS
+    elif _simulation_mode():
+        yield _simulated_insight(view)
+        return
+    else:
+        messages, params = _insight_messages(view, data), INSIGHT_PARAMS
+
+    key = llm_cache.LLMCache.make_key(AI_PROVIDER, LLM_MODEL, messages, **params)
+    if response_cache is not None and use_cache:
+        cached = response_cache.get(key)
+        metrics.cache_lookup("llm", cached is not None)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
     try:
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=messages,
-            max_tokens=1024,
-            temperature=0.5
-        )
-        return response.choices[0].message.content.strip()
+        with metrics.llm_call(AI_PROVIDER, LLM_MODEL):
+            stream = client.chat.completions.create(model=LLM_MODEL, messages=messages, stream=True, **params)
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    parts.append(token)
+                    yield token
     except Exception as e:
-        return f"Error answering question: {str(e)}"
+        if question:
+            yield f"Error answering question: {str(e)}"
+        else:
+            yield f"Error generating {AI_PROVIDER} insight for {view}: {str(e)}"
+        return
+
+    if response_cache is not None and parts:
+        response_cache.set(key, "".join(parts).strip())
 
 def generate_construction_insight(billable_hours: float, overhead_hours: float, projects: list):
     """
@@ -188,14 +261,14 @@ def generate_construction_insight(billable_hours: float, overhead_hours: float,
         "projects": projects
     })
 
-def analyze_anomaly(category: str, amount: float, history_avg: float, inflation_rate: float = 0.05):
+def analyze_anomaly(category: str, amount: float, history_avg: float, inflation_rate: float = 0.05, use_cache: bool = True):
     """
     Provides a natural language explanation and suggested action for a detected anomaly,
     considering the inflation baseline.
     Returns (explanation, suggested_action)
     """
-    if AI_PROVIDER == "openai" and not os.getenv("OPENAI_API_KEY"):
-        return f"Anomaly detected in {category}. Amount ${amount} exceeds the {inflation_rate*100}% inflation-adjusted baseline.", "Audit vendor for duplicate billing."
+    if _simulation_mode():
+        return anomaly_fallback(category, amount, inflation_rate)
 
     prompt = f"""
     The system detected an anomaly in construction expenses:
@@ -213,16 +286,62 @@ def analyze_anomaly(category: str, amount: float, history_avg: float, inflation_
     """
 
     try:
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[{"role": "system", "content": "You are a forensic construction accountant. Be direct and analytical. NEVER use greetings, headers, or email-like signatures. Provide data analysis directly."},
-                      {"role": "user", "content": prompt}],
-            max_tokens=150
+        content = _chat_completion(
+            [{"role": "system", "content": "You are a forensic construction accountant. Be direct and analytical. NEVER use greetings, headers, or email-like signatures. Provide data analysis directly."},
+             {"role": "user", "content": prompt}],
+            use_cache=use_cache,
+            max_tokens=150,
+            timeout=LLM_CALL_TIMEOUT
         )
-        content = response.choices[0].message.content.strip()
         if "ACTION:" in content:
             explanation, action = content.split("ACTION:", 1)
             return explanation.strip(), action.strip()
         return content, "Review with accounting department."
     except Exception as e:
         return f"Anomaly breakdown error: {str(e)}", "Data check required."
+
+def anomaly_fallback(category: str, amount: float, inflation_rate: float = 0.05):
+    """
+    Deterministic explanation used in simulation mode and when the LLM misses its deadline.
+    """
+    return f"Anomaly detected in {category}. Amount ${amount} exceeds the {inflation_rate*100}% inflation-adjusted baseline.", "Audit vendor for duplicate billing."
+
+def _simulation_mode():
+    return AI_PROVIDER == "openai" and not os.getenv("OPENAI_API_KEY")
+
+def analyze_anomalies(anomalies: list, inflation_rate: float = 0.05, timeout: float = None, use_cache: bool = True):
+    """
+    Enriches many anomalies concurrently, at most LLM_MAX_CONCURRENCY calls in flight.
+    Each anomaly is a dict with category, amount and history_avg.
+    Returns a list of (explanation, suggested_action) in the same order; anomalies whose call
+    has not finished within `timeout` seconds (default LLM_CALL_TIMEOUT) get the fallback text.
+    """
+    if not anomalies:
+        return []
+    if _simulation_mode():
+        return [anomaly_fallback(a['category'], a['amount'], inflation_rate) for a in anomalies]
+
+    timeout = LLM_CALL_TIMEOUT if timeout is None else timeout
+    futures = [
+        _enrichment_pool.submit(analyze_anomaly, a['category'], a['amount'], a['history_avg'], inflation_rate, use_cache)
+        for a in anomalies
+    ]
+    wait(futures, timeout=timeout)
+
+    results = []
+    for a, future in zip(anomalies, futures):
+        if future.done() and not future.cancelled():
+            results.append(future.result())
+        else:
+            # Not started yet calls are dropped; running ones finish in the background
+            future.cancel()
+            results.append(anomaly_fallback(a['category'], a['amount'], inflation_rate))
+    return results
+
+def cache_stats():
+    """
+    Returns hit/miss counters of the LLM response cache.
+    """
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
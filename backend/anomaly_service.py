@@ -1,42 +1,267 @@
-from typing import List, Dict
-import statistics
+from typing import List, Dict, Sequence
+import datetime
+import numpy as np
 
-def detect_expense_anomalies(invoices: List[Dict], annual_inflation: float = 0.05) -> List[Dict]:
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+DEFAULT_WINDOW_DAYS = 365
+# Flag if > Z_THRESHOLD standard deviations OR exceeds the inflation-adjusted baseline by SPIKE_MARGIN
+Z_THRESHOLD = 2.0
+SPIKE_MARGIN = 0.15
+MIN_HISTORY = 2
+
+def score_invoices(
+    category_codes: np.ndarray,
+    amounts: np.ndarray,
+    timestamps: np.ndarray,
+    window_days: float = DEFAULT_WINDOW_DAYS,
+    annual_inflation: float = 0.05,
+    min_history: int = MIN_HISTORY,
+) -> Dict[str, np.ndarray]:
+    """
+    Scores every invoice against a rolling per-category baseline in one vectorized pass.
+
+    The baseline of an invoice is built from the invoices of the same category dated
+    strictly before it and within `window_days`. Each historical amount is compounded
+    by `annual_inflation` for its age relative to the scored invoice, so older invoices
+    count at today's prices.
+
+    Takes columnar arrays (integer category codes, amounts, POSIX timestamps in seconds)
+    and returns arrays in the input order: history_count, history_avg (raw window mean),
+    inflation_adjusted_avg, stdev (of the adjusted history), z_score and anomaly (bool).
+    """
+    codes = np.asarray(category_codes, dtype=np.int64)
+    amounts = np.asarray(amounts, dtype=np.float64)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    n = len(amounts)
+    if n == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return {
+            "history_count": np.empty(0, dtype=np.int64),
+            "history_avg": empty,
+            "inflation_adjusted_avg": empty,
+            "stdev": empty,
+            "z_score": empty,
+            "anomaly": np.empty(0, dtype=bool),
+        }
+
+    # Combined (category, time) key: categories are separated by more than a full window,
+    # so a window search never crosses into the previous category's block
+    window = float(window_days) * 86400.0
+    t0 = timestamps.min()
+    span = (timestamps.max() - t0) + window + 1.0
+    key = (codes - codes.min()) * span + (timestamps - t0)
+
+    # Sort by key so each category's history is a contiguous, time-ordered block
+    order = np.argsort(key)
+    key = key[order]
+    a = amounts[order]
+    t = timestamps[order]
+
+    years = (t - t0) / SECONDS_PER_YEAR
+    growth = np.power(1.0 + annual_inflation, years)
+    # Deflate every amount to t0 prices; a window sum re-inflated by growth[i] equals the
+    # sum of each amount compounded by its age relative to invoice i
+    deflated = a / growth
+
+    zero = np.zeros(1)
+    raw_sum = np.concatenate((zero, np.cumsum(a)))
+    defl_sum = np.concatenate((zero, np.cumsum(deflated)))
+    defl_sq = np.concatenate((zero, np.cumsum(deflated * deflated)))
+
+    lo = np.searchsorted(key, key - window, side="left")
+    hi = np.searchsorted(key, key, side="left")
+
+    count = hi - lo
+    has_history = count > 0
+    safe_count = np.where(has_history, count, 1)
+
+    history_avg = np.where(has_history, (raw_sum[hi] - raw_sum[lo]) / safe_count, 0.0)
+    window_sum = defl_sum[hi] - defl_sum[lo]
+    adjusted_avg = np.where(has_history, window_sum / safe_count * growth, 0.0)
+
+    sample = count > 1
+    variance = np.where(
+        sample,
+        (defl_sq[hi] - defl_sq[lo] - window_sum * window_sum / safe_count) / np.where(sample, count - 1, 1),
+        0.0
+    )
+    stdev = np.sqrt(np.clip(variance, 0.0, None)) * growth
+
+    positive_stdev = stdev > 0
+    z_score = np.where(positive_stdev, (a - adjusted_avg) / np.where(positive_stdev, stdev, 1.0), 0.0)
+    anomaly = (count >= min_history) & (
+        (positive_stdev & (z_score > Z_THRESHOLD)) | (a > adjusted_avg * (1 + SPIKE_MARGIN))
+    )
+
+    # Scatter back to the caller's order
+    inverse = np.empty(n, dtype=np.int64)
+    inverse[order] = np.arange(n)
+    return {
+        "history_count": count[inverse],
+        "history_avg": history_avg[inverse],
+        "inflation_adjusted_avg": adjusted_avg[inverse],
+        "stdev": stdev[inverse],
+        "z_score": z_score[inverse],
+        "anomaly": anomaly[inverse],
+    }
+
+def score_against_running_stats(
+    category_codes: np.ndarray,
+    amounts: np.ndarray,
+    growth: np.ndarray,
+    count: np.ndarray,
+    mean: np.ndarray,
+    m2: np.ndarray,
+    raw_mean: np.ndarray,
+    min_history: int = MIN_HISTORY,
+) -> Dict[str, np.ndarray]:
     """
-    Identifies anomalies in expenses using a statistical approach (Z-score),
-    accounting for annual inflation as a baseline.
+    Scores a batch of new invoices against running per-category statistics, in one
+    vectorized pass, with the same result as feeding them one at a time through a
+    Welford update (see anomaly_stream).
+
+    `count`, `mean`, `m2` (over deflated amounts) and `raw_mean` are the persisted
+    statistics indexed by category code; `growth` is each invoice's price growth factor
+    relative to the statistics' base date. Each invoice is scored against the persisted
+    statistics combined with the earlier invoices of its category in this batch, so
+    callers pass the batch in date order.
+
+    Returns per-invoice arrays in the input order (history_count, history_avg,
+    inflation_adjusted_avg, stdev, z_score, anomaly) and the category statistics after the
+    whole batch (count, mean, m2, raw_mean, indexed by code like the inputs).
     """
+    codes = np.asarray(category_codes, dtype=np.int64)
+    amounts = np.asarray(amounts, dtype=np.float64)
+    growth = np.asarray(growth, dtype=np.float64)
+    n = len(amounts)
+
+    # Stable sort keeps the caller's (date) order inside each category block
+    order = np.argsort(codes, kind="stable")
+    c = codes[order]
+    a = amounts[order]
+    g = growth[order]
+    x = a / g
+
+    positions = np.arange(n)
+    starts = np.searchsorted(c, c, side="left")
+    n0 = np.asarray(count, dtype=np.float64)[c]
+    m0 = np.asarray(mean, dtype=np.float64)[c]
+    m2_0 = np.asarray(m2, dtype=np.float64)[c]
+    raw0 = np.asarray(raw_mean, dtype=np.float64)[c]
+
+    # Sums are taken around a per-category center (the persisted mean, or the first new
+    # value for an empty category) to keep the sum-of-squares form well conditioned
+    center = np.where(n0 > 0, m0, x[starts])
+    y = x - center
+    zero = np.zeros(1)
+    sum_y = np.concatenate((zero, np.cumsum(y)))
+    sum_y2 = np.concatenate((zero, np.cumsum(y * y)))
+    sum_raw = np.concatenate((zero, np.cumsum(a)))
+
+    def combined(end):
+        # Statistics over the persisted history plus this batch's invoices [start, end)
+        k = end - starts
+        total = n0 + k
+        safe_total = np.where(total > 0, total, 1.0)
+        s1 = sum_y[end] - sum_y[starts] + n0 * (m0 - center)
+        s2 = sum_y2[end] - sum_y2[starts] + m2_0 + n0 * (m0 - center) ** 2
+        combined_mean = center + s1 / safe_total
+        combined_m2 = np.clip(s2 - s1 * s1 / safe_total, 0.0, None)
+        combined_raw = (n0 * raw0 + sum_raw[end] - sum_raw[starts]) / safe_total
+        return total, combined_mean, combined_m2, combined_raw
+
+    total, before_mean, before_m2, before_raw = combined(positions)
+    has_history = total > 0
+    adjusted_avg = np.where(has_history, before_mean * g, np.nan)
+    history_avg = np.where(has_history, before_raw, np.nan)
+    sample = total > 1
+    stdev = np.where(sample, np.sqrt(before_m2 / np.where(sample, total - 1, 1)) * g, 0.0)
+    positive_stdev = stdev > 0
+    z_score = np.where(positive_stdev, (a - adjusted_avg) / np.where(positive_stdev, stdev, 1.0), 0.0)
+    anomaly = (total >= min_history) & (
+        (positive_stdev & (z_score > Z_THRESHOLD)) | (a > adjusted_avg * (1 + SPIKE_MARGIN))
+    )
+
+    # Final statistics: the last invoice of each category block includes the whole batch
+    last = np.flatnonzero(np.append(c[1:] != c[:-1], True)) if n else np.empty(0, dtype=np.int64)
+    after_total, after_mean, after_m2, after_raw = combined(positions + 1)
+    stats = {
+        "count": np.array(count, dtype=np.int64),
+        "mean": np.array(mean, dtype=np.float64),
+        "m2": np.array(m2, dtype=np.float64),
+        "raw_mean": np.array(raw_mean, dtype=np.float64),
+    }
+    stats["count"][c[last]] = after_total[last]
+    stats["mean"][c[last]] = after_mean[last]
+    stats["m2"][c[last]] = after_m2[last]
+    stats["raw_mean"][c[last]] = after_raw[last]
+
+    inverse = np.empty(n, dtype=np.int64)
+    inverse[order] = positions
+    return {
+        "history_count": total[inverse].astype(np.int64),
+        "history_avg": history_avg[inverse],
+        "inflation_adjusted_avg": adjusted_avg[inverse],
+        "stdev": stdev[inverse],
+        "z_score": z_score[inverse],
+        "anomaly": anomaly[inverse],
+        "stats": stats,
+    }
+
+def detect_anomalies_columnar(
+    category_codes: np.ndarray,
+    amounts: np.ndarray,
+    timestamps: np.ndarray,
+    categories: Sequence[str],
+    window_days: float = DEFAULT_WINDOW_DAYS,
+    annual_inflation: float = 0.05,
+) -> List[Dict]:
+    """
+    Runs `score_invoices` and returns one result dict per flagged invoice, in input order.
+    `categories[code]` gives the category name for each code.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    scores = score_invoices(category_codes, amounts, timestamps, window_days, annual_inflation)
+    flagged = np.flatnonzero(scores["anomaly"])
+    codes = np.asarray(category_codes)[flagged]
+
     anomalies = []
-    # Group by category
-    categories = {}
-    for inv in invoices:
-        cat = inv['category']
-        if cat not in categories:
-            categories[cat] = []
-        categories[cat].append(inv['amount'])
-
-    for cat, amounts in categories.items():
-        if len(amounts) < 2:
-            continue
-        
-        avg = statistics.mean(amounts)
-        stdev = statistics.stdev(amounts) if len(amounts) > 1 else 0
-        
-        # Inflation-adjusted average baseline
-        # (Assuming the data represents a spread within a year)
-        inflation_adjusted_avg = avg * (1 + annual_inflation)
-        
-        for amount in amounts:
-            # Flag if > 2 standard deviations OR exceeds (avg + inflation + 15% margin)
-            # This makes the detection more robust against standard macroeconomic trends
-            if (stdev > 0 and (amount - avg) / stdev > 2) or (amount > avg * (1 + annual_inflation + 0.15)):
-                anomalies.append({
-                    "category": cat,
-                    "amount": amount,
-                    "history_avg": avg,
-                    "inflation_adjusted_avg": inflation_adjusted_avg,
-                    "spike_percentage": round(((amount - avg) / avg) * 100, 1),
-                    "description": f"Significant spike in {cat} expenses, exceeding the {annual_inflation*100}% annual inflation baseline."
-                })
-    
+    for idx, code in zip(flagged.tolist(), codes.tolist()):
+        cat = categories[code]
+        amount = float(amounts[idx])
+        avg = float(scores["history_avg"][idx])
+        anomalies.append({
+            "index": idx,
+            "category": cat,
+            "amount": amount,
+            "history_avg": avg,
+            "inflation_adjusted_avg": float(scores["inflation_adjusted_avg"][idx]),
+            "spike_percentage": round(((amount - avg) / avg) * 100, 1) if avg else 0.0,
+            "description": f"Significant spike in {cat} expenses, exceeding the {annual_inflation*100}% annual inflation baseline."
+        })
     return anomalies
+
+def to_columns(invoices: List[Dict]):
+    """
+    Converts invoice dicts ({category, amount, date}) into (codes, amounts, timestamps, categories).
+    Invoices without a date are treated as dated now.
+    """
+    now = datetime.datetime.utcnow().timestamp()
+    categories, codes = np.unique(np.array([inv['category'] for inv in invoices], dtype=object).astype(str), return_inverse=True)
+    amounts = np.fromiter((inv['amount'] for inv in invoices), dtype=np.float64, count=len(invoices))
+    timestamps = np.fromiter(
+        (inv['date'].timestamp() if inv.get('date') else now for inv in invoices),
+        dtype=np.float64,
+        count=len(invoices)
+    )
+    return codes, amounts, timestamps, categories.tolist()
+
+def detect_expense_anomalies(invoices: List[Dict], annual_inflation: float = 0.05, window_days: float = DEFAULT_WINDOW_DAYS) -> List[Dict]:
+    """
+    Identifies anomalies in expenses using a statistical approach (Z-score) against a rolling,
+    inflation-compounded per-category baseline. See `score_invoices`.
+    """
+    if not invoices:
+        return []
+    codes, amounts, timestamps, categories = to_columns(invoices)
+    return detect_anomalies_columnar(codes, amounts, timestamps, categories, window_days, annual_inflation)
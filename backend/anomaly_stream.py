@@ -0,0 +1,171 @@
+"""
+Streaming anomaly scoring for invoices.
+
+Keeps running per-category statistics (count, mean, M2 via Welford's online update) in
+`invoice_category_stats`. Every Invoice inserted through the ORM is scored once, at flush
+time, against the statistics of the invoices inserted before it; the flag and baseline
+are stored on the row and the statistics are updated in the same transaction. Amounts are
+deflated to EPOCH prices before entering the statistics, so the baseline is compounded
+to the invoice date when scoring (same rule as anomaly_service.score_invoices).
+
+Updates and deletes do not rescore. Run `python anomaly_stream.py rescore` to rebuild the
+statistics and flags from scratch, e.g. after changing the inflation rate.
+"""
+import os
+import sys
+import math
+import datetime
+from dotenv import load_dotenv
+from sqlalchemy import event, select, insert
+from sqlalchemy.orm import Session
+import models
+import anomaly_service
+
+load_dotenv()
+
+ANNUAL_INFLATION = float(os.getenv("ESTIMATED_ANNUAL_INFLATION", "0.05"))
+EPOCH = datetime.datetime(2020, 1, 1)
+
+stats_table = models.InvoiceCategoryStats.__table__
+
+def growth(date: datetime.datetime, annual_inflation: float = ANNUAL_INFLATION) -> float:
+    """Price growth factor between EPOCH and `date`."""
+    years = (date - EPOCH).total_seconds() / anomaly_service.SECONDS_PER_YEAR
+    return (1.0 + annual_inflation) ** years
+
+def score(stats: models.InvoiceCategoryStats, amount: float, date: datetime.datetime):
+    """
+    Scores one invoice against the current category statistics.
+    Returns (anomaly_flag, history_avg, inflation_adjusted_avg, spike_percentage).
+    """
+    count = stats.count or 0
+    if count == 0:
+        return False, None, None, None
+
+    factor = growth(date)
+    adjusted_avg = stats.mean * factor
+    stdev = math.sqrt(max(stats.m2, 0.0) / (count - 1)) * factor if count > 1 else 0.0
+    z_score = (amount - adjusted_avg) / stdev if stdev > 0 else 0.0
+    anomaly = count >= anomaly_service.MIN_HISTORY and (
+        z_score > anomaly_service.Z_THRESHOLD or amount > adjusted_avg * (1 + anomaly_service.SPIKE_MARGIN)
+    )
+    history_avg = stats.raw_mean
+    spike_percentage = round(((amount - history_avg) / history_avg) * 100, 1) if history_avg else 0.0
+    return anomaly, history_avg, adjusted_avg, spike_percentage
+
+def update(stats: models.InvoiceCategoryStats, amount: float, date: datetime.datetime):
+    """Welford online update with one new invoice."""
+    count = (stats.count or 0) + 1
+    value = amount / growth(date)
+    delta = value - (stats.mean or 0.0)
+    mean = (stats.mean or 0.0) + delta / count
+    stats.m2 = (stats.m2 or 0.0) + delta * (value - mean)
+    stats.mean = mean
+    stats.raw_mean = (stats.raw_mean or 0.0) + (amount - (stats.raw_mean or 0.0)) / count
+    stats.count = count
+
+def description(category: str) -> str:
+    return f"Significant spike in {category} expenses, exceeding the {ANNUAL_INFLATION*100}% annual inflation baseline."
+
+def create_missing_stats(connection, categories):
+    """
+    Inserts empty statistics rows for categories that have none yet, skipping existing ones.
+    Returns the number of rows inserted (-1 when the driver cannot tell, i.e. maybe some).
+    """
+    rows = [{"category": category, "count": 0, "mean": 0.0, "m2": 0.0, "raw_mean": 0.0} for category in categories]
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        return connection.execute(upsert(stats_table).on_conflict_do_nothing(index_elements=["category"]), rows).rowcount
+    else:
+        existing = set(connection.execute(
+            select(stats_table.c.category).where(stats_table.c.category.in_(categories))
+        ).scalars())
+        missing = [row for row in rows if row["category"] not in existing]
+        if missing:
+            connection.execute(insert(stats_table), missing)
+        return len(missing)
+
+def load_stats(session: Session, categories):
+    """
+    Returns {category: InvoiceCategoryStats} for the given categories, locked for update so
+    concurrent writers serialize per category. Missing rows are created first (see
+    create_missing_stats): two transactions bringing the same new category both get the
+    row, one after the other, instead of both inserting it and one failing on the key.
+    """
+    categories = sorted(set(categories))
+    if not categories:
+        return {}
+    create_missing_stats(session.connection(), categories)
+    existing = session.query(models.InvoiceCategoryStats).filter(
+        models.InvoiceCategoryStats.category.in_(categories)
+    ).with_for_update().populate_existing().all()
+    return {s.category: s for s in existing}
+
+def score_and_update(session: Session, invoices):
+    """Scores the given Invoice objects in date order and folds them into the statistics."""
+    now = datetime.datetime.utcnow()
+    invoices = sorted(invoices, key=lambda inv: inv.date or now)
+    stats = load_stats(session, [inv.category for inv in invoices])
+    _apply(invoices, stats)
+
+def _apply(invoices, stats):
+    now = datetime.datetime.utcnow()
+    for inv in invoices:
+        date = inv.date or now
+        amount = inv.amount or 0.0
+        category_stats = stats[inv.category]
+        flag, history_avg, adjusted_avg, spike = score(category_stats, amount, date)
+        inv.anomaly_flag = flag
+        inv.anomaly_description = description(inv.category) if flag else None
+        inv.history_avg = history_avg
+        inv.inflation_adjusted_avg = adjusted_avg
+        inv.spike_percentage = spike
+        update(category_stats, amount, date)
+
+@event.listens_for(Session, "before_flush")
+def _score_new_invoices(session, flush_context, instances):
+    new_invoices = [obj for obj in session.new if isinstance(obj, models.Invoice) and obj.category is not None]
+    if new_invoices:
+        score_and_update(session, new_invoices)
+
+def rescore(db: Session, batch_size: int = 5000):
+    """Rebuilds the category statistics and every invoice's flag by replaying invoices in date order."""
+    db.query(models.InvoiceCategoryStats).delete()
+    db.flush()
+    ids = [row.id for row in db.query(models.Invoice.id).filter(
+        models.Invoice.category.isnot(None)
+    ).order_by(models.Invoice.date.asc(), models.Invoice.id.asc())]
+
+    stats = {}
+    for start in range(0, len(ids), batch_size):
+        batch_ids = ids[start:start + batch_size]
+        by_id = {inv.id: inv for inv in db.query(models.Invoice).filter(models.Invoice.id.in_(batch_ids))}
+        batch = [by_id[i] for i in batch_ids]
+        missing = {inv.category for inv in batch} - set(stats)
+        if missing:
+            stats.update(load_stats(db, missing))
+        _apply(batch, stats)
+        db.flush()
+    db.commit()
+
+if __name__ == "__main__":
+    from database import SessionLocal
+    import migrate
+
+    if len(sys.argv) < 2 or sys.argv[1] != "rescore":
+        print("Usage: python anomaly_stream.py rescore")
+        sys.exit(1)
+
+    migrate.upgrade()
+    db = SessionLocal()
+    try:
+        print("Rescoring invoices...")
+        rescore(db)
+        flagged = db.query(models.Invoice).filter(models.Invoice.anomaly_flag == True).count()
+        print(f"Done! {flagged} invoices flagged.")
+    finally:
+        db.close()
@@ -0,0 +1,301 @@
+"""
+Endpoint benchmark suite with regression gates.
+
+`run` generates a synthetic dataset per scale factor (synthetic_data, cached in
+bench_data/) with history up to a fixed as-of date, then benchmarks every endpoint of main.py in-process against a fresh copy of
+it, one worker process per scale so each gets its own engines. Per endpoint it records
+p50/p95 latency, SQL statements per request and the peak Python memory allocated while
+serving one request (tracemalloc). The response cache is off and the LLM is in simulation
+mode, so the numbers measure the endpoint's own work. Date-windowed requests use windows
+ending on the as-of date, so runs on different days query the same data.
+
+`compare` checks a result file against a baseline and exits non-zero when an endpoint got
+slower or allocates more by more than the threshold, or issues more queries at all. It
+refuses to compare runs made on different datasets (seed or as-of date).
+
+Usage:
+  python bench_endpoints.py run [--scales 0.1,1] [--iterations 20] [--seed 42] [--as-of YYYY-MM-DD] [--output FILE]
+  python bench_endpoints.py compare <baseline.json> <results.json> [--threshold 0.2]
+
+Typical use: `run --output baseline.json` before a change, `run --output after.json` with
+it, then `compare baseline.json after.json`.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent
+DATA_DIR = BACKEND_DIR / "bench_data"
+
+DEFAULT_SCALES = "0.1,1"
+# Last day of the generated history (synthetic_data --as-of); fixed, so baselines stay comparable
+DEFAULT_AS_OF = datetime.date(2026, 1, 31)
+DEFAULT_ITERATIONS = 20
+# Per-endpoint time budget; slow endpoints get fewer (but at least MIN_ITERATIONS) runs
+TIME_BUDGET_SECONDS = 10.0
+MIN_ITERATIONS = 3
+
+DEFAULT_THRESHOLD = 0.2
+# Differences below these are noise, whatever the relative change
+MIN_LATENCY_DELTA_MS = 2.0
+MIN_MEMORY_DELTA_KIB = 256
+
+TIMESHEET_CSV = "project_id,employee_id,date,hours,payroll_code,is_billable\n" + "".join(
+    f"{{project_id}},EMP{i % 50:05d},2026-01-{i % 28 + 1:02d},8,REG,true\n" for i in range(1000)
+)
+INVOICE_CSV = "vendor,category,amount,date\n" + "".join(
+    f"Bench Vendor {i},Fuel,{3000 + i}.00,2026-01-{i % 28 + 1:02d}\n" for i in range(500)
+)
+
+def endpoint_requests(project_id, event_id, as_of):
+    """(name, request kwargs for TestClient.request) for every endpoint of main.py."""
+    window = f"start_date={as_of - datetime.timedelta(days=90)}&end_date={as_of}"
+    return [
+        ("GET /", {"method": "GET", "url": "/"}),
+        ("GET /labor/productivity", {"method": "GET", "url": "/labor/productivity"}),
+        ("GET /labor/employees", {"method": "GET", "url": "/labor/employees"}),
+        ("GET /labor/employees?project_id", {"method": "GET", "url": f"/labor/employees?project_id={project_id}"}),
+        ("GET /labor/payroll-estimation", {"method": "GET", "url": "/labor/payroll-estimation"}),
+        ("GET /labor/union-reconciliation", {"method": "GET", "url": "/labor/union-reconciliation"}),
+        ("GET /finance/variance", {"method": "GET", "url": "/finance/variance"}),
+        ("GET /finance/trends", {"method": "GET", "url": "/finance/trends"}),
+        ("GET /finance/project-analytics", {"method": "GET", "url": "/finance/project-analytics"}),
+        ("GET /finance/project-analytics?window", {"method": "GET", "url": f"/finance/project-analytics?{window}"}),
+        ("GET /automation/anomalies", {"method": "GET", "url": "/automation/anomalies"}),
+        ("GET /automation/process-metrics", {"method": "GET", "url": "/automation/process-metrics"}),
+        ("GET /reporting/projects", {"method": "GET", "url": "/reporting/projects"}),
+        ("GET /reporting/projects?since", {"method": "GET", "url": "/reporting/projects?since=0"}),
+        ("GET /reporting/projects/{id}/events", {"method": "GET", "url": f"/reporting/projects/{project_id}/events"}),
+        ("GET /reporting/projects/{id}/media", {"method": "GET", "url": f"/reporting/projects/{project_id}/media"}),
+        ("GET /agent/config", {"method": "GET", "url": "/agent/config"}),
+        ("GET /agent/cache", {"method": "GET", "url": "/agent/cache"}),
+        ("GET /cache/responses", {"method": "GET", "url": "/cache/responses"}),
+        ("POST /agent/insights?view=labor", {"method": "POST", "url": "/agent/insights?view=labor"}),
+        ("POST /agent/insights?view=automation", {"method": "POST", "url": "/agent/insights?view=automation"}),
+        ("POST /agent/insights?view=finance", {"method": "POST", "url": "/agent/insights?view=finance"}),
+        ("POST /agent/insights/stream", {"method": "POST", "url": "/agent/insights/stream?view=labor"}),
+        ("POST /reporting/projects", {"method": "POST", "url": "/reporting/projects", "json": {
+            "name": "Bench Project", "location": "Denver, CO", "manager": "Bench", "budget_hours": 1000.0
+        }}),
+        ("POST /reporting/projects/{id}/events", {"method": "POST", "url": f"/reporting/projects/{project_id}/events", "json": {
+            "title": "Bench Inspection", "date": f"{as_of}T09:00:00", "event_type": "inspection"
+        }}),
+        ("PATCH /reporting/events/{id}", {"method": "PATCH", "url": f"/reporting/events/{event_id}", "json": {"title": "Bench Inspection (updated)"}}),
+        ("POST /reporting/projects/{id}/media", {"method": "POST", "url": f"/reporting/projects/{project_id}/media", "json": {
+            "filename": "bench.pdf", "file_type": "document", "url": "https://example.com/docs/bench.pdf"
+        }}),
+        ("POST /reporting/projects/{id}/upload", {"method": "POST", "url": f"/reporting/projects/{project_id}/upload", "files": {
+            "file": ("bench.pdf", b"%PDF-1.4 bench\n" * 4096, "application/pdf")
+        }}),
+        ("POST /labor/timesheets/import", {"method": "POST", "url": "/labor/timesheets/import", "files": {
+            "file": ("bench.csv", TIMESHEET_CSV.format(project_id=project_id).encode(), "text/csv")
+        }}),
+        ("POST /automation/invoices/import", {"method": "POST", "url": "/automation/invoices/import", "files": {
+            "file": ("bench.csv", INVOICE_CSV.encode(), "text/csv")
+        }}),
+    ]
+
+def _measure(client, counter, kwargs, iterations):
+    """Latencies (ms) and per-request query counts of up to `iterations` requests, after one warm-up."""
+    response = client.request(**kwargs)
+    if response.status_code >= 400:
+        raise RuntimeError(f"{kwargs['method']} {kwargs['url']}: HTTP {response.status_code} {response.text[:200]}")
+    latencies, queries = [], []
+    deadline = time.perf_counter() + TIME_BUDGET_SECONDS
+    for i in range(iterations):
+        if i >= MIN_ITERATIONS and time.perf_counter() > deadline:
+            break
+        counter["n"] = 0
+        start = time.perf_counter()
+        client.request(**kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(counter["n"])
+
+    # Memory is measured on one extra request; tracemalloc slows everything down
+    tracemalloc.start()
+    client.request(**kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "queries": int(np.median(queries)),
+        "peak_kib": round(peak / 1024, 1),
+        "iterations": len(latencies),
+    }
+
+def worker(iterations, as_of):
+    """Benchmarks every endpoint against DATABASE_URL; prints the results as JSON on stdout."""
+    # Anything the app prints goes to stderr, stdout carries only the results
+    with contextlib.redirect_stdout(sys.stderr):
+        results = _benchmark_endpoints(iterations, as_of)
+    json.dump(results, sys.stdout)
+
+def _benchmark_endpoints(iterations, as_of):
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, func, select
+    import main, models, ai_agent
+    from database import engine, async_engine, SessionLocal
+
+    # Never call an LLM: the agent endpoints return their deterministic fallbacks
+    ai_agent._simulation_mode = lambda: True
+
+    counter = {"n": 0}
+    def count(*args):
+        counter["n"] += 1
+    event.listen(engine, "before_cursor_execute", count)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+
+    db = SessionLocal()
+    try:
+        project_id = db.execute(select(func.min(models.Project.id))).scalar()
+        bench_event = models.ProjectEvent(project_id=project_id, title="Bench Inspection",
+                                          date=datetime.datetime.combine(as_of, datetime.time(9)),
+                                          event_type="inspection")
+        db.add(bench_event)
+        db.commit()
+        event_id = bench_event.id
+    finally:
+        db.close()
+
+    results = {}
+    with TestClient(main.app) as client:
+        for name, kwargs in endpoint_requests(project_id, event_id, as_of):
+            results[name] = _measure(client, counter, kwargs, iterations)
+            print(f"  {name:45s} p50 {results[name]['p50_ms']:9.2f} ms  {results[name]['queries']:4d} queries")
+    return results
+
+def dataset(scale, seed, as_of):
+    """Path of the generated dataset for (scale, seed, as_of), generating it if needed."""
+    DATA_DIR.mkdir(exist_ok=True)
+    path = DATA_DIR / f"scale-{scale:g}-seed-{seed}-{as_of}.db"
+    if not path.exists():
+        print(f"Generating dataset at scale {scale:g}...", file=sys.stderr)
+        partial = path.with_suffix(".partial")
+        partial.unlink(missing_ok=True)
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{partial}")
+        subprocess.run([sys.executable, "synthetic_data.py", f"{scale:g}", str(seed), "--as-of", str(as_of)],
+                       cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+        os.replace(partial, path)
+    return path
+
+def run(scales, iterations, seed, as_of=DEFAULT_AS_OF):
+    results = {}
+    for scale in scales:
+        source = dataset(scale, seed, as_of)
+        print(f"Benchmarking scale {scale:g}...", file=sys.stderr)
+        with tempfile.TemporaryDirectory() as workdir:
+            # Writes (and uploads, relative to the working directory) go to throwaway copies
+            database = Path(workdir) / "bench.db"
+            shutil.copy(source, database)
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{database}",
+                RESPONSE_CACHE_ENABLED="false",
+                AI_PROVIDER=os.getenv("AI_PROVIDER", "ollama"),
+                PYTHONPATH=str(BACKEND_DIR),
+            )
+            output = subprocess.run(
+                [sys.executable, str(BACKEND_DIR / "bench_endpoints.py"), "worker", "--iterations", str(iterations),
+                 "--as-of", str(as_of)],
+                cwd=workdir, env=env, check=True, stdout=subprocess.PIPE
+            ).stdout
+        results[f"{scale:g}"] = json.loads(output)
+    return {
+        "created": datetime.datetime.utcnow().isoformat(timespec="seconds"),
+        "seed": seed,
+        "as_of": str(as_of),
+        "iterations": iterations,
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+
+def dataset_mismatch(baseline, current):
+    """Why the two result files were measured on different datasets, or None if they were not."""
+    for key in ("seed", "as_of"):
+        if baseline.get(key) != current.get(key):
+            return f"{key} differs: baseline {baseline.get(key)}, results {current.get(key)}"
+    return None
+
+def compare(baseline, current, threshold):
+    """Returns the regressions of `current` against `baseline` as printable lines."""
+    regressions = []
+    for scale, endpoints in current["results"].items():
+        for name, now in endpoints.items():
+            before = baseline["results"].get(scale, {}).get(name)
+            if before is None:
+                continue
+            label = f"[scale {scale}] {name}"
+            for metric in ("p50_ms", "p95_ms"):
+                if now[metric] > before[metric] * (1 + threshold) and now[metric] - before[metric] > MIN_LATENCY_DELTA_MS:
+                    regressions.append(f"{label}: {metric} {before[metric]:.2f} -> {now[metric]:.2f}")
+            if now["queries"] > before["queries"]:
+                regressions.append(f"{label}: queries {before['queries']} -> {now['queries']}")
+            if now["peak_kib"] > before["peak_kib"] * (1 + threshold) and now["peak_kib"] - before["peak_kib"] > MIN_MEMORY_DELTA_KIB:
+                regressions.append(f"{label}: peak_kib {before['peak_kib']:.0f} -> {now['peak_kib']:.0f}")
+    return regressions
+
+def print_table(report):
+    for scale, endpoints in report["results"].items():
+        print(f"=== Scale {scale} ===")
+        print(f"{'endpoint':45s} {'p50 ms':>9s} {'p95 ms':>9s} {'queries':>8s} {'peak KiB':>9s}")
+        for name, r in endpoints.items():
+            print(f"{name:45s} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['queries']:8d} {r['peak_kib']:9.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Endpoint benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="benchmark every endpoint at each scale")
+    run_parser.add_argument("--scales", default=DEFAULT_SCALES, help="comma-separated scale factors")
+    run_parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--as-of", type=datetime.date.fromisoformat, default=DEFAULT_AS_OF,
+                            help=f"last day of the generated history (default {DEFAULT_AS_OF})")
+    run_parser.add_argument("--output", default="bench_results.json")
+    compare_parser = commands.add_parser("compare", help="flag regressions against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="allowed relative slowdown / memory growth (0.2 = 20%%)")
+    worker_parser = commands.add_parser("worker")
+    worker_parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    worker_parser.add_argument("--as-of", type=datetime.date.fromisoformat, default=DEFAULT_AS_OF)
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        worker(args.iterations, args.as_of)
+    elif args.command == "run":
+        report = run([float(s) for s in args.scales.split(",")], args.iterations, args.seed, args.as_of)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print_table(report)
+        print(f"\nResults written to {args.output}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.results) as f:
+            current = json.load(f)
+        mismatch = dataset_mismatch(baseline, current)
+        if mismatch:
+            print(f"Cannot compare runs on different datasets ({mismatch}); re-run the baseline.")
+            sys.exit(1)
+        regressions = compare(baseline, current, args.threshold)
+        for line in regressions:
+            print("REGRESSION " + line)
+        if regressions:
+            print(f"\n{len(regressions)} regressions beyond {args.threshold:.0%}.")
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}.")
+
+if __name__ == "__main__":
+    main()
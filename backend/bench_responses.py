@@ -0,0 +1,90 @@
+"""
+Serialization time and bytes on the wire of the large read endpoints, before and after the
+fast JSON path (fast_json) and gzip compression, on the data in the configured database.
+
+before: FastAPI's default path, response_model validation plus Pydantic serialization
+        (jsonable_encoder + json.dumps for endpoints without a response_model), uncompressed.
+after:  orjson for the endpoints that opt in to fast_json (the rest unchanged), gzipped
+        like GZipMiddleware does above its minimum size.
+
+Usage: python bench_responses.py
+"""
+import asyncio
+import gzip
+import json
+import os
+import time
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter
+import main, fast_json, labor_service, finance_service, reporting_service
+from database import AsyncSessionLocal
+
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+GZIP_COMPRESS_LEVEL = int(os.getenv("GZIP_COMPRESS_LEVEL", "6"))
+
+async def _employees(db):
+    employees = await labor_service.get_employee_details_by_project(db)
+    return {"employee_count": len(employees), "employees": employees}
+
+async def _reporting_page(db):
+    projects, _ = await reporting_service.get_projects_page(db, limit=reporting_service.MAX_PAGE_SIZE)
+    return projects
+
+# (path, loader, uses fast_json)
+ENDPOINTS = [
+    ("/reporting/projects", _reporting_page, True),
+    ("/labor/employees", _employees, True),
+    ("/finance/project-analytics", finance_service.get_project_financial_analytics, True),
+    ("/labor/productivity", labor_service.get_productivity_stats, True),
+    ("/labor/union-reconciliation", labor_service.get_union_reconciliation_data, True),
+    ("/finance/variance", main._compute_variance, True),
+]
+
+def _response_model(path):
+    for route in main.app.routes:
+        if isinstance(route, APIRoute) and route.path == path and "GET" in route.methods:
+            return route.response_model
+    return None
+
+def default_body(content, model):
+    if model is None:
+        return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                          indent=None, separators=(",", ":")).encode("utf-8")
+    adapter = TypeAdapter(model)
+    return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+def fast_body(content):
+    return fast_json.ORJSONResponse(content).body
+
+def on_wire(body):
+    if len(body) < GZIP_MINIMUM_SIZE:
+        return len(body)
+    return len(gzip.compress(body, compresslevel=GZIP_COMPRESS_LEVEL))
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = fn()
+    return (time.perf_counter() - start) / repeat * 1000, body
+
+async def load(loader):
+    async with AsyncSessionLocal() as db:
+        return await loader(db)
+
+def run(repeat=20):
+    print(f"=== Response serialization benchmark (mean of {repeat} runs) ===")
+    print(f"{'endpoint':30s} {'before ms':>10s} {'after ms':>9s} {'before bytes':>13s} {'after bytes':>12s}")
+    for path, loader, fast in ENDPOINTS:
+        content = asyncio.run(load(loader))
+        model = _response_model(path)
+        before_ms, before = timed(lambda: default_body(content, model), repeat)
+        if fast:
+            after_ms, after = timed(lambda: fast_body(content), repeat)
+            assert json.loads(after) == json.loads(before), f"{path}: fast path output differs"
+        else:
+            after_ms, after = before_ms, before
+        print(f"{path:30s} {before_ms:10.2f} {after_ms:9.2f} {len(before):13,d} {on_wire(after):12,d}")
+
+if __name__ == "__main__":
+    run()
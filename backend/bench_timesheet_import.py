@@ -0,0 +1,114 @@
+"""
+Timesheet import throughput on SQLite, for CSV and NDJSON payroll exports.
+
+Exits non-zero when a format imports fewer than --target rows per second (the import's
+100k rows/s goal by default) or leaves the labor rollup inconsistent, so it can gate a
+change to the import path.
+
+Usage: python bench_timesheet_import.py [--rows 500000] [--projects 50] [--target 100000]
+"""
+import io
+import os
+import sys
+import csv
+import json
+import time
+import tempfile
+import argparse
+import datetime
+import numpy as np
+from sqlalchemy import create_engine, event, func, select
+import models
+import timesheet_import
+from database import _set_sqlite_pragmas
+
+TARGET_ROWS_PER_SECOND = 100_000
+
+def make_rows(n, n_projects, n_days=7, seed=42):
+    """A payroll export: n entries spread over n_days working days."""
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime(2025, 1, 6)
+    days = rng.integers(0, n_days, n).tolist()
+    hours = np.round(rng.uniform(1, 10, n), 2).tolist()
+    projects = rng.integers(1, n_projects + 1, n).tolist()
+    employees = rng.integers(1000, 1500, n).tolist()
+    billable = (rng.random(n) < 0.8).tolist()
+    return [
+        {
+            "project_id": projects[i],
+            "employee_id": f"EMP{employees[i]}",
+            "date": (start + datetime.timedelta(days=days[i])).date().isoformat(),
+            "hours": hours[i],
+            "payroll_code": "L100",
+            "is_billable": billable[i],
+        }
+        for i in range(n)
+    ]
+
+def to_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+def to_ndjson(rows):
+    return "".join(json.dumps(r) + "\n" for r in rows)
+
+def run_one(fmt, payload, n_projects):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(models.Project.__table__.insert(), [
+            {"id": i, "name": f"Project {i}", "budget_hours": 1000.0, "actual_hours": 0.0}
+            for i in range(1, n_projects + 1)
+        ])
+
+    start = time.perf_counter()
+    report = timesheet_import.import_timesheets(engine, io.StringIO(payload), fmt)
+    elapsed = time.perf_counter() - start
+
+    with engine.connect() as connection:
+        rollup_hours = connection.execute(select(func.sum(models.LaborDailyRollup.hours))).scalar()
+        actual_hours = connection.execute(select(func.sum(models.LaborActual.hours))).scalar()
+    engine.dispose()
+    return report, elapsed, abs(rollup_hours - actual_hours) < 1e-6 * actual_hours
+
+def run(n=500_000, n_projects=50, target=TARGET_ROWS_PER_SECOND):
+    """Prints the throughput of each format and returns the failures against `target`."""
+    rows = make_rows(n, n_projects)
+    payloads = (("csv", to_csv(rows)), ("ndjson", to_ndjson(rows)))
+    del rows
+    print(f"=== Timesheet import benchmark ({n:,} rows, {n_projects} projects, SQLite) ===")
+    failures = []
+    for fmt, payload in payloads:
+        report, elapsed, consistent = run_one(fmt, payload, n_projects)
+        rate = report["inserted"] / elapsed
+        print(
+            f"{fmt:7s} {elapsed:6.2f} s  {rate:>10,.0f} rows/s  "
+            f"inserted={report['inserted']:,} rejected={report['rejected']} rollup_consistent={consistent}"
+        )
+        if rate < target:
+            failures.append(f"{fmt}: {rate:,.0f} rows/s is below the target of {target:,.0f}")
+        if report["inserted"] != n or not consistent:
+            failures.append(f"{fmt}: {report['inserted']:,} of {n:,} rows inserted, rollup consistent: {consistent}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Timesheet import benchmark")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--projects", type=int, default=50)
+    parser.add_argument("--target", type=float, default=TARGET_ROWS_PER_SECOND, help="minimum rows per second")
+    args = parser.parse_args()
+
+    failures = run(args.rows, args.projects, args.target)
+    for line in failures:
+        print("FAILED " + line)
+    if failures:
+        sys.exit(1)
+    print(f"Both formats import at least {args.target:,.0f} rows/s.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Shared plumbing for the bulk file imports (timesheet_import, invoice_import).
+
+Reads CSV (with a header row) or NDJSON from a text stream, validates rows and hands
+valid records to a writer in fixed-size chunks, one transaction per chunk. Invalid rows
+are skipped and reported by line number. A file that stops decoding as UTF-8 ends the
+import at that point and is reported as a file error.
+
+run_import validates one row at a time. run_column_import reads each chunk into one list
+per column and validates whole columns, parsing every distinct value once; large
+uniform files (payroll exports) spend most of their time in per-row parsing otherwise.
+"""
+import io
+import os
+import csv
+import json
+import datetime
+import orjson
+from itertools import chain, repeat
+from functools import lru_cache
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+CHUNK_SIZE = 10000
+# Errors beyond this are counted but not listed in the report
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = ("csv", "ndjson")
+_BOOLEANS = {"1": True, "true": True, "t": True, "yes": True, "y": True,
+            "0": False, "false": False, "f": False, "no": False, "n": False}
+
+class RowError(ValueError):
+    pass
+
+def detect_format(filename, content_type=None) -> str:
+    """Picks csv or ndjson from the file extension, falling back to the content type."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".ndjson", ".jsonl", ".json"):
+        return "ndjson"
+    if content_type and "json" in content_type:
+        return "ndjson"
+    return "csv"
+
+def iter_rows(stream, fmt: str) -> Iterator[Tuple[int, object]]:
+    """
+    Yields (line_number, row) from a text stream. CSV rows are dicts keyed by the header;
+    NDJSON rows are the decoded objects, or a RowError for lines that are not valid JSON.
+    """
+    if fmt == "csv":
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [h.strip() for h in header]
+        for line_no, values in enumerate(reader, start=2):
+            if values:
+                yield line_no, dict(zip(header, values))
+    elif fmt == "ndjson":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except ValueError as e:
+                yield line_no, RowError(f"invalid JSON: {e}")
+    else:
+        raise ValueError(f"Unsupported format '{fmt}', expected one of {', '.join(FORMATS)}")
+
+def iter_column_chunks(stream, fmt: str, columns: Sequence[str], chunk_size: int = CHUNK_SIZE) \
+        -> Iterator[Tuple[List[int], Dict[str, List], List[Tuple[int, str]]]]:
+    """
+    Yields the rows of a text stream in chunks of up to `chunk_size` lines as
+    (line_numbers, {column: values}, errors). `values` holds the raw field of every row in
+    `line_numbers`, None where the row lacks it (like iter_rows' dicts); `errors` lists
+    (line, message) for NDJSON lines that are not objects. A UnicodeDecodeError is raised
+    after the rows read before it have been yielded.
+    """
+    if fmt == "csv":
+        yield from _csv_column_chunks(stream, columns, chunk_size)
+    elif fmt == "ndjson":
+        yield from _ndjson_column_chunks(stream, columns, chunk_size)
+    else:
+        raise ValueError(f"Unsupported format '{fmt}', expected one of {', '.join(FORMATS)}")
+
+def _line_blocks(stream, size: int) -> Iterator[List[str]]:
+    block = []
+    try:
+        for line in stream:
+            block.append(line)
+            if len(block) >= size:
+                yield block
+                block = []
+    except UnicodeDecodeError:
+        if block:
+            yield block
+        raise
+    if block:
+        yield block
+
+def _split_fields(block: List[str], text: str, width: int):
+    """
+    The columns of a block of CSV lines (`text` is the block joined), or None unless every
+    line holds exactly `width` unquoted fields. Splitting the whole block at once builds no
+    list per row, and those lists (garbage collector work included) are most of the cost of
+    reading a large file with csv.reader.
+    """
+    if width < 2 or set(map(str.count, block, repeat(","))) != {width - 1}:
+        return None
+    if "\r" in text:
+        text = text.replace("\r\n", "\n")
+        if "\r" in text:
+            return None
+    flat = (text[:-1] if text.endswith("\n") else text).replace("\n", ",").split(",")
+    return [flat[i::width] for i in range(width)]
+
+def _csv_column_chunks(stream, columns, chunk_size):
+    header = next(csv.reader(stream), None)
+    if header is None:
+        return
+    position = {name.strip(): i for i, name in enumerate(header)}
+    width = len(header)
+
+    def chunk(fields, lines):
+        return lines, {
+            name: list(fields[position[name]]) if name in position else [None] * len(lines)
+            for name in columns
+        }, []
+
+    def row_chunk(rows, lines):
+        if set(map(len, rows)) != {width}:
+            rows = [row[:width] + [None] * (width - len(row)) for row in rows]
+        return chunk(list(zip(*rows)), lines)
+
+    blocks = _line_blocks(stream, chunk_size)
+    first_line = 2
+    for block in blocks:
+        text = "".join(block)
+        if '"' in text:
+            # Quoted fields can span lines, and chunks: csv.reader parses the rest of the file
+            yield from _csv_row_chunks(csv.reader(chain.from_iterable(chain([block], blocks))), first_line,
+                                       chunk_size, row_chunk)
+            return
+        fields = _split_fields(block, text, width)
+        if fields is not None:
+            yield chunk(fields, list(range(first_line, first_line + len(block))))
+        else:
+            # Blank or ragged lines; without quotes each line is still one row
+            yield from _csv_row_chunks(csv.reader(block), first_line, chunk_size, row_chunk)
+        first_line += len(block)
+
+def _csv_row_chunks(reader, first_line, chunk_size, row_chunk):
+    rows, lines = [], []
+    try:
+        for line_no, values in enumerate(reader, start=first_line):
+            if values:
+                rows.append(values)
+                lines.append(line_no)
+                if len(rows) >= chunk_size:
+                    yield row_chunk(rows, lines)
+                    rows, lines = [], []
+    except UnicodeDecodeError:
+        if rows:
+            yield row_chunk(rows, lines)
+        raise
+    if rows:
+        yield row_chunk(rows, lines)
+
+def _ndjson_column_chunks(stream, columns, chunk_size):
+    def chunk(objects, lines, errors):
+        return lines, {name: [row.get(name) for row in objects] for name in columns}, errors
+
+    objects, lines, errors = [], [], []
+    try:
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                errors.append((line_no, f"invalid JSON: {e}"))
+            else:
+                if isinstance(row, dict):
+                    objects.append(row)
+                    lines.append(line_no)
+                else:
+                    errors.append((line_no, "expected an object"))
+            if len(objects) + len(errors) >= chunk_size:
+                yield chunk(objects, lines, errors)
+                objects, lines, errors = [], [], []
+    except UnicodeDecodeError:
+        if objects or errors:
+            yield chunk(objects, lines, errors)
+        raise
+    if objects or errors:
+        yield chunk(objects, lines, errors)
+
+def parse_column(values: List, parse: Callable) -> Tuple[List, Dict[int, str]]:
+    """
+    Applies `parse` (raising RowError) to a column of raw values, once per distinct value.
+    Returns the parsed column and {row index: error} for the values it rejected; their
+    entries in the column are None.
+    """
+    # CSV fields are all strings; JSON values of other types (1, 1.0 and True compare
+    # equal but parse differently as text) are parsed one by one
+    if set(map(type, values)) <= {str, type(None)}:
+        parsed = {}
+        for value in set(values):
+            try:
+                parsed[value] = parse(value)
+            except RowError as e:
+                parsed[value] = e
+        column = [parsed[value] for value in values]
+        if not any(isinstance(result, RowError) for result in parsed.values()):
+            return column, {}
+    else:
+        column = []
+        for value in values:
+            try:
+                column.append(parse(value))
+            except RowError as e:
+                column.append(e)
+    errors = {i: str(result) for i, result in enumerate(column) if isinstance(result, RowError)}
+    for i in errors:
+        column[i] = None
+    return column, errors
+
+def require_object(row) -> Dict:
+    if isinstance(row, RowError):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError("expected an object")
+    return row
+
+def parse_bool(name: str, value, default: bool = True) -> bool:
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if not text:
+        return default
+    parsed = _BOOLEANS.get(text)
+    if parsed is None:
+        raise RowError(f"{name}: expected a boolean, got '{value}'")
+    return parsed
+
+def parse_date(name: str, value) -> datetime.datetime:
+    return _parse_date(name, str(value if value is not None else ""))
+
+# Exports repeat the same few dates, so parsed values are memoized
+@lru_cache(maxsize=4096)
+def _parse_date(name: str, value: str) -> datetime.datetime:
+    if not value.strip():
+        raise RowError(f"{name}: required")
+    try:
+        parsed = datetime.datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise RowError(f"{name}: expected an ISO date, got '{value}'")
+    # Stored naive, in UTC like the rest of the app
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_text(name: str, value, required: bool = True):
+    text = str(value).strip() if value is not None else ""
+    if not text:
+        if required:
+            raise RowError(f"{name}: required")
+        return None
+    return text
+
+def run_import(stream, fmt: str, validate: Callable, write_chunk: Callable, chunk_size: int = CHUNK_SIZE) -> Dict:
+    """
+    Validates every row with `validate(row)` (raising RowError rejects it) and passes each
+    chunk of valid records to `write_chunk(records, report)`, which writes them in one
+    transaction and returns how many it inserted. A chunk that raises rolls back as a whole
+    and is reported against its line range.
+
+    Undecodable bytes stop the import: rows read before them are still written (earlier
+    chunks are committed already), the rest of the file is not read, and `file_error`
+    says so. The error is counted as one rejected row.
+
+    Returns {rows_read, inserted, rejected, duplicates, chunks, errors: [{line, error}], errors_truncated,
+    file_error}.
+    """
+    report = _new_report()
+    records, lines = [], []
+    last_line = 0
+    try:
+        for line_no, row in iter_rows(stream, fmt):
+            last_line = line_no
+            report["rows_read"] += 1
+            try:
+                records.append(validate(row))
+            except RowError as e:
+                _reject(report, line_no, str(e))
+                continue
+            lines.append(line_no)
+            if len(records) >= chunk_size:
+                _flush(report, write_chunk, records, len(records), lines)
+                records, lines = [], []
+    except UnicodeDecodeError as e:
+        _stop(report, last_line, e)
+    if records:
+        _flush(report, write_chunk, records, len(records), lines)
+    return _finish(report)
+
+def run_column_import(stream, fmt: str, columns: Sequence[str], validate_chunk: Callable, write_chunk: Callable,
+                      chunk_size: int = CHUNK_SIZE) -> Dict:
+    """
+    run_import reading column-wise (see iter_column_chunks). `validate_chunk({column: values})`
+    returns the valid records as a list of columns and {row index: error} for the rejected
+    rows; `write_chunk(columns, report)` writes them in one transaction and returns how many
+    it inserted. Returns the same report as run_import.
+    """
+    report = _new_report()
+    last_line = 0
+    try:
+        for lines, values, errors in iter_column_chunks(stream, fmt, columns, chunk_size):
+            last_line = max(lines[-1] if lines else 0, errors[-1][0] if errors else 0)
+            report["rows_read"] += len(lines) + len(errors)
+            records, rejected = validate_chunk(values) if lines else ([], {})
+            errors += [(lines[i], message) for i, message in rejected.items()]
+            for line_no, message in sorted(errors):
+                _reject(report, line_no, message)
+            if len(rejected) < len(lines):
+                kept = [line_no for i, line_no in enumerate(lines) if i not in rejected] if rejected else lines
+                _flush(report, write_chunk, records, len(kept), kept)
+    except UnicodeDecodeError as e:
+        _stop(report, last_line, e)
+    return _finish(report)
+
+def _new_report() -> Dict:
+    return {"rows_read": 0, "inserted": 0, "rejected": 0, "duplicates": 0, "chunks": 0, "errors": [],
+            "file_error": None}
+
+def _reject(report, line_no, message, count=1):
+    report["rejected"] += count
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append({"line": line_no, "error": message})
+
+def _flush(report, write_chunk, records, count, lines):
+    try:
+        report["inserted"] += write_chunk(records, report)
+    except Exception as e:
+        _reject(report, lines[0], f"chunk of {count} rows (lines {lines[0]}-{lines[-1]}) rolled back: {e}", count)
+        return
+    report["chunks"] += 1
+
+def _stop(report, last_line, error: UnicodeDecodeError):
+    # Text is decoded in blocks, so the bad bytes are somewhere after the last line read
+    unread = f"nothing after line {last_line} was read" if last_line else "no rows were read"
+    report["file_error"] = f"not valid UTF-8 text ({error.reason}); {unread}"
+    _reject(report, last_line + 1, report["file_error"])
+
+def _finish(report) -> Dict:
+    report["errors_truncated"] = report["rejected"] > len(report["errors"])
+    return report
+
+@contextmanager
+def decoded(binary_stream):
+    """
+    Reads a binary stream (e.g. an upload) as UTF-8 text, skipping a leading BOM.
+    The underlying stream is left open.
+    """
+    text = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    try:
+        yield text
+    finally:
+        text.detach()
+
+def print_report(report: Dict, limit: int = 20):
+    print(
+        f"Read {report['rows_read']} rows: {report['inserted']} inserted, "
+        f"{report['duplicates']} duplicates skipped, {report['rejected']} rejected."
+    )
+    if report.get("file_error"):
+        print(f"Import stopped early: {report['file_error']}")
+    for error in report["errors"][:limit]:
+        print(f"  line {error['line']}: {error['error']}")
@@ -0,0 +1,149 @@
+"""
+Runs the read endpoints against the configured database, captures every SELECT they issue
+and EXPLAINs it. Exits non-zero when a query falls back to a full table scan.
+
+SQLite: EXPLAIN QUERY PLAN, a bare `SCAN <table>` step is a full scan (`SCAN ... USING
+INDEX` and `SEARCH` are index accesses). PostgreSQL: EXPLAIN (FORMAT JSON) with
+enable_seqscan off, so a Seq Scan only appears when no index can serve the query; on
+small tables the planner would otherwise prefer one regardless of indexes.
+
+Usage: python check_query_plans.py
+"""
+import asyncio
+import re
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import event
+import main, models, labor_service, finance_service, reporting_service, ai_agent
+from database import engine, async_engine, SessionLocal, AsyncSessionLocal
+
+# Reference tables the endpoints read in full by design (one row per project or union)
+FULL_SCAN_ALLOWED = {"projects", "unions", "union_rates"}
+
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+
+class QueryRecorder:
+    """Collects the SELECT statements (with driver parameters) run while it is active."""
+
+    def __init__(self):
+        self.queries = []
+        self.active = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active and statement.lstrip().upper().startswith("SELECT"):
+            self.queries.append((conn.engine is engine, statement, parameters))
+
+recorder = QueryRecorder()
+event.listen(engine, "before_cursor_execute", recorder)
+event.listen(async_engine.sync_engine, "before_cursor_execute", recorder)
+
+def _anomaly_fallbacks(anomalies, inflation_rate=0.05, **kwargs):
+    # Only the SQL matters here; never call the LLM
+    return [ai_agent.anomaly_fallback(a['category'], a['amount'], inflation_rate) for a in anomalies]
+
+async def _run_async(call):
+    async with AsyncSessionLocal() as db:
+        await call(db)
+
+def _run_sync(call):
+    db = SessionLocal()
+    try:
+        call(db)
+    finally:
+        db.close()
+
+def endpoint_calls():
+    """(name, runner) pairs; each runner issues the queries of one endpoint/parameter set."""
+    end = datetime.utcnow()
+    start = end - timedelta(days=90)
+    return [
+        ("GET /labor/productivity", lambda: _run_async(labor_service.get_productivity_stats)),
+        ("GET /labor/employees", lambda: _run_async(lambda db: labor_service.get_employee_details_by_project(db))),
+        ("GET /labor/employees?project_id", lambda: _run_async(lambda db: labor_service.get_employee_details_by_project(db, 1))),
+        ("GET /labor/payroll-estimation", lambda: _run_async(labor_service.get_payroll_estimation)),
+        ("GET /labor/union-reconciliation", lambda: _run_async(labor_service.get_union_reconciliation_data)),
+        ("GET /finance/variance", lambda: _run_async(main._compute_variance)),
+        ("GET /finance/project-analytics", lambda: _run_async(finance_service.get_project_financial_analytics)),
+        ("GET /finance/project-analytics?project_id&start_date&end_date", lambda: _run_async(
+            lambda db: finance_service.get_project_financial_analytics(db, [1, 2], start, end)
+        )),
+        ("GET /reporting/projects", lambda: _run_async(
+            lambda db: reporting_service.get_projects_page(db, cursor=1, limit=2)
+        )),
+        ("GET /reporting/projects?since", lambda: _run_async(lambda db: reporting_service.get_changes(db, 1))),
+        ("GET /reporting/projects/{id}/events?cursor", lambda: _run_async(
+            lambda db: reporting_service.get_children_page(db, "events", 1, cursor=1_000_000)
+        )),
+        ("GET /reporting/projects/{id}/media?cursor", lambda: _run_async(
+            lambda db: reporting_service.get_children_page(db, "media", 1, cursor=1_000_000)
+        )),
+        ("POST /agent/insights?view=labor", lambda: _run_async(lambda db: main._insight_request_context("labor", None, db))),
+        ("POST /agent/insights?view=automation", lambda: _run_async(lambda db: main._insight_request_context("automation", None, db))),
+        ("GET /automation/anomalies", lambda: _run_sync(lambda db: main.get_anomalies(limit=main.ANOMALY_PAGE_SIZE, db=db))),
+    ]
+
+def full_scans(connection, statement, parameters):
+    """Returns the tables a statement reads with a full scan, excluding FULL_SCAN_ALLOWED."""
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        tables = [m.group(1) for m in (SQLITE_FULL_SCAN.match(row[-1]) for row in rows) if m]
+    else:
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        plan = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+        connection.exec_driver_sql("RESET enable_seqscan")
+        tables = _pg_seq_scans(plan[0]["Plan"] if isinstance(plan, list) else plan)
+    # Scans of derived tables (materialized subqueries) are not table scans
+    return sorted(set(tables) & set(models.Base.metadata.tables) - FULL_SCAN_ALLOWED)
+
+def _pg_seq_scans(node):
+    tables = [node["Relation Name"]] if node.get("Node Type") == "Seq Scan" else []
+    for child in node.get("Plans", []):
+        tables.extend(_pg_seq_scans(child))
+    return tables
+
+async def _explain_async(statement, parameters):
+    async with async_engine.connect() as connection:
+        return await connection.run_sync(lambda sync_conn: full_scans(sync_conn, statement, parameters))
+
+def explain(is_sync, statement, parameters):
+    # Statements are explained on the engine that ran them, so the parameter style matches
+    if is_sync:
+        with engine.connect() as connection:
+            return full_scans(connection, statement, parameters)
+    return asyncio.run(_explain_async(statement, parameters))
+
+def check():
+    main.ai_agent.analyze_anomalies = _anomaly_fallbacks
+    failures = 0
+    for name, run in endpoint_calls():
+        recorder.queries = []
+        recorder.active = True
+        try:
+            result = run()
+            if asyncio.iscoroutine(result):
+                asyncio.run(result)
+        finally:
+            recorder.active = False
+
+        seen = set()
+        endpoint_failures = 0
+        for is_sync, statement, parameters in recorder.queries:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            tables = explain(is_sync, statement, parameters)
+            if tables:
+                endpoint_failures += 1
+                print(f"FAIL {name}: full scan of {', '.join(tables)}")
+                print("     " + " ".join(statement.split()))
+        if not endpoint_failures:
+            print(f"ok   {name} ({len(seen)} queries)")
+        failures += endpoint_failures
+    return failures
+
+if __name__ == "__main__":
+    failures = check()
+    if failures:
+        print(f"\n{failures} queries fall back to a full table scan.")
+        sys.exit(1)
+    print("\nNo endpoint query falls back to a full table scan.")
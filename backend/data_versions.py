@@ -0,0 +1,78 @@
+"""
+Per-table data version counters.
+
+`table_versions` holds one counter per table, incremented inside every transaction that
+writes the table, so a set of versions identifies the state of those tables as of the last
+commit. response_cache keys cached responses on them; a write therefore changes the key of
+every response that depends on the table, in every worker process.
+
+Counters are bumped automatically for ORM flushes and ORM bulk update()/delete() through a
+Session. Core statements executed directly on a connection (bulk imports, labor_rollup)
+bypass the Session; callers doing those must call `bump` themselves.
+"""
+from typing import Dict, Iterable, Tuple
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+
+version_table = models.TableVersion.__table__
+
+# Bookkeeping tables written alongside the data; never read by cached endpoints
+UNVERSIONED = {"table_versions", "reporting_changes"}
+
+def bump(connection, tables: Iterable[str]):
+    """Increments the version of each table using the given connection/transaction."""
+    tables = sorted(set(tables) - UNVERSIONED)
+    if not tables:
+        return
+    rows = [{"table_name": name, "version": 1} for name in tables]
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        stmt = upsert(version_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["table_name"],
+            set_={"version": version_table.c.version + 1}
+        )
+        connection.execute(stmt, rows)
+    else:
+        for row in rows:
+            result = connection.execute(
+                update(version_table)
+                .where(version_table.c.table_name == row["table_name"])
+                .values(version=version_table.c.version + 1)
+            )
+            if result.rowcount == 0:
+                connection.execute(insert(version_table), [row])
+
+async def get_versions(db: AsyncSession, tables: Iterable[str]) -> Tuple[Tuple[str, int], ...]:
+    """Returns ((table, version), ...) sorted by table; never-written tables are at 0."""
+    tables = sorted(set(tables))
+    rows = (await db.execute(
+        select(version_table.c.table_name, version_table.c.version)
+        .where(version_table.c.table_name.in_(tables))
+    )).all()
+    versions: Dict[str, int] = dict(rows)
+    return tuple((name, versions.get(name, 0)) for name in tables)
+
+def _tables_of(objects):
+    return {obj.__table__.name for obj in objects if hasattr(obj, "__table__")}
+
+@event.listens_for(Session, "after_flush")
+def _bump_flushed_tables(session, flush_context):
+    changed = [obj for obj in session.dirty if session.is_modified(obj)]
+    tables = _tables_of(list(session.new) + changed + list(session.deleted))
+    if tables:
+        bump(session.connection(), tables)
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_bulk_statement_tables(orm_execute_state):
+    # query(...).update()/delete() and session.execute(insert/update/delete(Model)) skip the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            bump(orm_execute_state.session.connection(), {mapper.local_table.name})
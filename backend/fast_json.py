@@ -0,0 +1,42 @@
+"""
+Fast path for large JSON read responses.
+
+FastAPI validates an endpoint's return value against its response_model before serializing
+it. For results the services build themselves (plain dicts and lists, possibly served from
+response_cache) that only re-checks our own output; `respond` skips it and serializes with
+orjson instead. Endpoints opt in per call, and only for such trusted data: ORM objects
+still go through the response_model. FAST_JSON_ENABLED=false turns the fast path off.
+"""
+import os
+import time
+from decimal import Decimal
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+import request_metrics
+
+FAST_JSON_ENABLED = os.getenv("FAST_JSON_ENABLED", "true").lower() not in ("0", "false", "no")
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        start = time.perf_counter()
+        body = orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        request_metrics.record_serialization(time.perf_counter() - start)
+        return body
+
+def respond(content, response: Response):
+    """
+    Returns `content` as an ORJSONResponse with the headers already set on the endpoint's
+    `response` (ETag, cursors), or `content` itself when the fast path is off.
+    """
+    if not FAST_JSON_ENABLED:
+        return content
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return ORJSONResponse(content, headers=headers)
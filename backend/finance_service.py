@@ -0,0 +1,140 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Tuple
+import models
+
+# Assume $85/hr average rate
+HOURLY_RATE = 85
+
+def _day_range(start_date: Optional[datetime], end_date: Optional[datetime]) -> Tuple[Optional[date], Optional[date]]:
+    """
+    Whole-day bounds for a date range: start_date's day inclusive, the day after end_date's
+    exclusive. Events and the daily labor rollup both filter with them, so revenue, expenses
+    and labor cost cover the same days whatever time of day the bounds carry.
+    """
+    first_day = start_date.date() if start_date else None
+    after_last_day = end_date.date() + timedelta(days=1) if end_date else None
+    return first_day, after_last_day
+
+async def get_project_financial_analytics(
+    db: AsyncSession,
+    project_ids: Optional[List[int]] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    skip: int = 0,
+    limit: Optional[int] = None,
+):
+    """
+    Computes revenue, expenses, expense breakdown and labor hours for a page of projects.
+
+    Runs a constant number of grouped queries regardless of how many projects are
+    returned: one for the project page, one for payment/expense events grouped by
+    (project, type, category) and one for labor hours grouped by (project, billable)
+    from the daily labor rollup.
+    The date range applies to event and labor dates, in whole days (see _day_range).
+    """
+    first_day, after_last_day = _day_range(start_date, end_date)
+    project_query = select(models.Project.id, models.Project.name)
+    if project_ids:
+        project_query = project_query.where(models.Project.id.in_(project_ids))
+    project_query = project_query.order_by(models.Project.id).offset(skip)
+    if limit is not None:
+        project_query = project_query.limit(limit)
+    projects = (await db.execute(project_query)).all()
+    if not projects:
+        return []
+
+    # Only restrict the aggregates when the caller asked for a subset of projects
+    page_ids = [p.id for p in projects] if (project_ids or skip or limit is not None) else None
+
+    event_query = select(
+        models.ProjectEvent.project_id,
+        models.ProjectEvent.event_type,
+        models.ProjectEvent.category,
+        func.sum(models.ProjectEvent.amount).label('total')
+    ).where(models.ProjectEvent.event_type.in_(['payment', 'expense']))
+    if page_ids is not None:
+        event_query = event_query.where(models.ProjectEvent.project_id.in_(page_ids))
+    if first_day:
+        event_query = event_query.where(models.ProjectEvent.date >= datetime.combine(first_day, time.min))
+    if after_last_day:
+        event_query = event_query.where(models.ProjectEvent.date < datetime.combine(after_last_day, time.min))
+    event_rows = (await db.execute(event_query.group_by(
+        models.ProjectEvent.project_id,
+        models.ProjectEvent.event_type,
+        models.ProjectEvent.category
+    ))).all()
+
+    # Labor hours come from the daily rollup, kept per day
+    labor_query = select(
+        models.LaborDailyRollup.project_id,
+        models.LaborDailyRollup.is_billable,
+        func.sum(models.LaborDailyRollup.hours).label('total')
+    )
+    if page_ids is not None:
+        labor_query = labor_query.where(models.LaborDailyRollup.project_id.in_(page_ids))
+    if first_day:
+        labor_query = labor_query.where(models.LaborDailyRollup.day >= first_day)
+    if after_last_day:
+        labor_query = labor_query.where(models.LaborDailyRollup.day < after_last_day)
+    labor_rows = (await db.execute(labor_query.group_by(
+        models.LaborDailyRollup.project_id,
+        models.LaborDailyRollup.is_billable
+    ))).all()
+
+    return _build_project_analytics(projects, event_rows, labor_rows)
+
+def _build_project_analytics(projects, event_rows, labor_rows):
+    payments = {}
+    expenses = {}
+    breakdowns = {}
+    for project_id, event_type, category, total in event_rows:
+        total = total or 0
+        if event_type == 'payment':
+            payments[project_id] = payments.get(project_id, 0) + total
+        else:
+            expenses[project_id] = expenses.get(project_id, 0) + total
+            if category:
+                breakdown = breakdowns.setdefault(project_id, {})
+                breakdown[category] = breakdown.get(category, 0) + total
+
+    billable = {}
+    overhead = {}
+    for project_id, is_billable, total in labor_rows:
+        target = billable if is_billable else overhead
+        target[project_id] = target.get(project_id, 0) + (total or 0)
+
+    analytics = []
+    for project_id, project_name in projects:
+        revenue = payments.get(project_id, 0)
+        expense_total = expenses.get(project_id, 0)
+        billable_hours = billable.get(project_id, 0)
+        overhead_hours = overhead.get(project_id, 0)
+
+        billable_cost = billable_hours * HOURLY_RATE
+        overhead_cost = overhead_hours * HOURLY_RATE
+        labor_cost = billable_cost + overhead_cost
+
+        # Calculate profit
+        total_costs = expense_total + labor_cost
+        net_profit = revenue - total_costs
+        profit_margin = (net_profit / revenue * 100) if revenue > 0 else 0
+
+        analytics.append({
+            "project_id": project_id,
+            "project_name": project_name,
+            "revenue": float(revenue),
+            "expenses": float(expense_total),
+            "expense_breakdown": {k: float(v) for k, v in breakdowns.get(project_id, {}).items()},
+            "labor_cost": float(labor_cost),
+            "billable_cost": float(billable_cost),
+            "overhead_cost": float(overhead_cost),
+            "billable_hours": float(billable_hours),
+            "overhead_hours": float(overhead_hours),
+            "total_costs": float(total_costs),
+            "net_profit": float(net_profit),
+            "profit_margin": float(profit_margin)
+        })
+
+    return analytics
@@ -0,0 +1,205 @@
+"""
+Bulk invoice import for AP batches.
+
+Rows are parsed and validated by bulk_import. Each chunk is one transaction that:
+  1. locks the statistics rows of its categories, creating missing ones, so concurrent
+     imports sharing a category run one chunk at a time,
+  2. drops duplicates on (vendor, amount, date), both within the file and against
+     invoices already stored,
+  3. scores the remaining invoices, in date order, against the running category
+     statistics with one vectorized anomaly_service call,
+  4. inserts them with their flags in one executemany and saves the updated statistics.
+
+Flags therefore match what anomaly_stream assigns to invoices inserted through the ORM,
+and no rescan is needed after a load.
+
+Columns: vendor, category (optional; uncategorized invoices are not scored), amount, date.
+
+Usage: python invoice_import.py <file.csv|file.ndjson> [chunk_size]
+"""
+import sys
+import math
+from typing import Dict, Tuple
+import numpy as np
+from sqlalchemy import select, update, delete, Table, MetaData, Column, String, DateTime
+import models
+import anomaly_service
+import anomaly_stream
+import bulk_import
+import data_versions
+from bulk_import import RowError, CHUNK_SIZE, require_object, parse_date, parse_text
+from database import bulk_insert
+
+invoice_table = models.Invoice.__table__
+stats_table = models.InvoiceCategoryStats.__table__
+
+COLUMNS = (
+    "vendor", "category", "amount", "date", "anomaly_flag", "anomaly_description",
+    "history_avg", "inflation_adjusted_avg", "spike_percentage"
+)
+
+lookup_table = Table(
+    "invoice_import_keys", MetaData(),
+    Column("vendor", String),
+    Column("date", DateTime),
+    prefixes=["TEMPORARY"]
+)
+
+def validate(row) -> Tuple:
+    """Returns (vendor, category, amount, date) for one raw row, or raises RowError."""
+    row = require_object(row)
+    vendor = parse_text("vendor", row.get("vendor"))
+    category = parse_text("category", row.get("category"), required=False)
+    try:
+        amount = float(row.get("amount"))
+    except (TypeError, ValueError):
+        raise RowError(f"amount: expected a number, got '{row.get('amount')}'")
+    if not math.isfinite(amount) or amount <= 0:
+        raise RowError(f"amount: must be a positive number, got {row.get('amount')}")
+    # Cents, so duplicate detection compares exact values
+    return vendor, category, round(amount, 2), parse_date("date", row.get("date"))
+
+def _existing_keys(connection, records):
+    """(vendor, amount, date) keys of stored invoices that collide with the chunk."""
+    wanted = {(r[0], r[2], r[3]) for r in records}
+    # The chunk's (vendor, date) pairs go into a temporary table and are joined against
+    # ix_invoices_vendor_date: one index seek per pair, whatever the spread of vendors and dates
+    lookup_table.create(connection, checkfirst=True)
+    connection.execute(delete(lookup_table))
+    bulk_insert(connection, lookup_table, ("vendor", "date"), list({(r[0], r[3]) for r in records}))
+    rows = connection.execute(
+        select(invoice_table.c.vendor, invoice_table.c.amount, invoice_table.c.date)
+        .join(lookup_table, (invoice_table.c.vendor == lookup_table.c.vendor) & (invoice_table.c.date == lookup_table.c.date))
+    )
+    existing = {(vendor, round(amount, 2), date) for vendor, amount, date in rows if amount is not None}
+    return existing & wanted
+
+def _load_stats(connection, categories):
+    """
+    Statistics rows for the given categories, locked until the chunk commits, and whether
+    any were missing. Missing rows are created first, so a concurrent import bringing the
+    same new category waits on the lock and then scores against this chunk's statistics
+    instead of failing on the key.
+    """
+    if not categories:
+        return {}, False
+    created = anomaly_stream.create_missing_stats(connection, categories) != 0
+    rows = connection.execute(
+        select(stats_table).where(stats_table.c.category.in_(categories)).with_for_update()
+    ).mappings()
+    return {row["category"]: row for row in rows}, created
+
+def _score(connection, records, stored):
+    """
+    Scores date-ordered (vendor, category, amount, date) records against the locked
+    statistics rows `stored` (see _load_stats) and saves the updated statistics.
+    Returns the invoice rows in COLUMNS order.
+    """
+    scored = [(vendor, category, amount, date, False, None, None, None, None) for vendor, category, amount, date in records]
+    categorized = [i for i, r in enumerate(records) if r[1] is not None]
+    if not categorized:
+        return scored
+
+    categories = sorted({records[i][1] for i in categorized})
+    code_of = {category: code for code, category in enumerate(categories)}
+
+    def column(field):
+        return np.array([stored[c][field] or 0 for c in categories], dtype=np.float64)
+
+    growth_of = {}
+    for i in categorized:
+        date = records[i][3]
+        if date not in growth_of:
+            growth_of[date] = anomaly_stream.growth(date)
+
+    result = anomaly_service.score_against_running_stats(
+        np.array([code_of[records[i][1]] for i in categorized], dtype=np.int64),
+        np.array([records[i][2] for i in categorized], dtype=np.float64),
+        np.array([growth_of[records[i][3]] for i in categorized], dtype=np.float64),
+        column("count"), column("mean"), column("m2"), column("raw_mean")
+    )
+
+    flags = result["anomaly"].tolist()
+    history = result["history_avg"].tolist()
+    adjusted = result["inflation_adjusted_avg"].tolist()
+    for j, i in enumerate(categorized):
+        vendor, category, amount, date = records[i]
+        if math.isnan(history[j]):
+            continue
+        spike = round(((amount - history[j]) / history[j]) * 100, 1) if history[j] else 0.0
+        scored[i] = (
+            vendor, category, amount, date, flags[j],
+            anomaly_stream.description(category) if flags[j] else None,
+            history[j], adjusted[j], spike
+        )
+
+    stats = result["stats"]
+    for code, category in enumerate(categories):
+        values = {
+            "count": int(stats["count"][code]),
+            "mean": float(stats["mean"][code]),
+            "m2": float(stats["m2"][code]),
+            "raw_mean": float(stats["raw_mean"][code]),
+        }
+        connection.execute(update(stats_table).where(stats_table.c.category == category).values(**values))
+    return scored
+
+def _write_chunk(engine, records, seen, report) -> int:
+    with engine.begin() as connection:
+        # Locking the statistics first serializes chunks that share a category, so the
+        # duplicate check and the scoring below both see the other chunk's committed rows
+        stored, created_stats = _load_stats(connection, sorted({r[1] for r in records if r[1] is not None}))
+        existing = _existing_keys(connection, records)
+        fresh, keys = [], set()
+        for record in records:
+            key = (record[0], record[2], record[3])
+            if key in seen or key in existing or key in keys:
+                continue
+            keys.add(key)
+            fresh.append(record)
+        # Date order, like the ORM path, so each invoice is scored against earlier ones
+        fresh.sort(key=lambda r: r[3])
+        # New statistics rows are a change even when every record turns out to be a duplicate
+        changed = [stats_table.name] if created_stats else []
+        if fresh:
+            bulk_insert(connection, invoice_table, COLUMNS, _score(connection, fresh, stored))
+            changed = [invoice_table.name, stats_table.name]
+        data_versions.bump(connection, changed)
+    seen.update(keys)
+    report["duplicates"] += len(records) - len(fresh)
+    return len(fresh)
+
+def import_invoices(engine, stream, fmt: str = "csv", chunk_size: int = CHUNK_SIZE) -> Dict:
+    """
+    Imports invoice rows from a text stream. Returns the bulk_import report, including
+    the number of duplicates skipped.
+    """
+    seen = set()
+    return bulk_import.run_import(
+        stream,
+        fmt,
+        validate,
+        lambda records, report: _write_chunk(engine, records, seen, report),
+        chunk_size
+    )
+
+def import_file(engine, binary_stream, fmt: str = "csv", chunk_size: int = CHUNK_SIZE) -> Dict:
+    """Decodes a binary stream (e.g. an upload) as UTF-8 and imports it."""
+    with bulk_import.decoded(binary_stream) as text:
+        return import_invoices(engine, text, fmt, chunk_size)
+
+if __name__ == "__main__":
+    from database import engine
+    import migrate
+
+    if len(sys.argv) < 2:
+        print("Usage: python invoice_import.py <file.csv|file.ndjson> [chunk_size]")
+        sys.exit(1)
+
+    path = sys.argv[1]
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else CHUNK_SIZE
+    migrate.upgrade()
+    with open(path, "rb") as f:
+        result = import_file(engine, f, bulk_import.detect_format(path), chunk_size)
+    bulk_import.print_report(result)
+    sys.exit(1 if result["rejected"] else 0)
@@ -0,0 +1,191 @@
+"""
+Incrementally maintained labor rollup.
+
+Every ORM flush that inserts, updates or deletes LaborActual rows also applies the
+matching hour deltas to `labor_daily_rollups` and `projects.actual_hours` inside the
+same transaction, so readers never need to rescan `labor_actuals`.
+
+Bulk Core statements (insert()/delete() executed directly on a connection) bypass the
+ORM flush; callers doing those must call `apply_deltas` themselves or run
+`python labor_rollup.py rebuild` afterwards. Both bump the data versions of the tables
+they write (data_versions).
+"""
+import sys
+import datetime
+from sqlalchemy import event, select, update, delete, insert, func
+from sqlalchemy.orm import Session
+import models
+import reporting_changes
+import data_versions
+
+rollup_table = models.LaborDailyRollup.__table__
+labor_table = models.LaborActual.__table__
+project_table = models.Project.__table__
+
+_PENDING_KEY = "labor_rollup_deltas"
+
+def _day(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+def _add_delta(deltas, project_id, is_billable, date, hours, count):
+    if project_id is None:
+        return
+    key = (project_id, bool(is_billable) if is_billable is not None else True, _day(date))
+    current_hours, current_count = deltas.get(key, (0.0, 0))
+    deltas[key] = (current_hours + (hours or 0.0), current_count + count)
+
+def apply_deltas(connection, deltas):
+    """
+    Applies {(project_id, is_billable, day): (hours, entry_count)} deltas to the rollup
+    table and to projects.actual_hours using the given connection/transaction.
+    """
+    deltas = {k: v for k, v in deltas.items() if k[2] is not None and (v[0] or v[1])}
+    if not deltas:
+        return
+
+    rows = [
+        {"project_id": p, "is_billable": b, "day": d, "hours": h, "entry_count": c}
+        for (p, b, d), (h, c) in deltas.items()
+    ]
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        stmt = upsert(rollup_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["project_id", "is_billable", "day"],
+            set_={
+                "hours": rollup_table.c.hours + stmt.excluded.hours,
+                "entry_count": rollup_table.c.entry_count + stmt.excluded.entry_count,
+            }
+        )
+        connection.execute(stmt, rows)
+    else:
+        for row in rows:
+            result = connection.execute(
+                update(rollup_table)
+                .where(
+                    rollup_table.c.project_id == row["project_id"],
+                    rollup_table.c.is_billable == row["is_billable"],
+                    rollup_table.c.day == row["day"]
+                )
+                .values(
+                    hours=rollup_table.c.hours + row["hours"],
+                    entry_count=rollup_table.c.entry_count + row["entry_count"]
+                )
+            )
+            if result.rowcount == 0:
+                connection.execute(insert(rollup_table), [row])
+
+    # Drop buckets whose last entry was removed
+    if any(c < 0 for _, c in deltas.values()):
+        connection.execute(delete(rollup_table).where(rollup_table.c.entry_count <= 0))
+
+    project_hours = {}
+    for (project_id, _, _), (hours, _) in deltas.items():
+        project_hours[project_id] = project_hours.get(project_id, 0.0) + hours
+    changed = [project_id for project_id, hours in project_hours.items() if hours]
+    for project_id in changed:
+        connection.execute(
+            update(project_table)
+            .where(project_table.c.id == project_id)
+            .values(actual_hours=func.coalesce(project_table.c.actual_hours, 0.0) + project_hours[project_id])
+        )
+    # actual_hours is part of the synced project state (/reporting/projects?since=)
+    reporting_changes.record(connection, [("projects", project_id, False) for project_id in changed])
+    data_versions.bump(connection, ["labor_daily_rollups"] + (["projects"] if changed else []))
+
+@event.listens_for(Session, "before_flush")
+def _capture_previous_values(session, flush_context, instances):
+    # Old values of updated/deleted rows are read from the database before the ORM
+    # writes, so the rollup stays exact even when attributes were expired.
+    changed_ids = [
+        obj.id for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, models.LaborActual) and obj.id is not None
+        and (obj in session.deleted or session.is_modified(obj))
+    ]
+    deltas = {}
+    if changed_ids:
+        previous = session.connection().execute(
+            select(
+                labor_table.c.project_id,
+                labor_table.c.is_billable,
+                labor_table.c.date,
+                labor_table.c.hours
+            ).where(labor_table.c.id.in_(changed_ids))
+        ).all()
+        for project_id, is_billable, date, hours in previous:
+            _add_delta(deltas, project_id, is_billable, date, -(hours or 0.0), -1)
+    session.info[_PENDING_KEY] = deltas
+
+@event.listens_for(Session, "after_flush")
+def _apply_flush_deltas(session, flush_context):
+    deltas = session.info.pop(_PENDING_KEY, {})
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, models.LaborActual):
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        _add_delta(deltas, obj.project_id, obj.is_billable, obj.date, obj.hours, 1)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+def rebuild(db: Session):
+    """
+    Recomputes the whole rollup and projects.actual_hours from labor_actuals.
+    Use after backfills or bulk Core loads that bypassed the ORM.
+    """
+    connection = db.connection()
+    connection.execute(delete(rollup_table))
+    day = func.date(labor_table.c.date)
+    connection.execute(
+        insert(rollup_table).from_select(
+            ["project_id", "is_billable", "day", "hours", "entry_count"],
+            select(
+                labor_table.c.project_id,
+                func.coalesce(labor_table.c.is_billable, True),
+                day,
+                func.sum(labor_table.c.hours),
+                func.count()
+            )
+            .where(labor_table.c.project_id.isnot(None), labor_table.c.date.isnot(None))
+            .group_by(labor_table.c.project_id, func.coalesce(labor_table.c.is_billable, True), day)
+        )
+    )
+    connection.execute(
+        update(project_table).values(
+            actual_hours=func.coalesce(
+                select(func.sum(rollup_table.c.hours))
+                .where(rollup_table.c.project_id == project_table.c.id)
+                .scalar_subquery(),
+                0.0
+            )
+        )
+    )
+    reporting_changes.mark_reset(connection)
+    data_versions.bump(connection, ["labor_daily_rollups", "projects"])
+    db.commit()
+
+if __name__ == "__main__":
+    from database import SessionLocal
+    import migrate
+
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("Usage: python labor_rollup.py rebuild")
+        sys.exit(1)
+
+    migrate.upgrade()
+    db = SessionLocal()
+    try:
+        print("Rebuilding labor rollup...")
+        rebuild(db)
+        count = db.query(func.count()).select_from(models.LaborDailyRollup).scalar()
+        print(f"Done! {count} rollup rows.")
+    finally:
+        db.close()
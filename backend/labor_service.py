@@ -1,43 +1,69 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 import models
 
-def get_productivity_stats(db: Session):
+async def get_productivity_stats(db: AsyncSession):
     """
-    Calculates billable vs overhead hours per project from the database.
+    Calculates billable vs overhead hours per project from the labor rollup.
     """
-    projects = db.query(models.Project).all()
+    projects = (await db.execute(select(models.Project))).scalars().all()
+    billable, overhead = await _rollup_hours_by_project(db)
     results = []
 
     for project in projects:
-        billable = db.query(func.sum(models.LaborActual.hours)).filter(
-            models.LaborActual.project_id == project.id,
-            models.LaborActual.is_billable == True
-        ).scalar() or 0.0
-
-        overhead = db.query(func.sum(models.LaborActual.hours)).filter(
-            models.LaborActual.project_id == project.id,
-            models.LaborActual.is_billable == False
-        ).scalar() or 0.0
+        project_billable = billable.get(project.id, 0.0)
+        project_overhead = overhead.get(project.id, 0.0)
 
         results.append({
             "project_id": project.id,
             "project_name": project.name,
-            "billable_hours": billable,
-            "overhead_hours": overhead,
-            "delta": billable - overhead
+            "billable_hours": project_billable,
+            "overhead_hours": project_overhead,
+            "delta": project_billable - project_overhead
         })
     
     return results
 
-def get_total_aggregates(db: Session):
-    billable = db.query(func.sum(models.LaborActual.hours)).filter(models.LaborActual.is_billable == True).scalar() or 0.0
-    overhead = db.query(func.sum(models.LaborActual.hours)).filter(models.LaborActual.is_billable == False).scalar() or 0.0
-    project_names = [p.name for p in db.query(models.Project).all()]
+async def get_project_hours(db: AsyncSession):
+    """
+    Returns {project_id: total hours} from the labor rollup.
+    """
+    billable, overhead = await _rollup_hours_by_project(db)
+    return {
+        project_id: billable.get(project_id, 0.0) + overhead.get(project_id, 0.0)
+        for project_id in set(billable) | set(overhead)
+    }
+
+async def _rollup_hours_by_project(db: AsyncSession):
+    rows = (await db.execute(
+        select(
+            models.LaborDailyRollup.project_id,
+            models.LaborDailyRollup.is_billable,
+            func.sum(models.LaborDailyRollup.hours)
+        ).group_by(models.LaborDailyRollup.project_id, models.LaborDailyRollup.is_billable)
+    )).all()
+
+    billable, overhead = {}, {}
+    for project_id, is_billable, hours in rows:
+        target = billable if is_billable else overhead
+        target[project_id] = target.get(project_id, 0.0) + (hours or 0.0)
+    return billable, overhead
+
+async def get_total_aggregates(db: AsyncSession):
+    rows = (await db.execute(
+        select(
+            models.LaborDailyRollup.is_billable,
+            func.sum(models.LaborDailyRollup.hours)
+        ).group_by(models.LaborDailyRollup.is_billable)
+    )).all()
+    totals = {bool(is_billable): hours or 0.0 for is_billable, hours in rows}
+    billable = totals.get(True, 0.0)
+    overhead = totals.get(False, 0.0)
+    project_names = (await db.execute(select(models.Project.name))).scalars().all()
     
     return billable, overhead, project_names
 
-def get_employee_details_by_project(db: Session, project_id: int = None):
+async def get_employee_details_by_project(db: AsyncSession, project_id: int = None):
     """
     Returns employee details aggregated by employee and optionally filtered by project.
     
@@ -49,9 +75,7 @@ def get_employee_details_by_project(db: Session, project_id: int = None):
     - Shows all employees across all projects
     - Hours shown are total hours across all projects
     """
-    print(f"[labor_service] get_employee_details_by_project called with project_id={project_id}, type={type(project_id)}")
-    
-    query = db.query(
+    query = select(
         models.LaborActual.employee_id,
         func.sum(models.LaborActual.hours).label('total_hours'),
         func.count(func.distinct(func.date(models.LaborActual.date))).label('days_worked')
@@ -59,13 +83,9 @@ def get_employee_details_by_project(db: Session, project_id: int = None):
     
     # Filter by project if specified - this ensures we only get hours for THIS project
     if project_id:
-        print(f"[labor_service] Applying filter for project_id={project_id}")
-        query = query.filter(models.LaborActual.project_id == project_id)
-    else:
-        print(f"[labor_service] No filter applied (project_id is {project_id})")
+        query = query.where(models.LaborActual.project_id == project_id)
     
-    results = query.group_by(models.LaborActual.employee_id).all()
-    print(f"[labor_service] Query returned {len(results)} employees")
+    results = (await db.execute(query.group_by(models.LaborActual.employee_id))).all()
     
     employees = []
     for emp_id, total_hours, days_worked in results:
@@ -91,7 +111,7 @@ def get_employee_details_by_project(db: Session, project_id: int = None):
     
     return employees
 
-def get_payroll_estimation(db: Session):
+async def get_payroll_estimation(db: AsyncSession):
     """
     Estimates the upcoming week's payroll based on the last 30 days of activity.
     Calculation: Average daily hours per active employee * 7 days * Average rate ($85)
@@ -99,17 +119,22 @@ def get_payroll_estimation(db: Session):
     from datetime import datetime, timedelta
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
     
-    # Get active employees and their total hours in the last 30 days
-    active_labor = db.query(
-        models.LaborActual.employee_id,
-        func.sum(models.LaborActual.hours).label('month_hours')
-    ).filter(models.LaborActual.date >= thirty_days_ago).group_by(models.LaborActual.employee_id).all()
+    # Hours come from the daily rollup; only the distinct employee count touches labor_actuals,
+    # and only for the last 30 days
+    total_month_hours = (await db.execute(
+        select(func.sum(models.LaborDailyRollup.hours)).where(
+            models.LaborDailyRollup.day >= thirty_days_ago.date()
+        )
+    )).scalar() or 0.0
     
-    if not active_labor:
-        return {"estimated_weekly_payroll": 0.0, "active_employees": 0, "avg_hourly_rate": 85.0}
+    num_employees = (await db.execute(
+        select(func.count(func.distinct(models.LaborActual.employee_id))).where(
+            models.LaborActual.date >= thirty_days_ago
+        )
+    )).scalar() or 0
     
-    total_month_hours = sum(emp.month_hours for emp in active_labor)
-    num_employees = len(active_labor)
+    if not num_employees:
+        return {"estimated_weekly_payroll": 0.0, "active_employees": 0, "avg_hourly_rate": 85.0, "projected_hours": 0.0}
     
     # Weekly average = (Total month hours / 30) * 7
     weekly_hours_projection = (total_month_hours / 30.0) * 7.0
@@ -124,19 +149,21 @@ def get_payroll_estimation(db: Session):
         "projected_hours": float(weekly_hours_projection)
     }
 
-def get_union_reconciliation_data(db: Session):
+async def get_union_reconciliation_data(db: AsyncSession):
     """
     Reconciles labor actuals with union benefit rates to calculate liabilities.
     For this demo, we map employees to unions based on their ID range.
     """
-    unions = db.query(models.Union).all()
+    unions = (await db.execute(select(models.Union))).scalars().all()
     if not unions:
         return []
         
     results = []
     for union in unions:
         # Get all rates for this union
-        rates = db.query(models.UnionRate).filter(models.UnionRate.union_id == union.id).all()
+        rates = (await db.execute(
+            select(models.UnionRate).where(models.UnionRate.union_id == union.id)
+        )).scalars().all()
         
         # In a real system, we'd filter LaborActual by employees belonging to this union.
         # For demo, we'll assign approx 1/3 of labor to each union.
@@ -146,9 +173,11 @@ def get_union_reconciliation_data(db: Session):
         for rate in rates:
             # Sum hours for the payroll code associated with this benefit rate
             # We mock the volume as a fraction of total labor
-            total_hours = db.query(func.sum(models.LaborActual.hours)).filter(
-                models.LaborActual.payroll_code == rate.payroll_code
-            ).scalar() or 0.0
+            total_hours = (await db.execute(
+                select(func.sum(models.LaborActual.hours)).where(
+                    models.LaborActual.payroll_code == rate.payroll_code
+                )
+            )).scalar() or 0.0
             
             # Allocation factor (1 / number of unions)
             allocation = 1.0 / len(unions)
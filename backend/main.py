@@ -1,23 +1,36 @@
-from fastapi import FastAPI, Depends, HTTPException, File, UploadFile, Request
+from fastapi import FastAPI, Depends, HTTPException, File, UploadFile, Request, Response, Query, BackgroundTasks, Header
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
-from typing import List
+from fastapi.responses import StreamingResponse, FileResponse
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
+from typing import List, Optional, Union
+from datetime import datetime
 import os
-import shutil
+import json
 from pathlib import Path
-import models, schemas, database, labor_service, anomaly_service, ai_agent
-from database import engine, get_db
+import models, schemas, database, migrate, media_storage, media_derivatives, labor_service, anomaly_service, ai_agent, finance_service, reporting_service, response_cache, fast_json, request_metrics, metrics, profiling, labor_rollup, anomaly_stream, bulk_import, timesheet_import, invoice_import
+from database import engine, async_engine, get_db, get_async_db
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
-models.Base.metadata.create_all(bind=engine)
+migrate.upgrade()
 
 app = FastAPI(title="Construction Workflow Control API")
+# Per-request query counts and timings, reported in Server-Timing headers and logs
+app.router.route_class = request_metrics.TimedRoute
+request_metrics.instrument(engine)
+request_metrics.instrument(async_engine.sync_engine)
+metrics.instrument_pool(engine, "sync")
+metrics.instrument_pool(async_engine.sync_engine, "async")
 
-# Mount uploads directory to serve files
-UPLOAD_DIR = Path("uploads")
+# Mount uploads directory to serve files uploaded before the object store
+UPLOAD_DIR = media_storage.UPLOAD_DIR
 UPLOAD_DIR.mkdir(exist_ok=True)
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Content-addressed media, immutable and cacheable forever
+media_storage.OBJECTS_DIR.mkdir(exist_ok=True)
+app.mount(media_storage.MEDIA_URL_PREFIX, media_storage.ImmutableStaticFiles(directory=media_storage.OBJECTS_DIR), name="media")
 
 # Enable CORS for React frontend
 app.add_middleware(
@@ -26,30 +39,88 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursor and delta sync token of the reporting endpoints, validator of the
+    # conditional GETs
+    expose_headers=["X-Next-Cursor", "X-Sync-Token", "ETag"],
 )
 
+# Compress responses larger than GZIP_MINIMUM_SIZE bytes for clients that accept gzip.
+# Images and event streams are excluded by the middleware (already compressed / streamed).
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=int(os.getenv("GZIP_MINIMUM_SIZE", "1024")),
+    compresslevel=int(os.getenv("GZIP_COMPRESS_LEVEL", "6")),
+)
+app.add_middleware(metrics.PrometheusMiddleware)
+app.router.on_shutdown.append(metrics.mark_process_dead)
+# Outermost but for the opt-in profiler, so its timings cover the other middleware
+app.add_middleware(request_metrics.RequestMetricsMiddleware)
+# On-demand profiling of single requests, installed only when PROFILE_TOKEN is set
+if profiling.ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
 @app.get("/")
 def read_root():
     return {"message": "Construction Labor Intelligence API is running"}
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    Prometheus metrics of all worker processes (see metrics)
+    """
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/profiles/{name}", include_in_schema=False)
+def get_profile(name: str, x_profile: Optional[str] = Header(None)):
+    """
+    Downloads a stored request profile (collapsed stacks); needs X-Profile: <PROFILE_TOKEN>
+    """
+    path = profiling.stored(name) if profiling.authorized(x_profile) else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain; charset=utf-8")
+
 @app.get("/labor/productivity", response_model=List[schemas.ProductivityAnalysisSchema])
-def get_productivity(db: Session = Depends(get_db)):
+async def get_productivity(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """
     Returns labor productivity statistics per project
     """
-    return labor_service.get_productivity_stats(db)
+    stats = await response_cache.conditional(
+        request, response, db, "labor/productivity", {}, ("projects", "labor_daily_rollups"),
+        lambda: labor_service.get_productivity_stats(db)
+    )
+    return fast_json.respond(stats, response)
+
+# Number of recent invoices returned per category as chart history
+ANOMALY_HISTORY_POINTS = 100
+# Flagged invoices returned (and sent for AI enrichment) per request
+ANOMALY_PAGE_SIZE = 20
+MAX_ANOMALY_PAGE_SIZE = 200
 
 @app.get("/automation/anomalies", response_model=List[schemas.AnomalyAlertSchema])
-def get_anomalies(db: Session = Depends(get_db)):
-    # Load inflation rate from env
-    inflation_rate = float(os.getenv("ESTIMATED_ANNUAL_INFLATION", "0.05"))
-    
-    # Query invoices from DB
-    invoices_all = db.query(models.Invoice).order_by(models.Invoice.date.asc()).all()
-    invoice_dicts = [{"category": inv.category, "amount": inv.amount} for inv in invoices_all]
+def get_anomalies(
+    refresh: bool = False,
+    limit: int = Query(ANOMALY_PAGE_SIZE, ge=1, le=MAX_ANOMALY_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """
+    Returns the `limit` most recent flagged invoices, each enriched with an AI explanation.
+    """
+    inflation_rate = anomaly_stream.ANNUAL_INFLATION
     
-    # Statistical detection (inflation-aware)
-    anomalies = anomaly_service.detect_expense_anomalies(invoice_dicts, annual_inflation=inflation_rate)
+    # Invoices are scored once on insert (anomaly_stream); this is an indexed read of the flags
+    flagged = db.query(models.Invoice).filter(
+        models.Invoice.anomaly_flag == True
+    ).order_by(models.Invoice.date.desc(), models.Invoice.id.desc()).limit(limit).all()
+    anomalies = [{
+        "category": inv.category,
+        "amount": inv.amount,
+        "history_avg": inv.history_avg or inv.amount,
+        "spike_percentage": inv.spike_percentage or 0.0,
+        "inflation_adjusted_avg": inv.inflation_adjusted_avg,
+        "description": inv.anomaly_description
+    } for inv in flagged]
     
     results = []
     
@@ -63,20 +134,23 @@ def get_anomalies(db: Session = Depends(get_db)):
             "description": f"Detected a spike crossing the {inflation_rate*100}% inflation-adjusted baseline."
         }]
 
-    for a in anomalies:
-        # Get historical points for this category
-        history = [
-            {"date": inv.date.strftime("%Y-%m-%d") if inv.date else "2026-01-01", "amount": inv.amount}
-            for inv in invoices_all if inv.category == a['category']
+    # Recent historical points per flagged category
+    history_by_category = {}
+    for category in {a['category'] for a in anomalies}:
+        recent = db.query(models.Invoice.date, models.Invoice.amount).filter(
+            models.Invoice.category == category
+        ).order_by(models.Invoice.date.desc()).limit(ANOMALY_HISTORY_POINTS).all()
+        history_by_category[category] = [
+            {"date": date.strftime("%Y-%m-%d") if date else "2026-01-01", "amount": amount}
+            for date, amount in reversed(recent)
         ]
-        
-        # Enrich with AI explanation and action (inflation-aware)
-        explanation, suggested_action = ai_agent.analyze_anomaly(
-            a['category'], 
-            a['amount'], 
-            a['history_avg'], 
-            inflation_rate=inflation_rate
-        )
+
+    # Enrich with AI explanation and action (inflation-aware), concurrently and bounded by a deadline
+    # refresh=true bypasses the LLM response cache
+    enrichments = ai_agent.analyze_anomalies(anomalies, inflation_rate=inflation_rate, use_cache=not refresh)
+
+    for a, (explanation, suggested_action) in zip(anomalies, enrichments):
+        history = history_by_category.get(a['category'], [])
         
         results.append({
             "category": a['category'],
@@ -90,8 +164,25 @@ def get_anomalies(db: Session = Depends(get_db)):
     
     return results
 
-@app.post("/agent/insights")
-async def get_agent_insights(view: str = "labor", request: Request = None, db: Session = Depends(get_db)):
+@app.post("/automation/invoices/import", response_model=schemas.ImportReportSchema)
+def import_invoices(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv or ndjson; detected from the file name when omitted"),
+    chunk_size: int = Query(bulk_import.CHUNK_SIZE, ge=100, le=100000)
+):
+    """
+    Bulk-imports vendor invoices (CSV or NDJSON). Duplicates on (vendor, amount, date) are
+    skipped; every chunk is scored for anomalies before it commits.
+    """
+    fmt = format or bulk_import.detect_format(file.filename, file.content_type)
+    if fmt not in bulk_import.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}'")
+    return invoice_import.import_file(engine, file.file, fmt, chunk_size)
+
+async def _insight_request_context(view: str, request: Request, db: AsyncSession):
+    """
+    Builds the (context_data, body_data) pair shared by the insight endpoints.
+    """
     context_data = {}
     
     # Try to get body data if provided (for finance view)
@@ -103,39 +194,73 @@ async def get_agent_insights(view: str = "labor", request: Request = None, db: S
             pass
     
     if view == "labor":
-        billable, overhead, projects = labor_service.get_total_aggregates(db)
+        billable, overhead, projects = await labor_service.get_total_aggregates(db)
         if not projects:
             billable, overhead, projects = 1650.0, 200.0, ["Riverside Plaza", "Downtown Hub"]
         context_data = {"billable": billable, "overhead": overhead, "projects": projects}
         
     elif view == "automation":
-        # Get inflation rate from env
-        inflation_rate = float(os.getenv("ESTIMATED_ANNUAL_INFLATION", "0.05"))
-        invoices_all = db.query(models.Invoice).all()
-        invoice_dicts = [{"category": inv.category, "amount": inv.amount} for inv in invoices_all]
-        anomalies = anomaly_service.detect_expense_anomalies(invoice_dicts, annual_inflation=inflation_rate)
-        context_data = {"anomaly_count": len(anomalies), "categories": list(set([a['category'] for a in anomalies])) if anomalies else ["Fuel"]}
+        # Flags are maintained on insert by anomaly_stream
+        anomaly_count = (await db.execute(
+            select(func.count(models.Invoice.id)).where(models.Invoice.anomaly_flag == True)
+        )).scalar() or 0
+        categories = (await db.execute(
+            select(models.Invoice.category).where(models.Invoice.anomaly_flag == True).distinct()
+        )).scalars().all()
+        context_data = {"anomaly_count": anomaly_count, "categories": categories if anomaly_count else ["Fuel"]}
 
     elif view == "finance":
         # Use body data if provided, otherwise use default
         if body_data:
             context_data = body_data
         else:
-            projects = db.query(models.Project).all()
+            projects = (await db.execute(select(models.Project))).scalars().all()
             over_budget = [p for p in projects if p.actual_hours > p.budget_hours]
             context_data = {"variance_projects": len(over_budget), "total_projects": len(projects)}
 
+    return context_data, body_data
+
+@app.post("/agent/insights")
+async def get_agent_insights(view: str = "labor", refresh: bool = False, request: Request = None, db: AsyncSession = Depends(get_async_db)):
+    context_data, body_data = await _insight_request_context(view, request, db)
+
     # If the user provided a specific question in the body
     query = body_data.get("query")
     history = body_data.get("history")
     
+    # refresh=true (query string or body) bypasses the LLM response cache
+    use_cache = not (refresh or body_data.get("refresh"))
+    
     if query:
-        insight = ai_agent.ask_custom_question(view, context_data, query, history)
+        insight = ai_agent.ask_custom_question(view, context_data, query, history, use_cache=use_cache)
     else:
-        insight = ai_agent.generate_contextual_insight(view, context_data)
+        insight = ai_agent.generate_contextual_insight(view, context_data, use_cache=use_cache)
         
     return {"insight": insight}
 
+@app.post("/agent/insights/stream")
+async def stream_agent_insights(view: str = "labor", refresh: bool = False, request: Request = None, db: AsyncSession = Depends(get_async_db)):
+    """
+    Server-Sent Events variant of /agent/insights.
+    Emits `data: {"token": ...}` events as the model produces them, then an `event: done`.
+    """
+    context_data, body_data = await _insight_request_context(view, request, db)
+    query = body_data.get("query")
+    history = body_data.get("history")
+    use_cache = not (refresh or body_data.get("refresh"))
+
+    def event_stream():
+        for token in ai_agent.stream_insight(view, context_data, query, history, use_cache=use_cache):
+            yield f"data: {json.dumps({'token': token})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    # The sync generator is iterated on the thread pool, so the blocking LLM stream never stalls the event loop
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/agent/config")
 def get_agent_config():
     return {
@@ -143,36 +268,70 @@ def get_agent_config():
         "model": ai_agent.LLM_MODEL
     }
 
+@app.get("/agent/cache")
+def get_agent_cache_stats():
+    """
+    Returns hit/miss counters of the LLM response cache
+    """
+    return ai_agent.cache_stats()
+
+@app.get("/cache/responses")
+def get_response_cache_stats():
+    """
+    Returns hit/miss counters of the dashboard response cache
+    """
+    return response_cache.cache.stats()
+
 
 @app.get("/labor/employees")
-def get_labor_employees(project_id: int = None, db: Session = Depends(get_db)):
+async def get_labor_employees(request: Request, response: Response, project_id: int = None, db: AsyncSession = Depends(get_async_db)):
     """
     Returns employee details, optionally filtered by project
     """
-    print(f"DEBUG: get_labor_employees called with project_id={project_id}, type={type(project_id)}")
-    employees = labor_service.get_employee_details_by_project(db, project_id)
-    print(f"DEBUG: Returned {len(employees)} employees")
-    return {
+    employees = await response_cache.conditional(
+        request, response, db, "labor/employees", {"project_id": project_id}, ("labor_actuals",),
+        lambda: labor_service.get_employee_details_by_project(db, project_id)
+    )
+    return fast_json.respond({
         "employee_count": len(employees),
         "employees": employees
-    }
+    }, response)
 
 @app.get("/labor/payroll-estimation", response_model=schemas.PayrollEstimationSchema)
-def get_payroll_estimation(db: Session = Depends(get_db)):
+async def get_payroll_estimation(db: AsyncSession = Depends(get_async_db)):
     """
     Returns estimated weekly payroll based on recent activity
     """
-    return labor_service.get_payroll_estimation(db)
+    return await labor_service.get_payroll_estimation(db)
 
 @app.get("/labor/union-reconciliation", response_model=List[schemas.UnionReconciliationSchema])
-def get_union_reconciliation(db: Session = Depends(get_db)):
+async def get_union_reconciliation(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """
     Returns union benefit reconciliation and liabilities
     """
-    return labor_service.get_union_reconciliation_data(db)
+    reconciliation = await response_cache.conditional(
+        request, response, db, "labor/union-reconciliation", {}, ("unions", "union_rates", "labor_actuals"),
+        lambda: labor_service.get_union_reconciliation_data(db)
+    )
+    return fast_json.respond(reconciliation, response)
+
+@app.post("/labor/timesheets/import", response_model=schemas.ImportReportSchema)
+def import_timesheets(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv or ndjson; detected from the file name when omitted"),
+    chunk_size: int = Query(timesheet_import.CHUNK_SIZE, ge=100, le=100000)
+):
+    """
+    Bulk-imports timesheet rows (CSV or NDJSON) into labor_actuals in chunked transactions.
+    Invalid rows are skipped and reported by line number.
+    """
+    fmt = format or bulk_import.detect_format(file.filename, file.content_type)
+    if fmt not in bulk_import.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}'")
+    return timesheet_import.import_file(engine, file.file, fmt, chunk_size)
 
 @app.get("/finance/trends")
-def get_financial_trends(db: Session = Depends(get_db)):
+async def get_financial_trends(db: AsyncSession = Depends(get_async_db)):
     """
     Returns historical financial trends for revenue vs expenses
     """
@@ -209,49 +368,137 @@ def get_automation_metrics():
 
 @app.get("/finance/variance", response_model=List[schemas.VarianceAnalysisSchema])
 
-def get_variance(db: Session = Depends(get_db)):
-    # Simple variance logic
-    projects = db.query(models.Project).all()
+async def get_variance(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    variance = await response_cache.conditional(
+        request, response, db, "finance/variance", {}, ("projects", "labor_daily_rollups"),
+        lambda: _compute_variance(db)
+    )
+    return fast_json.respond(variance, response)
+
+async def _compute_variance(db: AsyncSession):
+    # Simple variance logic, actual hours read from the labor rollup
+    projects = (await db.execute(select(models.Project))).scalars().all()
     if not projects:
         return [{"project_name": "Riverside Plaza", "actual_hours": 500.0, "budget_hours": 450.0, "variance": 50.0}]
-        
+    
+    actual_hours = await labor_service.get_project_hours(db)
     return [
         {
             "project_name": p.name,
-            "actual_hours": p.actual_hours,
+            "actual_hours": actual_hours.get(p.id, 0.0),
             "budget_hours": p.budget_hours,
-            "variance": p.actual_hours - p.budget_hours
+            "variance": actual_hours.get(p.id, 0.0) - p.budget_hours
         } for p in projects
     ]
 
-from sqlalchemy.orm import Session, joinedload
+@app.get("/reporting/projects", response_model=Union[List[schemas.ProjectReportingSchema], schemas.ReportingDeltaSchema])
+async def get_reporting_projects(
+    request: Request,
+    response: Response,
+    since: Optional[int] = Query(None, ge=0, description="Sync token; returns only the changes after it"),
+    cursor: Optional[int] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(reporting_service.DEFAULT_PAGE_SIZE, ge=1, le=reporting_service.MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Nested collections to include: events, media (comma-separated, empty for none)"),
+    nested_limit: int = Query(reporting_service.DEFAULT_NESTED_LIMIT, ge=1, le=reporting_service.MAX_NESTED_LIMIT),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Returns a page of projects ordered by id, each with its most recent events and media
+    (at most nested_limit of each, with event_count/media_count totals). The next page's
+    cursor is returned in the X-Next-Cursor header, absent on the last page; older events
+    and media are paged through /reporting/projects/{project_id}/events and /media.
+
+    Every page also carries an X-Sync-Token header. With since=<token>, only the projects,
+    events and media created, changed or deleted after it are returned, together with
+    the next token (ReportingDeltaSchema).
+    """
+    tables = ("projects", "project_events", "project_media")
+    if since is not None:
+        delta = await response_cache.conditional(
+            request, response, db, "reporting/projects/changes", {"since": since}, tables,
+            lambda: reporting_service.get_changes(db, since)
+        )
+        return fast_json.respond(delta, response)
+    try:
+        requested = reporting_service.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/reporting/projects", response_model=List[schemas.ProjectReportingSchema])
-def get_reporting_projects(db: Session = Depends(get_db)):
-    return db.query(models.Project).options(
-        joinedload(models.Project.events),
-        joinedload(models.Project.media)
-    ).all()
+    async def page():
+        # The sync token is read before the page, so it never covers changes the page misses
+        token = await reporting_service.get_sync_token(db)
+        return (token,) + await reporting_service.get_projects_page(db, cursor, limit, requested, nested_limit)
+
+    params = {"cursor": cursor, "limit": limit, "fields": tuple(sorted(requested)), "nested_limit": nested_limit}
+    token, projects, next_cursor = await response_cache.conditional(
+        request, response, db, "reporting/projects", params, tables, page
+    )
+    response.headers["X-Sync-Token"] = str(token)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return fast_json.respond(projects, response)
+
+@app.get("/reporting/projects/{project_id}/events", response_model=List[schemas.ProjectEventSchema])
+async def list_project_events(
+    project_id: int,
+    request: Request,
+    response: Response,
+    cursor: Optional[int] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(reporting_service.DEFAULT_NESTED_LIMIT, ge=1, le=reporting_service.MAX_NESTED_LIMIT),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Returns a page of a project's events, most recently recorded first
+    """
+    events, next_cursor = await response_cache.conditional(
+        request, response, db, "reporting/events", {"project_id": project_id, "cursor": cursor, "limit": limit},
+        ("project_events",),
+        lambda: reporting_service.get_children_page(db, "events", project_id, cursor, limit)
+    )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return fast_json.respond(events, response)
+
+@app.get("/reporting/projects/{project_id}/media", response_model=List[schemas.ProjectMediaSchema])
+async def list_project_media(
+    project_id: int,
+    request: Request,
+    response: Response,
+    cursor: Optional[int] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(reporting_service.DEFAULT_NESTED_LIMIT, ge=1, le=reporting_service.MAX_NESTED_LIMIT),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Returns a page of a project's media, most recently uploaded first
+    """
+    media, next_cursor = await response_cache.conditional(
+        request, response, db, "reporting/media", {"project_id": project_id, "cursor": cursor, "limit": limit},
+        ("project_media",),
+        lambda: reporting_service.get_children_page(db, "media", project_id, cursor, limit)
+    )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return fast_json.respond(media, response)
 
 @app.post("/reporting/projects/{project_id}/events", response_model=schemas.ProjectEventSchema)
-def add_project_event(project_id: int, event: schemas.ProjectEventCreate, db: Session = Depends(get_db)):
+async def add_project_event(project_id: int, event: schemas.ProjectEventCreate, db: AsyncSession = Depends(get_async_db)):
     db_event = models.ProjectEvent(**event.dict(), project_id=project_id)
     db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
+    await db.commit()
+    await db.refresh(db_event)
     return db_event
 
 @app.post("/reporting/projects/{project_id}/media", response_model=schemas.ProjectMediaSchema)
-def add_project_media(project_id: int, media: schemas.ProjectMediaCreate, db: Session = Depends(get_db)):
+async def add_project_media(project_id: int, media: schemas.ProjectMediaCreate, db: AsyncSession = Depends(get_async_db)):
     db_media = models.ProjectMedia(**media.dict(), project_id=project_id)
     db.add(db_media)
-    db.commit()
-    db.refresh(db_media)
+    await db.commit()
+    await db.refresh(db_media)
     return db_media
 
 @app.patch("/reporting/events/{event_id}", response_model=schemas.ProjectEventSchema)
-def update_project_event(event_id: int, event_update: schemas.ProjectEventUpdate, db: Session = Depends(get_db)):
-    db_event = db.query(models.ProjectEvent).filter(models.ProjectEvent.id == event_id).first()
+async def update_project_event(event_id: int, event_update: schemas.ProjectEventUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_event = await db.get(models.ProjectEvent, event_id)
     if not db_event:
         raise HTTPException(status_code=404, detail="Event not found")
     
@@ -259,40 +506,60 @@ def update_project_event(event_id: int, event_update: schemas.ProjectEventUpdate
     for key, value in update_data.items():
         setattr(db_event, key, value)
     
-    db.commit()
-    db.refresh(db_event)
+    await db.commit()
+    await db.refresh(db_event)
     return db_event
 
-@app.post("/reporting/projects/{project_id}/upload", response_model=schemas.ProjectMediaSchema)
-async def upload_project_file(project_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    # Create project specific subfolder
-    project_dir = UPLOAD_DIR / str(project_id)
-    project_dir.mkdir(exist_ok=True)
-    
-    file_path = project_dir / file.filename
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
+# The body is parsed by media_storage.receive_upload, so the form is described here
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"file": {"type": "string", "format": "binary"}},
+            "required": ["file"],
+        }}},
+    }
+}
+
+@app.post("/reporting/projects/{project_id}/upload", response_model=schemas.ProjectMediaSchema, openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_project_file(project_id: int, request: Request, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
+    """
+    Stores the `file` field of a multipart upload in the content-addressed media store;
+    identical bytes are stored once and shared between projects. The body is streamed
+    straight into the store in chunks written on the thread pool, and rejected with 413
+    past MAX_UPLOAD_BYTES (before reading it when Content-Length is already too large).
+    Images get WebP thumbnail and preview derivatives in the background; their URLs
+    appear on the media once generated.
+    """
+    try:
+        filename, stored = await media_storage.receive_upload(request)
+    except media_storage.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     # Determine type based on extension
-    ext = file.filename.split(".")[-1].lower()
+    ext = filename.split(".")[-1].lower()
     file_type = "image" if ext in ["jpg", "jpeg", "png", "gif", "webp"] else "document"
     
-    # Correct URL for frontend access
-    file_url = f"/uploads/{project_id}/{file.filename}"
-    
     db_media = models.ProjectMedia(
         project_id=project_id,
-        filename=file.filename,
+        filename=filename,
         file_type=file_type,
-        url=file_url
+        url=stored.url,
+        size_bytes=stored.size,
+        sha256=stored.sha256
     )
     db.add(db_media)
-    db.commit()
-    db.refresh(db_media)
+    await db.commit()
+    await db.refresh(db_media)
+    if file_type == "image":
+        background_tasks.add_task(media_derivatives.process_media, db_media.id, stored.path, stored.sha256)
     return db_media
 
 @app.post("/reporting/projects", response_model=schemas.ProjectReportingSchema)
-def create_project(project: schemas.ProjectCreate, db: Session = Depends(get_db)):
+async def create_project(project: schemas.ProjectCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Create a new project
     """
@@ -309,12 +576,22 @@ def create_project(project: schemas.ProjectCreate, db: Session = Depends(get_db)
         status_notes=project.status_notes
     )
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    # Load the (empty) collections too, lazy loading is not available on async sessions
+    await db.refresh(db_project, attribute_names=["events", "media"])
     return db_project
 
 @app.get("/finance/project-analytics")
-def get_project_financial_analytics(db: Session = Depends(get_db)):
+async def get_project_financial_analytics(
+    request: Request,
+    response: Response,
+    project_id: Optional[List[int]] = Query(None),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Returns comprehensive financial analytics for all projects including:
     - Total revenue (sum of payment events)
@@ -323,70 +600,28 @@ def get_project_financial_analytics(db: Session = Depends(get_db)):
     - Overhead hours cost (overhead_hours * rate)
     - Net profit/loss
     - Profit margin percentage
+
+    Optionally filtered by project ids and an event/labor date range, and paginated
+    with skip/limit (ordered by project id).
     """
-    projects = db.query(models.Project).all()
-    analytics = []
-    
-    for project in projects:
-        # Calculate revenues from payment events
-        payments = db.query(func.sum(models.ProjectEvent.amount)).filter(
-            models.ProjectEvent.project_id == project.id,
-            models.ProjectEvent.event_type == 'payment'
-        ).scalar() or 0
-        
-        # Calculate expenses from expense events
-        expenses = db.query(func.sum(models.ProjectEvent.amount)).filter(
-            models.ProjectEvent.project_id == project.id,
-            models.ProjectEvent.event_type == 'expense'
-        ).scalar() or 0
-        
-        # Get expense breakdown by category
-        expense_categories = db.query(
-            models.ProjectEvent.category,
-            func.sum(models.ProjectEvent.amount).label('total')
-        ).filter(
-            models.ProjectEvent.project_id == project.id,
-            models.ProjectEvent.event_type == 'expense'
-        ).group_by(models.ProjectEvent.category).all()
-        
-        expense_breakdown = {cat: total for cat, total in expense_categories if cat}
-        
-        
-        # Calculate labor costs from LaborActual table
-        labor_data = db.query(models.LaborActual).filter(
-            models.LaborActual.project_id == project.id
-        ).all()
-        
-        billable_hours = sum(l.hours for l in labor_data if l.is_billable)
-        overhead_hours = sum(l.hours for l in labor_data if not l.is_billable)
-        
-        # Assume $85/hr average rate
-        HOURLY_RATE = 85
-        billable_cost = billable_hours * HOURLY_RATE
-        overhead_cost = overhead_hours * HOURLY_RATE
-        labor_cost = billable_cost + overhead_cost
-        
-        # Calculate profit
-        total_costs = expenses + labor_cost
-        net_profit = payments - total_costs
-        profit_margin = (net_profit / payments * 100) if payments > 0 else 0
-        
-        analytics.append({
-            "project_id": project.id,
-            "project_name": project.name,
-            "revenue": float(payments),
-            "expenses": float(expenses),
-            "expense_breakdown": {k: float(v) for k, v in expense_breakdown.items()},
-            "labor_cost": float(labor_cost),
-            "billable_cost": float(billable_cost),
-            "overhead_cost": float(overhead_cost),
-            "billable_hours": float(billable_hours),
-            "overhead_hours": float(overhead_hours),
-            "total_costs": float(total_costs),
-            "net_profit": float(net_profit),
-            "profit_margin": float(profit_margin)
-        })
-    
-    return analytics
+    params = {
+        "project_id": tuple(project_id or ()),
+        "start_date": start_date,
+        "end_date": end_date,
+        "skip": skip,
+        "limit": limit
+    }
+    analytics = await response_cache.conditional(
+        request, response, db, "finance/project-analytics", params, ("projects", "project_events", "labor_daily_rollups"),
+        lambda: finance_service.get_project_financial_analytics(
+            db,
+            project_ids=project_id,
+            start_date=start_date,
+            end_date=end_date,
+            skip=skip,
+            limit=limit
+        )
+    )
+    return fast_json.respond(analytics, response)
 
 # Force reload 1769797246.7949042
\ No newline at end of file
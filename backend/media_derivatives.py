@@ -0,0 +1,153 @@
+"""
+WebP thumbnail and preview derivatives of uploaded project images.
+
+Derivatives are generated in a process pool after the upload response has been sent, so
+decoding and resizing 12 MB phone photos never holds an API worker. They are stored next
+to their source object as <sha256>-<size>.webp; being derived from immutable content they
+are immutable too and served with the same cache headers (media_storage).
+
+Images uploaded before the pipeline existed are processed with
+`python media_derivatives.py backfill`.
+"""
+import os
+import sys
+import asyncio
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+from PIL import Image, ImageOps
+from sqlalchemy import select
+import models, media_storage
+from database import AsyncSessionLocal
+
+# Name -> longest edge in pixels
+SIZES = {"thumbnail": 320, "preview": 1600}
+WEBP_QUALITY = int(os.getenv("MEDIA_WEBP_QUALITY", "80"))
+DERIVATIVE_WORKERS = int(os.getenv("MEDIA_DERIVATIVE_WORKERS", "2"))
+# Decompression bomb guard; phone photos are well under this
+Image.MAX_IMAGE_PIXELS = int(os.getenv("MEDIA_MAX_IMAGE_PIXELS", str(100_000_000)))
+
+logger = logging.getLogger("media_derivatives")
+
+_pool = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=DERIVATIVE_WORKERS)
+    return _pool
+
+def derivative_suffix(size: str) -> str:
+    return f"-{size}.webp"
+
+def generate_derivatives(source: str, sha256: str, root: str = str(media_storage.OBJECTS_DIR)) -> Dict[str, str]:
+    """
+    Writes every SIZES derivative of `source` that does not exist yet and returns
+    {size: url}. Runs in a pool worker; the image is decoded once and downscaled from the
+    largest size to the smallest.
+    """
+    paths = {size: media_storage.object_path(sha256, derivative_suffix(size), Path(root)) for size in SIZES}
+    missing = [size for size, path in paths.items() if not path.exists()]
+    if missing:
+        with Image.open(source) as image:
+            # Phones store orientation in EXIF; bake it in, WebP output drops the tag
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+            for size in sorted(missing, key=SIZES.get, reverse=True):
+                image.thumbnail((SIZES[size], SIZES[size]), Image.LANCZOS)
+                _save_webp(image, paths[size])
+    return {size: media_storage.object_url(sha256, derivative_suffix(size)) for size in SIZES}
+
+def _save_webp(image, path: Path):
+    # A unique temporary name: tasks for the same content hash (deduplicated uploads) can
+    # run at once, and each renames its own complete file into place
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            image.save(tmp, "WEBP", quality=WEBP_QUALITY, method=4)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+async def generate_in_pool(source: Path, sha256: str) -> Dict[str, str]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), generate_derivatives, str(source), sha256)
+
+async def process_media(media_id: int, source: Path, sha256: str):
+    """
+    Background task after an image upload: generates the derivatives and stores their URLs
+    on every ProjectMedia row referencing the same object.
+    """
+    try:
+        urls = await generate_in_pool(source, sha256)
+    except Exception as e:
+        # Undecodable or oversized images keep serving the original
+        logger.warning("media %s: derivatives not generated: %s", media_id, e)
+        return
+    async with AsyncSessionLocal() as db:
+        # Through the ORM so the change reaches delta sync clients (reporting_changes)
+        rows = (await db.execute(
+            select(models.ProjectMedia).where(models.ProjectMedia.sha256 == sha256)
+        )).scalars().all()
+        for media in rows:
+            media.thumbnail_url = urls["thumbnail"]
+            media.preview_url = urls["preview"]
+        await db.commit()
+
+def backfill(db):
+    """
+    Generates derivatives for stored images that have none. Returns the number of rows updated.
+    """
+    rows = db.query(models.ProjectMedia).filter(
+        models.ProjectMedia.file_type == "image",
+        models.ProjectMedia.sha256.isnot(None),
+        models.ProjectMedia.thumbnail_url.is_(None)
+    ).all()
+    by_hash = {}
+    for media in rows:
+        by_hash.setdefault(media.sha256, []).append(media)
+
+    updated = 0
+    with ProcessPoolExecutor(max_workers=DERIVATIVE_WORKERS) as pool:
+        futures = {
+            sha256: pool.submit(generate_derivatives, str(_object_file(sha256, media[0].url)), sha256)
+            for sha256, media in by_hash.items()
+        }
+        for sha256, future in futures.items():
+            try:
+                urls = future.result()
+            except Exception as e:
+                print(f"  skipped {sha256}: {e}")
+                continue
+            for media in by_hash[sha256]:
+                media.thumbnail_url = urls["thumbnail"]
+                media.preview_url = urls["preview"]
+                updated += 1
+    db.commit()
+    return updated
+
+def _object_file(sha256: str, url: Optional[str]) -> Path:
+    return media_storage.object_path(sha256, os.path.splitext(url or "")[1])
+
+if __name__ == "__main__":
+    from database import SessionLocal
+    import migrate
+
+    if len(sys.argv) < 2 or sys.argv[1] != "backfill":
+        print("Usage: python media_derivatives.py backfill")
+        sys.exit(1)
+
+    migrate.upgrade()
+    db = SessionLocal()
+    try:
+        print("Generating image derivatives...")
+        print(f"Done: {backfill(db)} media rows updated.")
+    finally:
+        db.close()
@@ -0,0 +1,324 @@
+"""
+Content-addressed disk storage for uploaded project media.
+
+Files are stored once per distinct content under uploads/objects/<aa>/<sha256><ext>, where
+<aa> is the first two hex digits of the hash, and served from /media/<aa>/<sha256><ext>.
+Identical bytes uploaded to several projects share one object; ProjectMedia rows reference
+it by hash. Since an object URL can never change content, it is served with a far-future
+immutable Cache-Control and the hash as a strong ETag.
+
+Uploads are read straight from the request body: receive_upload parses the multipart
+stream itself, so Starlette never spools the file, and hands the bytes of the file field
+to an ObjectWriter in UPLOAD_CHUNK_SIZE blocks written on the thread pool. The writer goes
+to a temporary file in the object directory, enforces MAX_UPLOAD_BYTES as the bytes arrive
+(a Content-Length already over the limit is refused before any of the body is read),
+hashes them on the way through and is renamed into place only once complete; readers
+never see a partial object and each accepted file is written to disk once.
+
+Files uploaded before the store existed (uploads/<project_id>/<filename>) are moved into it
+with `python media_storage.py import-legacy`.
+"""
+import os
+import re
+import sys
+import hashlib
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Tuple
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+from starlette.staticfiles import StaticFiles, NotModifiedResponse
+from starlette.responses import FileResponse
+from starlette.datastructures import Headers
+import models
+import metrics
+
+UPLOAD_DIR = Path("uploads")
+OBJECTS_DIR = UPLOAD_DIR / "objects"
+MEDIA_URL_PREFIX = "/media"
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(1024 * 1024 * 1024)))
+# Room for multipart boundaries, part headers and small form fields around the file
+MULTIPART_OVERHEAD = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_SUFFIX = re.compile(r"^\.[a-z0-9]{1,10}$")
+# <sha256>[-<derivative>][.<ext>]
+_OBJECT_NAME = re.compile(r"^([0-9a-f]{64}(?:-[a-z]+)?)(\.[a-z0-9]{1,10})?$")
+
+class UploadTooLarge(ValueError):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the {max_bytes:,} byte limit")
+        self.max_bytes = max_bytes
+
+class UploadError(ValueError):
+    """The request body is not a multipart form carrying the expected file."""
+
+@dataclass
+class StoredFile:
+    path: Path
+    url: str
+    size: int
+    sha256: str
+    # False when identical bytes were already stored
+    created: bool
+
+def safe_filename(filename: str) -> str:
+    """Strips directory components so a client-supplied name cannot escape the upload dir."""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    if name in ("", ".", ".."):
+        raise ValueError("Invalid file name")
+    return name
+
+def object_suffix(filename: str) -> str:
+    """Lower-cased extension kept on the object so it is served with the right content type."""
+    suffix = os.path.splitext(filename or "")[1].lower()
+    return suffix if _SUFFIX.match(suffix) else ""
+
+def object_path(sha256: str, suffix: str = "", root: Path = OBJECTS_DIR) -> Path:
+    return root / sha256[:2] / f"{sha256}{suffix}"
+
+def object_url(sha256: str, suffix: str = "") -> str:
+    return f"{MEDIA_URL_PREFIX}/{sha256[:2]}/{sha256}{suffix}"
+
+class ObjectWriter:
+    """
+    Writes one object incrementally: write() its bytes in order, then commit() to move it
+    into the store under its hash, or discard() to drop it. Raises UploadTooLarge once more
+    than max_bytes have been written.
+    """
+
+    def __init__(self, suffix: str = "", max_bytes: int = MAX_UPLOAD_BYTES, root: Path = OBJECTS_DIR):
+        root.mkdir(parents=True, exist_ok=True)
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.root = root
+        self.size = 0
+        self._digest = hashlib.sha256()
+        fd, self._tmp_name = tempfile.mkstemp(dir=root, prefix=".upload-", suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(self.max_bytes)
+        self._digest.update(chunk)
+        self._file.write(chunk)
+
+    def commit(self) -> StoredFile:
+        """Moves the object into place; when it already exists the copy is discarded."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        sha256 = self._digest.hexdigest()
+        path = object_path(sha256, self.suffix, self.root)
+        created = not path.exists()
+        if created:
+            path.parent.mkdir(exist_ok=True)
+            # Concurrent uploads of the same bytes replace each other with identical content
+            os.replace(self._tmp_name, path)
+        else:
+            os.unlink(self._tmp_name)
+        return StoredFile(path=path, url=object_url(sha256, self.suffix), size=self.size, sha256=sha256, created=created)
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.unlink(self._tmp_name)
+        except FileNotFoundError:
+            pass
+
+def store_object(source, suffix: str = "", max_bytes: int = MAX_UPLOAD_BYTES,
+                 chunk_size: int = UPLOAD_CHUNK_SIZE, root: Path = OBJECTS_DIR) -> StoredFile:
+    """
+    Copies a binary stream into the object store, computing its SHA-256 on the way.
+    When the object already exists the copy is discarded. Raises UploadTooLarge (leaving
+    nothing behind) once more than max_bytes have been read.
+    """
+    writer = ObjectWriter(suffix, max_bytes, root)
+    try:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            writer.write(chunk)
+        return writer.commit()
+    except BaseException:
+        writer.discard()
+        raise
+
+class _MultipartUpload:
+    """python-multipart callbacks collecting the bytes of one file field for an ObjectWriter."""
+
+    def __init__(self, field: str, max_bytes: int):
+        self.field = field.encode()
+        self.max_bytes = max_bytes
+        self.filename = None
+        self.writer = None
+        self.pending = bytearray()
+        self._in_file = False
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if options.get(b"name") != self.field or b"filename" not in options or self.writer is not None:
+            return
+        # Checked before any of the file is stored
+        self.filename = safe_filename(options[b"filename"].decode("utf-8", "replace"))
+        self.writer = ObjectWriter(object_suffix(self.filename), self.max_bytes)
+        self._in_file = True
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            if self.writer.size + len(self.pending) + (end - start) > self.max_bytes:
+                raise UploadTooLarge(self.max_bytes)
+            self.pending += data[start:end]
+
+    def on_part_end(self):
+        self._in_file = False
+
+    async def flush(self):
+        if self.pending:
+            chunk = bytes(self.pending)
+            self.pending.clear()
+            await run_in_threadpool(self.writer.write, chunk)
+
+async def receive_upload(request, field: str = "file", max_bytes: int = MAX_UPLOAD_BYTES,
+                         chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[str, StoredFile]:
+    """
+    Streams the `field` file of a multipart/form-data request into the object store.
+    Returns (client file name, stored object). Raises UploadTooLarge past max_bytes and
+    ValueError (UploadError, or a multipart parse error) for a malformed body or bad file name.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadError("Expected a multipart/form-data body")
+
+    body_limit = max_bytes + MULTIPART_OVERHEAD
+    start = time.perf_counter()
+    upload = _MultipartUpload(field, max_bytes)
+    try:
+        length = request.headers.get("content-length", "")
+        if length.isdigit() and int(length) > body_limit:
+            raise UploadTooLarge(max_bytes)
+        parser = MultipartParser(boundary, upload.callbacks())
+        received = 0
+        try:
+            async for chunk in request.stream():
+                received += len(chunk)
+                # Bounds bodies without a Content-Length, whatever fields they carry
+                if received > body_limit:
+                    raise UploadTooLarge(max_bytes)
+                parser.write(chunk)
+                if len(upload.pending) >= chunk_size:
+                    await upload.flush()
+            parser.finalize()
+            if upload.writer is None:
+                raise UploadError(f"Missing file field '{field}'")
+            await upload.flush()
+            stored = await run_in_threadpool(upload.writer.commit)
+        except BaseException:
+            if upload.writer is not None:
+                upload.writer.discard()
+            raise
+    except UploadTooLarge:
+        metrics.UPLOAD_REJECTED.inc()
+        raise
+    metrics.UPLOAD_SECONDS.observe(time.perf_counter() - start)
+    metrics.UPLOAD_BYTES.observe(stored.size)
+    return upload.filename, stored
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    Serves the object store. The file name is the content hash (plus the derivative name
+    for image derivatives), so the ETag is strong and the response may be cached forever.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        match = _OBJECT_NAME.match(os.path.basename(full_path))
+        if not match:
+            return super().file_response(full_path, stat_result, scope, status_code)
+        headers = {"ETag": f'"{match.group(1)}"', "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+def import_legacy(db):
+    """
+    Moves files referenced by /uploads/<project_id>/<filename> media URLs into the object
+    store and points the rows at it. Duplicate files collapse into one object. The legacy
+    files are deleted only once the rows are committed, so a failed run can be repeated.
+    Returns (rows updated, bytes freed by deduplication).
+    """
+    updated = 0
+    freed = 0
+    moved = {}  # legacy path -> StoredFile, several rows may share a file
+    legacy = db.query(models.ProjectMedia).filter(models.ProjectMedia.url.like("/uploads/%")).all()
+    for media in legacy:
+        path = UPLOAD_DIR / media.url[len("/uploads/"):]
+        stored = moved.get(path)
+        if stored is None:
+            if not path.is_file():
+                print(f"  missing: {path}")
+                continue
+            with path.open("rb") as f:
+                stored = store_object(f, object_suffix(media.filename), max_bytes=sys.maxsize)
+            if not stored.created:
+                freed += stored.size
+            moved[path] = stored
+        media.url = stored.url
+        media.sha256 = stored.sha256
+        media.size_bytes = stored.size
+        updated += 1
+    db.commit()
+    for path in moved:
+        path.unlink()
+    return updated, freed
+
+if __name__ == "__main__":
+    from database import SessionLocal
+    import migrate
+
+    if len(sys.argv) < 2 or sys.argv[1] != "import-legacy":
+        print("Usage: python media_storage.py import-legacy")
+        sys.exit(1)
+
+    migrate.upgrade()
+    db = SessionLocal()
+    try:
+        print("Moving legacy uploads into the object store...")
+        updated, freed = import_legacy(db)
+        print(f"Done: {updated} files moved, {freed:,} bytes deduplicated.")
+    finally:
+        db.close()
@@ -0,0 +1,127 @@
+"""
+Prometheus metrics, served at GET /metrics.
+
+  http_request_duration_seconds{method,route,status}  request latency per route template
+  http_requests_in_flight                             requests being served
+  db_pool_checkout_seconds{engine}                    wait for a pooled connection (sync/async)
+  llm_request_duration_seconds{provider,model}        LLM call latency (whole stream for streams)
+  llm_request_errors_total{provider,model}            failed LLM calls
+  upload_size_bytes / upload_duration_seconds         stored project uploads
+  upload_rejected_total                               uploads over MAX_UPLOAD_BYTES
+  cache_requests_total{cache,result}                  response/etag/llm cache hits and misses;
+                                                      hit ratio = hit / (hit + miss) in PromQL
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty directory shared by
+the workers (and wiped before each server start). Each process then writes its samples
+there and /metrics aggregates all of them, whichever worker serves the scrape.
+"""
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"]
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served", multiprocess_mode="livesum")
+POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Time to obtain a database connection from the pool", ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+)
+LLM_SECONDS = Histogram(
+    "llm_request_duration_seconds", "LLM call latency", ["provider", "model"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+)
+LLM_ERRORS = Counter("llm_request_errors_total", "Failed LLM calls", ["provider", "model"])
+UPLOAD_BYTES = Histogram(
+    "upload_size_bytes", "Size of stored project uploads",
+    buckets=tuple(2 ** n for n in range(16, 31, 2))  # 64 KiB .. 1 GiB
+)
+UPLOAD_SECONDS = Histogram(
+    "upload_duration_seconds", "Time to stream a project upload into the media store",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+)
+UPLOAD_REJECTED = Counter("upload_rejected_total", "Uploads rejected for exceeding MAX_UPLOAD_BYTES")
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups", ["cache", "result"])
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+@contextmanager
+def llm_call(provider: str, model: str):
+    """Times an LLM call; an exception counts as an error and propagates."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        LLM_ERRORS.labels(provider, model).inc()
+        raise
+    finally:
+        LLM_SECONDS.labels(provider, model).observe(time.perf_counter() - start)
+
+def instrument_pool(engine, name: str):
+    """Observes the time `engine` (a sync Engine) takes to hand out pooled connections."""
+    pool = engine.pool
+    connect = pool.connect
+    histogram = POOL_CHECKOUT_SECONDS.labels(name)
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            histogram.observe(time.perf_counter() - start)
+    pool.connect = timed_connect
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Mounted apps (static media) have no route; their mount path is the root_path suffix
+    mount = scope.get("root_path", "")[len(scope.get("app_root_path", "")):]
+    return f"{mount}/{{path}}" if mount else "unmatched"
+
+class PrometheusMiddleware:
+    """ASGI middleware recording request latency per route template and in-flight requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_FLIGHT.dec()
+            REQUEST_SECONDS.labels(scope["method"], _route_label(scope), str(status)).observe(time.perf_counter() - start)
+
+def mark_process_dead():
+    """Drops this worker's live gauge samples (in-flight requests); run at application shutdown."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+def render():
+    """(body, content type) of the current metrics, aggregated over worker processes if enabled."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
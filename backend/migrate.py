@@ -0,0 +1,39 @@
+"""
+Applies the Alembic migration chain in migrations/ to the configured database.
+
+main.py runs upgrade() at startup in place of metadata.create_all. A database created by
+create_all before migrations existed has tables but no alembic_version; it is stamped at
+the initial revision first so the later revisions apply on top of it.
+
+Usage: python migrate.py [revision]   (defaults to head; `alembic` works too)
+"""
+import os
+import sys
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from database import engine
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INITIAL_REVISION = "0001"
+
+def get_config(connection=None) -> Config:
+    config = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BASE_DIR, "migrations"))
+    # Keep the application's logging setup when running inside the app
+    config.attributes["configure_logger"] = False
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+def upgrade(revision: str = "head"):
+    with engine.begin() as connection:
+        config = get_config(connection)
+        tables = set(inspect(connection).get_table_names())
+        if tables and "alembic_version" not in tables:
+            command.stamp(config, INITIAL_REVISION)
+        command.upgrade(config, revision)
+
+if __name__ == "__main__":
+    upgrade(sys.argv[1] if len(sys.argv) > 1 else "head")
+    print("Database is up to date.")
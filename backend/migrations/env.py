@@ -0,0 +1,41 @@
+from logging.config import fileConfig
+from alembic import context
+import database
+import models
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+def run_migrations_offline():
+    context.configure(
+        url=database.SQLALCHEMY_DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    # migrate.upgrade() passes its own connection; the alembic CLI uses the app engine
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with database.engine.connect() as connection:
+        _run(connection)
+
+def _run(connection):
+    # Batch mode lets later migrations alter columns on SQLite (table copy-and-move)
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
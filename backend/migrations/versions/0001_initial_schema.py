@@ -0,0 +1,111 @@
+"""Initial schema (as created by metadata.create_all before migrations existed)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "unions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("description", sa.String()),
+    )
+    op.create_index("ix_unions_id", "unions", ["id"])
+    op.create_index("ix_unions_name", "unions", ["name"], unique=True)
+
+    op.create_table(
+        "union_rates",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("union_id", sa.Integer(), sa.ForeignKey("unions.id")),
+        sa.Column("payroll_code", sa.String()),
+        sa.Column("rate", sa.Float()),
+        sa.Column("benefit_type", sa.String()),
+    )
+    op.create_index("ix_union_rates_id", "union_rates", ["id"])
+    op.create_index("ix_union_rates_payroll_code", "union_rates", ["payroll_code"])
+
+    op.create_table(
+        "projects",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("location", sa.String()),
+        sa.Column("manager", sa.String()),
+        sa.Column("total_budget", sa.Float()),
+        sa.Column("budget_hours", sa.Float()),
+        sa.Column("actual_hours", sa.Float()),
+        sa.Column("status_notes", sa.String()),
+        sa.Column("start_date", sa.DateTime()),
+        sa.Column("original_completion_date", sa.DateTime()),
+        sa.Column("estimated_completion_date", sa.DateTime()),
+    )
+    op.create_index("ix_projects_id", "projects", ["id"])
+    op.create_index("ix_projects_name", "projects", ["name"])
+
+    op.create_table(
+        "labor_actuals",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("project_id", sa.Integer(), sa.ForeignKey("projects.id")),
+        sa.Column("employee_id", sa.String()),
+        sa.Column("date", sa.DateTime()),
+        sa.Column("hours", sa.Float()),
+        sa.Column("payroll_code", sa.String()),
+        sa.Column("is_billable", sa.Boolean()),
+    )
+    op.create_index("ix_labor_actuals_id", "labor_actuals", ["id"])
+
+    op.create_table(
+        "dispatcher_data",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("project_id", sa.Integer(), sa.ForeignKey("projects.id")),
+        sa.Column("scheduled_date", sa.DateTime()),
+        sa.Column("scheduled_hours", sa.Float()),
+    )
+    op.create_index("ix_dispatcher_data_id", "dispatcher_data", ["id"])
+
+    op.create_table(
+        "project_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("project_id", sa.Integer(), sa.ForeignKey("projects.id")),
+        sa.Column("title", sa.String()),
+        sa.Column("date", sa.DateTime()),
+        sa.Column("event_type", sa.String()),
+        sa.Column("category", sa.String(), nullable=True),
+        sa.Column("amount", sa.Float(), nullable=True),
+    )
+    op.create_index("ix_project_events_id", "project_events", ["id"])
+
+    op.create_table(
+        "project_media",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("project_id", sa.Integer(), sa.ForeignKey("projects.id")),
+        sa.Column("filename", sa.String()),
+        sa.Column("file_type", sa.String()),
+        sa.Column("url", sa.String()),
+    )
+    op.create_index("ix_project_media_id", "project_media", ["id"])
+
+    op.create_table(
+        "invoices",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("vendor", sa.String()),
+        sa.Column("category", sa.String()),
+        sa.Column("amount", sa.Float()),
+        sa.Column("date", sa.DateTime()),
+        sa.Column("anomaly_flag", sa.Boolean()),
+        sa.Column("anomaly_description", sa.String()),
+    )
+    op.create_index("ix_invoices_id", "invoices", ["id"])
+
+def downgrade():
+    for table in ("invoices", "project_media", "project_events", "dispatcher_data",
+                  "labor_actuals", "projects", "union_rates", "unions"):
+        op.drop_table(table)
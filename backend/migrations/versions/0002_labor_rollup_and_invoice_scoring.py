@@ -0,0 +1,184 @@
+"""Labor daily rollup, invoice category statistics and stored anomaly baselines
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+
+Databases created with metadata.create_all after these models were added may already
+have some of these objects, so each step checks first.
+
+The labor rollup and the invoice scores (flags, baselines and the category statistics
+they come from) are backfilled here. Offline (--sql) runs cannot score invoices; run
+`python anomaly_stream.py rescore` after applying their script.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Offline (--sql) runs cannot inspect and assume a database at revision 0001
+    inspector = None if op.get_context().as_sql else sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names()) if inspector else set()
+
+    def has_index(table, name):
+        return inspector is not None and any(ix["name"] == name for ix in inspector.get_indexes(table))
+
+    if "labor_daily_rollups" not in tables:
+        op.create_table(
+            "labor_daily_rollups",
+            sa.Column("project_id", sa.Integer(), sa.ForeignKey("projects.id"), primary_key=True),
+            sa.Column("is_billable", sa.Boolean(), primary_key=True),
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("hours", sa.Float()),
+            sa.Column("entry_count", sa.Integer()),
+        )
+        _backfill_labor_rollup()
+
+    created_stats = "invoice_category_stats" not in tables
+    if created_stats:
+        op.create_table(
+            "invoice_category_stats",
+            sa.Column("category", sa.String(), primary_key=True),
+            sa.Column("count", sa.Integer()),
+            sa.Column("mean", sa.Float()),
+            sa.Column("m2", sa.Float()),
+            sa.Column("raw_mean", sa.Float()),
+        )
+
+    columns = {c["name"] for c in inspector.get_columns("invoices")} if inspector else set()
+    with op.batch_alter_table("invoices") as batch:
+        for name in ("history_avg", "inflation_adjusted_avg", "spike_percentage"):
+            if name not in columns:
+                batch.add_column(sa.Column(name, sa.Float(), nullable=True))
+
+    if not has_index("invoices", "ix_invoices_anomaly_flag"):
+        op.create_index("ix_invoices_anomaly_flag", "invoices", ["anomaly_flag"])
+    if not has_index("invoices", "ix_invoices_vendor_date"):
+        op.create_index("ix_invoices_vendor_date", "invoices", ["vendor", "date"])
+
+    if created_stats and inspector is not None:
+        _backfill_invoice_scores()
+
+def _backfill_labor_rollup():
+    labor = sa.table(
+        "labor_actuals",
+        sa.column("project_id"), sa.column("is_billable"), sa.column("date"), sa.column("hours")
+    )
+    rollup = sa.table(
+        "labor_daily_rollups",
+        sa.column("project_id"), sa.column("is_billable"), sa.column("day"), sa.column("hours"), sa.column("entry_count")
+    )
+    projects = sa.table("projects", sa.column("id"), sa.column("actual_hours"))
+    billable = sa.func.coalesce(labor.c.is_billable, sa.true())
+    day = sa.func.date(labor.c.date)
+    op.execute(
+        rollup.insert().from_select(
+            ["project_id", "is_billable", "day", "hours", "entry_count"],
+            sa.select(labor.c.project_id, billable, day, sa.func.sum(labor.c.hours), sa.func.count())
+            .where(labor.c.project_id.isnot(None), labor.c.date.isnot(None))
+            .group_by(labor.c.project_id, billable, day)
+        )
+    )
+    op.execute(
+        projects.update().values(
+            actual_hours=sa.func.coalesce(
+                sa.select(sa.func.sum(rollup.c.hours))
+                .where(rollup.c.project_id == projects.c.id)
+                .scalar_subquery(),
+                0.0
+            )
+        )
+    )
+
+def _backfill_invoice_scores(batch_size=50000):
+    """
+    Replays the stored invoices in date order through the running statistics, as
+    `python anomaly_stream.py rescore` does, with the vectorized scoring invoice_import uses.
+    """
+    import math
+    import datetime
+    import numpy as np
+    import anomaly_service
+    import anomaly_stream
+
+    invoices = sa.table(
+        "invoices",
+        sa.column("id", sa.Integer()), sa.column("category", sa.String()), sa.column("amount", sa.Float()),
+        sa.column("date", sa.DateTime()), sa.column("anomaly_flag", sa.Boolean()),
+        sa.column("anomaly_description", sa.String()), sa.column("history_avg", sa.Float()),
+        sa.column("inflation_adjusted_avg", sa.Float()), sa.column("spike_percentage", sa.Float())
+    )
+    stats = sa.table(
+        "invoice_category_stats",
+        sa.column("category"), sa.column("count"), sa.column("mean"), sa.column("m2"), sa.column("raw_mean")
+    )
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(invoices.c.id, invoices.c.category, invoices.c.amount, invoices.c.date)
+        .where(invoices.c.category.isnot(None))
+        .order_by(invoices.c.date.asc(), invoices.c.id.asc())
+    ).all()
+    if not rows:
+        return
+
+    categories = sorted({row.category for row in rows})
+    code_of = {category: code for code, category in enumerate(categories)}
+    count = np.zeros(len(categories), dtype=np.int64)
+    mean, m2, raw_mean = (np.zeros(len(categories)) for _ in range(3))
+    # Like the ORM path: undated invoices count as dated now, missing amounts as 0
+    now = datetime.datetime.utcnow()
+    score_invoice = invoices.update().where(invoices.c.id == sa.bindparam("b_id")).values(
+        anomaly_flag=sa.bindparam("b_flag"), anomaly_description=sa.bindparam("b_description"),
+        history_avg=sa.bindparam("b_history"), inflation_adjusted_avg=sa.bindparam("b_adjusted"),
+        spike_percentage=sa.bindparam("b_spike")
+    )
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        amounts = [row.amount or 0.0 for row in batch]
+        dates = [row.date or now for row in batch]
+        growth_of = {date: anomaly_stream.growth(date) for date in set(dates)}
+        result = anomaly_service.score_against_running_stats(
+            np.array([code_of[row.category] for row in batch], dtype=np.int64),
+            np.array(amounts, dtype=np.float64),
+            np.array([growth_of[date] for date in dates], dtype=np.float64),
+            count, mean, m2, raw_mean
+        )
+        count, mean, m2, raw_mean = (result["stats"][key] for key in ("count", "mean", "m2", "raw_mean"))
+
+        params = []
+        for row, amount, flag, history, adjusted in zip(batch, amounts, result["anomaly"].tolist(),
+                                                        result["history_avg"].tolist(),
+                                                        result["inflation_adjusted_avg"].tolist()):
+            if math.isnan(history):
+                # First invoice of its category: nothing to compare against
+                params.append({"b_id": row.id, "b_flag": False, "b_description": None, "b_history": None,
+                               "b_adjusted": None, "b_spike": None})
+                continue
+            params.append({
+                "b_id": row.id, "b_flag": flag,
+                "b_description": anomaly_stream.description(row.category) if flag else None,
+                "b_history": history, "b_adjusted": adjusted,
+                "b_spike": round(((amount - history) / history) * 100, 1) if history else 0.0,
+            })
+        bind.execute(score_invoice, params)
+
+    bind.execute(stats.insert(), [
+        {"category": category, "count": int(count[code]), "mean": float(mean[code]), "m2": float(m2[code]),
+         "raw_mean": float(raw_mean[code])}
+        for code, category in enumerate(categories)
+    ])
+
+def downgrade():
+    op.drop_index("ix_invoices_vendor_date", table_name="invoices")
+    op.drop_index("ix_invoices_anomaly_flag", table_name="invoices")
+    with op.batch_alter_table("invoices") as batch:
+        batch.drop_column("spike_percentage")
+        batch.drop_column("inflation_adjusted_avg")
+        batch.drop_column("history_avg")
+    op.drop_table("invoice_category_stats")
+    op.drop_table("labor_daily_rollups")
@@ -0,0 +1,40 @@
+"""Composite indexes for the labor, finance, reporting and anomaly queries
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16
+
+Each index matches the predicates (and, where cheap, the selected columns) of a hot query;
+see the comments in models.py. `python check_query_plans.py` verifies that no endpoint
+query falls back to a full table scan.
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_labor_actuals_project_employee", "labor_actuals", ["project_id", "employee_id", "date", "hours"]),
+    ("ix_labor_actuals_date_employee", "labor_actuals", ["date", "employee_id"]),
+    ("ix_labor_actuals_payroll_code", "labor_actuals", ["payroll_code"]),
+    ("ix_labor_daily_rollups_day", "labor_daily_rollups", ["day", "hours"]),
+    ("ix_labor_daily_rollups_billable", "labor_daily_rollups", ["is_billable", "hours"]),
+    ("ix_project_events_type_project_date", "project_events", ["event_type", "project_id", "date"]),
+    ("ix_project_events_project_date", "project_events", ["project_id", "date"]),
+    ("ix_project_media_project_id", "project_media", ["project_id"]),
+    ("ix_invoices_flag_date", "invoices", ["anomaly_flag", "date"]),
+    ("ix_invoices_category_date", "invoices", ["category", "date", "amount"]),
+]
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+    # Superseded by ix_invoices_flag_date
+    op.drop_index("ix_invoices_anomaly_flag", table_name="invoices")
+
+def downgrade():
+    op.create_index("ix_invoices_anomaly_flag", "invoices", ["anomaly_flag"])
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
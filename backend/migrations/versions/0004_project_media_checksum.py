@@ -0,0 +1,26 @@
+"""Size and SHA-256 of uploaded project media
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16
+
+Both are computed while an upload is streamed to disk (media_storage); rows uploaded
+before this revision keep NULL.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table("project_media") as batch:
+        batch.add_column(sa.Column("size_bytes", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("sha256", sa.String(64), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table("project_media") as batch:
+        batch.drop_column("sha256")
+        batch.drop_column("size_bytes")
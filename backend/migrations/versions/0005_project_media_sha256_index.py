@@ -0,0 +1,22 @@
+"""Index project media by content hash
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16
+
+Uploads are stored content-addressed (media_storage), so several rows can reference the
+same object. Move files uploaded before this revision with
+`python media_storage.py import-legacy`.
+"""
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index("ix_project_media_sha256", "project_media", ["sha256"])
+
+def downgrade():
+    op.drop_index("ix_project_media_sha256", table_name="project_media")
@@ -0,0 +1,26 @@
+"""WebP thumbnail and preview URLs on project media
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16
+
+Filled in by media_derivatives after an image upload; generate them for existing images
+with `python media_derivatives.py backfill`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table("project_media") as batch:
+        batch.add_column(sa.Column("thumbnail_url", sa.String(), nullable=True))
+        batch.add_column(sa.Column("preview_url", sa.String(), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table("project_media") as batch:
+        batch.drop_column("preview_url")
+        batch.drop_column("thumbnail_url")
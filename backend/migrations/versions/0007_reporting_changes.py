@@ -0,0 +1,30 @@
+"""Change log for the /reporting/projects delta sync
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-16
+
+Starts with a reset marker: rows written before this revision were never logged, so the
+first sync token any client can hold comes after it.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    changes = op.create_table(
+        "reporting_changes",
+        sa.Column("seq", sa.Integer(), primary_key=True),
+        sa.Column("entity", sa.String(), nullable=False),
+        sa.Column("entity_id", sa.Integer(), nullable=True),
+        sa.Column("deleted", sa.Boolean(), nullable=False),
+        sqlite_autoincrement=True
+    )
+    op.bulk_insert(changes, [{"entity": "*", "entity_id": None, "deleted": False}])
+
+def downgrade():
+    op.drop_table("reporting_changes")
@@ -0,0 +1,23 @@
+"""Per-table data version counters for the response cache
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "table_versions",
+        sa.Column("table_name", sa.String(), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+    )
+
+def downgrade():
+    op.drop_table("table_versions")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Date, Index
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -24,6 +24,15 @@ class UnionRate(Base):
 
 class LaborActual(Base):
     __tablename__ = "labor_actuals"
+    __table_args__ = (
+        # Employee totals, per project and overall (labor_service.get_employee_details_by_project);
+        # covering `hours` lets the unfiltered totals scan this index instead of the table
+        Index("ix_labor_actuals_project_employee", "project_id", "employee_id", "date", "hours"),
+        # Active employees over a trailing window (get_payroll_estimation)
+        Index("ix_labor_actuals_date_employee", "date", "employee_id"),
+        # Hours per payroll code (get_union_reconciliation_data)
+        Index("ix_labor_actuals_payroll_code", "payroll_code"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"))
@@ -33,6 +42,25 @@ class LaborActual(Base):
     payroll_code = Column(String)
     is_billable = Column(Boolean, default=True)
 
+class LaborDailyRollup(Base):
+    """
+    Per-project, per-billable-flag daily totals of LaborActual hours.
+    Maintained on every flush by labor_rollup; rebuild with `python labor_rollup.py rebuild`.
+    """
+    __tablename__ = "labor_daily_rollups"
+    __table_args__ = (
+        # Trailing-window hours (get_payroll_estimation)
+        Index("ix_labor_daily_rollups_day", "day", "hours"),
+        # Billable/overhead totals (get_total_aggregates)
+        Index("ix_labor_daily_rollups_billable", "is_billable", "hours"),
+    )
+
+    project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    is_billable = Column(Boolean, primary_key=True)
+    day = Column(Date, primary_key=True)
+    hours = Column(Float, default=0.0)
+    entry_count = Column(Integer, default=0)
+
 class DispatcherData(Base):
     __tablename__ = "dispatcher_data"
 
@@ -63,6 +91,12 @@ class Project(Base):
 
 class ProjectEvent(Base):
     __tablename__ = "project_events"
+    __table_args__ = (
+        # Payment/expense totals by project and date range (finance_service)
+        Index("ix_project_events_type_project_date", "event_type", "project_id", "date"),
+        # Events of a project (reporting)
+        Index("ix_project_events_project_date", "project_id", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"))
@@ -76,17 +110,37 @@ class ProjectEvent(Base):
 
 class ProjectMedia(Base):
     __tablename__ = "project_media"
+    __table_args__ = (
+        Index("ix_project_media_project_id", "project_id"),
+        # Rows sharing a stored object (media_storage)
+        Index("ix_project_media_sha256", "sha256"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"))
     filename = Column(String)
     file_type = Column(String) # image, document
+    # /media/<aa>/<sha256><ext> for content-addressed objects, /uploads/... for older files
     url = Column(String)
+    # Recorded while the upload is streamed to disk (media_storage)
+    size_bytes = Column(Integer, nullable=True)
+    sha256 = Column(String(64), nullable=True)
+    # WebP derivatives of images, filled in by media_derivatives after the upload
+    thumbnail_url = Column(String, nullable=True)
+    preview_url = Column(String, nullable=True)
     
     project = relationship("Project", back_populates="media")
 
 class Invoice(Base):
     __tablename__ = "invoices"
+    __table_args__ = (
+        # Duplicate check of bulk imports (invoice_import)
+        Index("ix_invoices_vendor_date", "vendor", "date"),
+        # Flagged invoices in date order (/automation/anomalies)
+        Index("ix_invoices_flag_date", "anomaly_flag", "date"),
+        # Recent history of a category (/automation/anomalies charts)
+        Index("ix_invoices_category_date", "category", "date", "amount"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     vendor = Column(String)
@@ -95,3 +149,46 @@ class Invoice(Base):
     date = Column(DateTime)
     anomaly_flag = Column(Boolean, default=False)
     anomaly_description = Column(String)
+    # Baseline the invoice was scored against when it was inserted (see anomaly_stream)
+    history_avg = Column(Float, nullable=True)
+    inflation_adjusted_avg = Column(Float, nullable=True)
+    spike_percentage = Column(Float, nullable=True)
+
+class InvoiceCategoryStats(Base):
+    """
+    Running per-category invoice statistics (Welford), updated as invoices are inserted.
+    mean/m2 are over amounts deflated to anomaly_stream.EPOCH prices.
+    """
+    __tablename__ = "invoice_category_stats"
+
+    category = Column(String, primary_key=True)
+    count = Column(Integer, default=0)
+    mean = Column(Float, default=0.0)
+    m2 = Column(Float, default=0.0)
+    raw_mean = Column(Float, default=0.0)
+
+
+class ReportingChange(Base):
+    """
+    Append-only change log of projects, project events and project media, the basis of the
+    /reporting/projects delta sync. Written on every flush by reporting_changes.
+    entity "*" marks a reset: changes before it are unknown (e.g. bulk deletes).
+    """
+    __tablename__ = "reporting_changes"
+    # AUTOINCREMENT keeps SQLite from reusing sequence numbers after deletes
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False) # projects, events, media, *
+    entity_id = Column(Integer, nullable=True)
+    deleted = Column(Boolean, default=False, nullable=False)
+
+
+class TableVersion(Base):
+    """
+    Data version of a table, incremented by every transaction that writes it (data_versions).
+    """
+    __tablename__ = "table_versions"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
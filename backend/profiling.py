@@ -0,0 +1,166 @@
+"""
+On-demand profiling of single requests.
+
+Disabled unless PROFILE_TOKEN is set: main then installs no ProfilingMiddleware, so
+profiling costs nothing when off.
+
+A request sent with `X-Profile: <PROFILE_TOKEN>` is profiled by a sampling thread that
+records the Python stacks of every thread of the process every PROFILE_INTERVAL_MS until
+the response is sent. Sampling is wall clock, so the event loop, the thread pool running
+sync endpoints and database driver threads (aiosqlite) all show up, and so does time the
+event loop spends waiting on I/O, as "event loop;(idle)". Other idle threads are left out.
+The samples are stored in PROFILE_DIR in collapsed stack format (one `frame;frame;... count`
+line per stack), which flamegraph.pl, inferno and speedscope read directly. The response
+names the file in an X-Profile-File header; the file is written before the last body
+chunk is sent, so GET /profiles/{name} with the same X-Profile header can download it as
+soon as the response is complete. Only the newest PROFILE_KEEP profiles are kept.
+
+All threads are sampled, so requests served concurrently by the same worker show up too;
+profile on a quiet worker for a clean picture.
+"""
+import hmac
+import linecache
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+ENABLED = bool(PROFILE_TOKEN)
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "100"))
+# Where main serves stored profiles
+PROFILES_PATH = "/profiles/"
+
+_NAME = re.compile(r"^[\w.-]+\.folded$")
+_ROOT = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+def authorized(token: Optional[str]) -> bool:
+    return ENABLED and token is not None and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+def stored(name: str) -> Optional[Path]:
+    """Path of a stored profile, or None if there is no such profile."""
+    if not _NAME.match(name):
+        return None
+    path = PROFILE_DIR / name
+    return path if path.is_file() else None
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_ROOT):
+        filename = filename[len(_ROOT):]
+    else:
+        # Keep library paths short: site-packages/fastapi/routing.py -> fastapi/routing.py
+        filename = "/".join(Path(filename).parts[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+# Blocking calls a thread waits for work or I/O in (lock/queue waits, the selector poll).
+# They are C calls, so the innermost Python frame is the caller and its current line shows them.
+_WAIT_CALL = re.compile(r"\.(acquire|get|poll|select|wait)\(")
+
+def _is_waiting(frame) -> bool:
+    return bool(_WAIT_CALL.search(linecache.getline(frame.f_code.co_filename, frame.f_lineno)))
+
+class _Sampler:
+    def __init__(self, loop_thread: int):
+        self.loop_thread = loop_thread
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(PROFILE_INTERVAL):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    root = "event loop" if ident == self.loop_thread else names.get(ident, str(ident))
+                    self._sample(frame, root)
+
+    def _sample(self, frame, root: str):
+        waiting = _is_waiting(frame)
+        labels = []
+        in_app = False
+        while frame is not None:
+            labels.append(_frame_label(frame.f_code))
+            in_app = in_app or frame.f_code.co_filename.startswith(_ROOT)
+            frame = frame.f_back
+        # A thread blocked outside application code is idle; one blocked inside it (a sync
+        # endpoint waiting for a pooled connection, say) is part of the request's time
+        if waiting and not in_app:
+            if root == "event loop":
+                self.stacks["event loop;(idle)"] += 1
+            return
+        labels.append(root)
+        self.stacks[";".join(reversed(labels))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def _store(sampler: _Sampler, name: str):
+    """Stops sampling, writes the profile and drops the oldest ones past PROFILE_KEEP."""
+    sampler.stop()
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILE_DIR / name).write_text(sampler.folded())
+    # Names start with a timestamp, so they sort oldest first
+    older = sorted(path for path in PROFILE_DIR.glob("*.folded") if _NAME.match(path.name) and path.name != name)
+    for path in older[:max(len(older) + 1 - PROFILE_KEEP, 0)]:
+        path.unlink(missing_ok=True)
+
+def _profile_name(scope) -> str:
+    slug = re.sub(r"[^\w]+", "_", scope["path"]).strip("_")[:60] or "root"
+    now = time.time()
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(now)) + f".{int(now % 1 * 1000):03d}"
+    return f"{stamp}-{scope['method']}-{slug}-{uuid.uuid4().hex[:8]}.folded"
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling the requests that carry a valid X-Profile header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # Profile downloads carry the token too; profiling them would only evict real profiles
+        if (scope["type"] != "http" or scope["path"].startswith(PROFILES_PATH)
+                or not authorized(Headers(scope=scope).get("x-profile"))):
+            await self.app(scope, receive, send)
+            return
+
+        name = _profile_name(scope)
+        sampler = _Sampler(threading.get_ident())
+        stored = False
+
+        async def store():
+            nonlocal stored
+            if not stored:
+                stored = True
+                await run_in_threadpool(_store, sampler, name)
+
+        async def send_with_name(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-File", name)
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                # Stored before the response completes, so the client can fetch it right away
+                await store()
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_name)
+        finally:
+            await store()
@@ -0,0 +1,79 @@
+"""
+Change log for the delta sync of /reporting/projects.
+
+Every ORM flush that inserts, updates or deletes Project, ProjectEvent or ProjectMedia rows
+appends one `reporting_changes` entry per row inside the same transaction, plus one for the
+project of every event or media row added, deleted or moved (its counts change). Entry sequence
+numbers are monotonic, so a client that has applied everything up to sequence N only needs
+the rows named by entries after N (reporting_service.get_changes).
+
+Bulk Core statements (update()/delete() executed directly) bypass the ORM flush; callers
+doing those must call `record` themselves, or `mark_reset` to make every client reload.
+"""
+from sqlalchemy import event, func, insert, inspect, select, text
+from sqlalchemy.orm import Session
+import models
+
+change_table = models.ReportingChange.__table__
+
+TRACKED = {
+    models.Project: "projects",
+    models.ProjectEvent: "events",
+    models.ProjectMedia: "media",
+}
+RESET = "*"
+
+def record(connection, changes):
+    """
+    Appends [(entity, entity_id, deleted)] entries using the given connection/transaction.
+    """
+    if not changes:
+        return
+    if connection.dialect.name == "postgresql":
+        # Serialize writers until commit so sequence order is commit order; otherwise a
+        # client could pass a sequence number whose predecessor has not committed yet.
+        # Readers are not blocked.
+        connection.execute(text("LOCK TABLE reporting_changes IN EXCLUSIVE MODE"))
+    connection.execute(
+        insert(change_table),
+        [{"entity": entity, "entity_id": entity_id, "deleted": deleted} for entity, entity_id, deleted in changes]
+    )
+
+def mark_reset(connection):
+    """Invalidates every earlier sync token; clients holding one reload in full."""
+    record(connection, [(RESET, None, False)])
+
+def current_token(connection) -> int:
+    return connection.execute(select(func.coalesce(func.max(change_table.c.seq), 0))).scalar()
+
+def _keep_previous_project(target, value, oldvalue, initiator):
+    # Registered with active_history so a reassigned project_id keeps its old value in the
+    # attribute history; _record_flush_changes logs the project a row moves away from too
+    return value
+
+for _model in (models.ProjectEvent, models.ProjectMedia):
+    event.listen(_model.project_id, "set", _keep_previous_project, active_history=True)
+
+@event.listens_for(Session, "after_flush")
+def _record_flush_changes(session, flush_context):
+    changes, parents = [], set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        entity = TRACKED.get(type(obj))
+        if entity is None:
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        changes.append((entity, obj.id, obj in session.deleted))
+        if entity != "projects":
+            if obj in session.dirty:
+                history = inspect(obj).attrs.project_id.history
+                parents.update(history.added or ())
+                parents.update(history.deleted or ())
+            else:
+                parents.add(obj.project_id)
+    parents.discard(None)
+    if parents:
+        # Ahead of the rows themselves, so a project deleted in this flush stays deleted
+        changes = [("projects", project_id, False) for project_id in sorted(parents)] + changes
+    if changes:
+        record(session.connection(), changes)
@@ -0,0 +1,174 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
+from typing import Iterable, Optional
+import models, schemas
+from reporting_changes import RESET
+
+REPORTING_FIELDS = ("events", "media")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# Events/media returned inline per project; the rest are paged through the nested endpoints
+DEFAULT_NESTED_LIMIT = 50
+MAX_NESTED_LIMIT = 500
+
+# A delta with more changes than this tells the client to reload instead
+MAX_DELTA_CHANGES = 1000
+
+_CHILD_MODELS = {"events": models.ProjectEvent, "media": models.ProjectMedia}
+_COUNT_FIELDS = {"events": "event_count", "media": "media_count"}
+# Fields of the events and media in page and delta results, as plain dicts for fast_json
+_CHILD_FIELDS = {
+    "events": tuple(schemas.ProjectEventSchema.model_fields),
+    "media": tuple(schemas.ProjectMediaSchema.model_fields),
+}
+
+def parse_fields(fields: Optional[str]) -> set:
+    """
+    Parses the comma-separated `fields` parameter. None means every nested collection;
+    an empty string means none.
+    """
+    if fields is None:
+        return set(REPORTING_FIELDS)
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(REPORTING_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}; expected {', '.join(REPORTING_FIELDS)}")
+    return requested
+
+async def get_projects_page(
+    db: AsyncSession,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Iterable[str] = REPORTING_FIELDS,
+    nested_limit: int = DEFAULT_NESTED_LIMIT,
+):
+    """
+    Returns (projects, next_cursor) for one page of projects ordered by id, as plain dicts
+    shaped like ProjectReportingSchema.
+
+    `cursor` is the id of the last project of the previous page; next_cursor is None on the
+    last page. Each requested nested collection is loaded for the whole page in one query,
+    capped at the `nested_limit` most recent rows per project, together with its total
+    count, so the cost does not grow with a project's history. Collections not in `fields`
+    are not queried and come back as None.
+    """
+    query = select(models.Project).order_by(models.Project.id).limit(limit + 1)
+    if cursor is not None:
+        query = query.where(models.Project.id > cursor)
+    projects = (await db.execute(query)).scalars().all()
+
+    next_cursor = projects[limit - 1].id if len(projects) > limit else None
+    projects = projects[:limit]
+    items = [_project_fields(p) for p in projects]
+    ids = [p.id for p in projects]
+
+    for name in REPORTING_FIELDS:
+        if name not in fields or not ids:
+            continue
+        children, counts = await _latest_children(db, name, ids, nested_limit)
+        for item in items:
+            item[name] = children.get(item["id"], [])
+            item[_COUNT_FIELDS[name]] = counts.get(item["id"], 0)
+
+    return items, next_cursor
+
+def _project_fields(project):
+    item = {column.name: getattr(project, column.name) for column in models.Project.__table__.columns}
+    item.update(events=None, media=None, event_count=None, media_count=None)
+    return item
+
+def _child_fields(name: str, row):
+    return {field: getattr(row, field) for field in _CHILD_FIELDS[name]}
+
+async def _latest_children(db: AsyncSession, name: str, project_ids, limit: int):
+    """
+    Loads the `limit` newest rows (by id) of the `name` collection for each project, as
+    dicts, plus each project's total row count, in one windowed query.
+    """
+    model = _CHILD_MODELS[name]
+    rank = func.row_number().over(partition_by=model.project_id, order_by=model.id.desc()).label("rank")
+    total = func.count().over(partition_by=model.project_id).label("total")
+    ranked = select(model.id, rank, total).where(model.project_id.in_(project_ids)).subquery()
+    rows = (await db.execute(
+        select(model, ranked.c.total)
+        .join(ranked, ranked.c.id == model.id)
+        .where(ranked.c.rank <= limit)
+        .order_by(model.project_id, model.id.desc())
+    )).all()
+
+    children, counts = {}, {}
+    for child, count in rows:
+        children.setdefault(child.project_id, []).append(_child_fields(name, child))
+        counts[child.project_id] = count
+    return children, counts
+
+async def get_children_page(db: AsyncSession, name: str, project_id: int, cursor: Optional[int] = None,
+                            limit: int = DEFAULT_NESTED_LIMIT):
+    """
+    Returns (rows, next_cursor) for one page of a project's events or media, newest first,
+    as dicts (cacheable, and served through fast_json). `cursor` is the id of the last row
+    of the previous page.
+    """
+    model = _CHILD_MODELS[name]
+    query = select(model).where(model.project_id == project_id).order_by(model.id.desc()).limit(limit + 1)
+    if cursor is not None:
+        query = query.where(model.id < cursor)
+    rows = (await db.execute(query)).scalars().all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return [_child_fields(name, row) for row in rows[:limit]], next_cursor
+
+async def get_sync_token(db: AsyncSession) -> int:
+    """Latest change sequence number; read it before the data it is sent with."""
+    return (await db.execute(select(func.coalesce(func.max(models.ReportingChange.seq), 0)))).scalar()
+
+async def get_changes(db: AsyncSession, since: int, max_changes: int = MAX_DELTA_CHANGES):
+    """
+    Returns the projects, events and media created, changed or deleted after sync token
+    `since`, with the token to pass next time, as a dict shaped like ReportingDeltaSchema
+    (plain dicts throughout). Rows appear once with their current state
+    however often they changed. `reset` is set, and nothing else returned, when the client
+    must reload in full: the token predates a reset marker or belongs to another database,
+    or more than `max_changes` changes piled up. Projects carry their current event_count and
+    media_count; adding, deleting or moving an event or media row logs a change of its project.
+    """
+    change = models.ReportingChange
+    token = await get_sync_token(db)
+    delta = {
+        "token": token, "reset": False, "projects": [], "events": [], "media": [],
+        "deleted_projects": [], "deleted_events": [], "deleted_media": [],
+    }
+    if since > token:
+        return dict(delta, reset=True)
+
+    entries = (await db.execute(
+        select(change.entity, change.entity_id, change.deleted)
+        .where(change.seq > since, change.seq <= token)
+        .order_by(change.seq)
+        .limit(max_changes + 1)
+    )).all()
+    if len(entries) > max_changes or any(entity == RESET for entity, _, _ in entries):
+        return dict(delta, reset=True)
+
+    # Last entry per row wins
+    latest = {}
+    for entity, entity_id, deleted in entries:
+        latest[(entity, entity_id)] = deleted
+
+    for entity, model in (("projects", models.Project), *_CHILD_MODELS.items()):
+        ids = {entity_id for (e, entity_id), deleted in latest.items() if e == entity and not deleted}
+        deleted = {entity_id for (e, entity_id), deleted in latest.items() if e == entity and deleted}
+        rows = (await db.execute(select(model).where(model.id.in_(ids)))).scalars().all() if ids else []
+        # Rows gone by now (a later change or a bulk delete) are reported as deleted
+        deleted |= ids - {row.id for row in rows}
+        delta[entity] = [_project_fields(row) if entity == "projects" else _child_fields(entity, row) for row in rows]
+        delta[f"deleted_{entity}"] = sorted(deleted)
+
+    project_ids = [item["id"] for item in delta["projects"]]
+    if project_ids:
+        for name, model in _CHILD_MODELS.items():
+            counts = dict((await db.execute(
+                select(model.project_id, func.count()).where(model.project_id.in_(project_ids)).group_by(model.project_id)
+            )).all())
+            for item in delta["projects"]:
+                item[_COUNT_FIELDS[name]] = counts.get(item["id"], 0)
+    return delta
@@ -0,0 +1,182 @@
+"""
+Per-request SQL and timing instrumentation.
+
+RequestMetricsMiddleware opens a RequestStats for every HTTP request in a context variable.
+Cursor execute hooks on both engines add each statement's count and duration to the stats of
+the request that ran it; sync endpoints running on the thread pool see the same context.
+TimedRoute marks when the endpoint function returns, so the time up to the first response
+byte splits into endpoint work and response validation/serialization (fast_json reports
+its rendering, done inside the endpoint, explicitly).
+
+Every response carries a Server-Timing header (db, serialize, app) and every request logs
+one JSON line on the `request_metrics` logger. A request that runs the same statement
+N_PLUS_ONE_THRESHOLD times or more is logged as a warning, naming the statement.
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+# Characters of SQL kept in logs
+STATEMENT_PREVIEW = 300
+
+logger = logging.getLogger("request_metrics")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(levelname)s %(name)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(os.getenv("REQUEST_LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+        self.statements = Counter()
+        self.serialize_seconds = 0.0
+        self.endpoint_done: Optional[float] = None
+        self.response_started: Optional[float] = None
+
+    def add_query(self, statement: str, seconds: float):
+        self.queries += 1
+        self.sql_seconds += seconds
+        self.statements[statement] += 1
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+    def mark_response_started(self):
+        self.response_started = time.perf_counter()
+        if self.endpoint_done is not None:
+            self.serialize_seconds += self.response_started - self.endpoint_done
+
+    def server_timing(self) -> str:
+        app_ms = ((self.response_started or time.perf_counter()) - self.started) * 1000
+        return (
+            f'db;dur={self.sql_seconds * 1000:.2f};desc="{self.queries} queries", '
+            f"serialize;dur={self.serialize_seconds * 1000:.2f}, "
+            f"app;dur={app_ms:.2f}"
+        )
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+def record_serialization(seconds: float):
+    """Adds serialization time spent inside an endpoint (e.g. fast_json) to the current request."""
+    stats = _current.get()
+    if stats is not None:
+        stats.serialize_seconds += seconds
+
+def _preview(statement: str) -> str:
+    return " ".join(statement.split())[:STATEMENT_PREVIEW]
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("request_metrics_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    starts = conn.info.get("request_metrics_start")
+    if stats is not None and starts:
+        stats.add_query(statement, time.perf_counter() - starts.pop())
+
+def instrument(engine):
+    """Attributes the statements run on `engine` (a sync Engine) to the current request."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def _log(scope, status, stats: RequestStats):
+    total_ms = (time.perf_counter() - stats.started) * 1000
+    route = scope.get("route")
+    record = {
+        "method": scope["method"],
+        "path": scope["path"],
+        "route": getattr(route, "path", None),
+        "status": status,
+        "duration_ms": round(total_ms, 2),
+        "queries": stats.queries,
+        "sql_ms": round(stats.sql_seconds * 1000, 2),
+        "serialize_ms": round(stats.serialize_seconds * 1000, 2),
+        "slowest_sql_ms": round(stats.slowest_seconds * 1000, 2),
+        "slowest_sql": _preview(stats.slowest_statement) if stats.slowest_statement else None,
+    }
+    repeated, times = stats.statements.most_common(1)[0] if stats.statements else (None, 0)
+    if times >= N_PLUS_ONE_THRESHOLD:
+        record["n_plus_one"] = {"times": times, "statement": _preview(repeated)}
+        logger.warning(json.dumps(record))
+    else:
+        logger.info(json.dumps(record))
+
+class RequestMetricsMiddleware:
+    """ASGI middleware; add it last so it wraps the others (compression included)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = None
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                stats.mark_response_started()
+                MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            _log(scope, status or 500, stats)
+
+def _mark_endpoint_done():
+    stats = _current.get()
+    if stats is not None:
+        stats.endpoint_done = time.perf_counter()
+
+def _timed(endpoint):
+    # Same sync/async kind as the endpoint, so FastAPI still runs sync endpoints on the thread pool
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed_async(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _mark_endpoint_done()
+        return timed_async
+
+    @functools.wraps(endpoint)
+    def timed_sync(*args, **kwargs):
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            _mark_endpoint_done()
+    return timed_sync
+
+class TimedRoute(APIRoute):
+    """APIRoute that records when its endpoint function returns (see RequestStats)."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed(endpoint), **kwargs)
@@ -1,12 +1,15 @@
 import models
+from sqlalchemy import text
 from database import engine
-import seed_db
+import seed_db, migrate
 
 def reset_and_seed():
     print("Dropping all tables...")
     models.Base.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
     print("Recreating tables...")
-    models.Base.metadata.create_all(bind=engine)
+    migrate.upgrade()
     print("Seeding database...")
     seed_db.seed_database()
     print("Done!")
@@ -0,0 +1,117 @@
+"""
+In-memory cache of read endpoint results.
+
+Entries are keyed on (endpoint, parameters, versions of the tables the endpoint reads), see
+data_versions. A committed write bumps a table's version, so later reads miss and
+recompute; entries for old versions are never hit again and age out of the size-bounded
+LRU. Reading the versions is one primary-key query per request.
+
+The same key yields the ETag of `conditional` responses: a client revalidating with
+If-None-Match gets a 304 after the version read alone, before any endpoint query runs.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from fastapi import HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+import data_versions
+import metrics
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 256, enabled: bool = True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.cache_lookup("response", True)
+                return True, self._entries[key]
+            self.misses += 1
+            metrics.cache_lookup("response", False)
+            return False, None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256")),
+    enabled=os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() not in ("0", "false", "no"),
+)
+
+def _key(endpoint: str, params: Dict, versions: Tuple) -> Tuple:
+    return (endpoint, tuple(sorted(params.items())), versions)
+
+def etag(endpoint: str, params: Dict, versions: Tuple) -> str:
+    # Weak: the representation may be re-encoded (compressed) on the way out
+    digest = hashlib.sha1(repr(_key(endpoint, params, versions)).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+def _etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or tag.removeprefix("W/") in (c.removeprefix("W/") for c in candidates)
+
+async def cached(db: AsyncSession, endpoint: str, params: Dict, tables: Iterable[str],
+                 compute: Callable[[], Awaitable], versions: Optional[Tuple] = None):
+    """
+    Returns the cached result of `compute()` for this endpoint, parameters and the current
+    versions of `tables`, computing and storing it on a miss. Cached values are shared
+    between requests and must not be mutated.
+    """
+    if not cache.enabled:
+        return await compute()
+    # Versions are read before the data, so a result is never stored under a newer key
+    # than the state it was computed from
+    if versions is None:
+        versions = await data_versions.get_versions(db, tables)
+    key = _key(endpoint, params, versions)
+    hit, value = cache.get(key)
+    if hit:
+        return value
+    value = await compute()
+    cache.set(key, value)
+    return value
+
+async def conditional(request: Request, response: Response, db: AsyncSession, endpoint: str,
+                      params: Dict, tables: Iterable[str], compute: Callable[[], Awaitable]):
+    """
+    `cached` for GET endpoints, with an ETag derived from the table versions. Raises a 304
+    when the request's If-None-Match already names it; otherwise sets the ETag (and
+    Cache-Control: no-cache, so browsers revalidate on every use) on `response`.
+    """
+    versions = await data_versions.get_versions(db, tables)
+    headers = {"ETag": etag(endpoint, params, versions), "Cache-Control": "no-cache"}
+    not_modified = _etag_matches(request.headers.get("if-none-match"), headers["ETag"])
+    metrics.cache_lookup("etag", not_modified)
+    if not_modified:
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return await cached(db, endpoint, params, tables, compute, versions=versions)
@@ -56,6 +56,20 @@ class AnomalyAlertSchema(BaseModel):
     inflation_adjusted_avg: Optional[float] = None
     historical_data: List[HistoricalPoint]
 
+class ImportErrorSchema(BaseModel):
+    line: int
+    error: str
+
+class ImportReportSchema(BaseModel):
+    rows_read: int
+    inserted: int
+    rejected: int
+    duplicates: int = 0
+    chunks: int
+    errors: List[ImportErrorSchema]
+    errors_truncated: bool
+    file_error: Optional[str] = None
+
 class VarianceAnalysisSchema(BaseModel):
     project_name: str
     actual_hours: float
@@ -64,6 +78,7 @@ class VarianceAnalysisSchema(BaseModel):
 
 class ProjectEventSchema(BaseModel):
     id: int
+    project_id: Optional[int] = None
     title: str
     date: datetime
     event_type: str
@@ -89,9 +104,14 @@ class ProjectEventUpdate(BaseModel):
 
 class ProjectMediaSchema(BaseModel):
     id: int
+    project_id: Optional[int] = None
     filename: str
     file_type: str
     url: str
+    size_bytes: Optional[int] = None
+    sha256: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    preview_url: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -127,8 +147,28 @@ class ProjectReportingSchema(BaseModel):
     original_completion_date: Optional[datetime] = None
     estimated_completion_date: Optional[datetime] = None
     
-    events: List[ProjectEventSchema] = []
-    media: List[ProjectMediaSchema] = []
+    # None when left out through the `fields` parameter; otherwise the most recent entries,
+    # with the totals in event_count/media_count
+    events: Optional[List[ProjectEventSchema]] = []
+    media: Optional[List[ProjectMediaSchema]] = []
+    event_count: Optional[int] = None
+    media_count: Optional[int] = None
     
     class Config:
         from_attributes = True
+
+class ReportingDeltaSchema(BaseModel):
+    """
+    Changes since a sync token (/reporting/projects?since=). Projects come without events
+    and media but with their current event_count/media_count; changed events and media are
+    listed separately with their project_id.
+    """
+    token: int
+    # The token is too old or unknown: discard local state and reload the full list
+    reset: bool = False
+    projects: List[ProjectReportingSchema] = []
+    events: List[ProjectEventSchema] = []
+    media: List[ProjectMediaSchema] = []
+    deleted_projects: List[int] = []
+    deleted_events: List[int] = []
+    deleted_media: List[int] = []
@@ -1,4 +1,4 @@
-import models
+import models, labor_rollup, anomaly_stream, reporting_changes, migrate
 from database import SessionLocal, engine
 import datetime
 import random
@@ -6,16 +6,20 @@ import random
 def seed_database():
     db = SessionLocal()
     
-    # Create tables if not exist
-    models.Base.metadata.create_all(bind=engine)
+    # Create or upgrade the schema
+    migrate.upgrade()
 
     print("Cleaning existing data...")
     db.query(models.LaborActual).delete()
+    db.query(models.LaborDailyRollup).delete()
     db.query(models.DispatcherData).delete()
     db.query(models.UnionRate).delete()
     db.query(models.Union).delete()
     db.query(models.Invoice).delete()
+    db.query(models.InvoiceCategoryStats).delete()
     db.query(models.Project).delete()
+    # Bulk deletes bypass the change log; make delta sync clients reload
+    reporting_changes.mark_reset(db.connection())
     db.commit()
 
     print("Seeding Unions...")
@@ -141,8 +145,8 @@ def seed_database():
     # Create a pool of employees that will work across multiple projects
     employee_pool = [f"EMP{i:03d}" for i in range(101, 121)]  # 20 employees: EMP101 to EMP120
     
+    # Project.actual_hours and the labor rollup are maintained by labor_rollup on flush
     for project in projects:
-        total_hours = 0
         # Each project will have 10-15 labor entries
         num_entries = random.randint(10, 15)
         
@@ -164,8 +168,6 @@ def seed_database():
                 is_billable=is_billable
             )
             db.add(labor)
-            total_hours += hours
-        project.actual_hours = total_hours
     db.commit()
 
     print("Seeding Invoices...")
@@ -175,21 +177,13 @@ def seed_database():
     for _ in range(20):
         category = random.choice(categories)
         amount = random.uniform(500, 15000)
-        
-        # Create an anomaly for Fuel simulation
-        anomaly_flag = False
-        anomaly_description = None
-        if category == "Fuel" and amount > 12000:
-            anomaly_flag = True
-            anomaly_description = "Significant spike compared to historical average."
 
+        # anomaly_flag/anomaly_description are set by anomaly_stream when the invoice is flushed
         invoice = models.Invoice(
             vendor=random.choice(vendors),
             category=category,
             amount=amount,
-            date=datetime.datetime.utcnow() - datetime.timedelta(days=random.randint(0, 60)),
-            anomaly_flag=anomaly_flag,
-            anomaly_description=anomaly_description
+            date=datetime.datetime.utcnow() - datetime.timedelta(days=random.randint(0, 60))
         )
         db.add(invoice)
     db.commit()
@@ -0,0 +1,329 @@
+"""
+Synthetic dataset generator for load and benchmark runs.
+
+Replaces the data in the configured database with a generated dataset whose size grows
+linearly with a scale factor: scale 1 is 20 projects, 150 employees, 100,000 labor_actuals
+rows and 5,000 invoices; scale 100 is 10M labor rows. The same (scale, seed, as-of date)
+always produces the same rows, ids included. The as-of date defaults to the fixed AS_OF;
+reports whose trailing window ends at the wall clock (the payroll estimate) only see the
+generated history when `--as-of` is close to today.
+
+Distributions:
+  - projects start over the last two years and run 6 to 24 months, with log-normal budgets;
+  - every project has a crew drawn from overlapping blocks of the employee pool, and a
+    share of the hours is worked by floaters from the whole pool, so employees are shared
+    across projects;
+  - labor hours follow the season (peak in summer), mostly on weekdays, 15% overtime;
+  - invoices grow with inflation, and fuel invoices spike in a few injected windows.
+
+Rows go in with Core executemany inserts (database.bulk_insert) in fixed-size chunks,
+each chunk generated from its own seeded random stream. The labor rollup is rebuilt once
+at the end; invoices go through the bulk invoice import path, so they are scored as they
+are inserted.
+
+Usage: python synthetic_data.py <scale> [seed] [--as-of YYYY-MM-DD]
+"""
+import argparse
+import time
+import datetime
+from typing import Dict
+import numpy as np
+from sqlalchemy import delete, insert, text
+import models
+import labor_rollup
+import data_versions
+import invoice_import
+from database import SessionLocal, bulk_insert
+
+CHUNK_SIZE = 200_000
+# Last day of generated history unless another as-of date is given
+AS_OF = datetime.date(2026, 1, 31)
+
+PROJECTS_PER_SCALE = 20
+EMPLOYEES_PER_SCALE = 150
+LABOR_ROWS_PER_SCALE = 100_000
+INVOICES_PER_SCALE = 5_000
+EVENTS_PER_PROJECT = 40
+MEDIA_PER_PROJECT = 12
+
+# Share of labor hours worked by a project's own crew; the rest by floaters
+CREW_SHARE = 0.7
+OVERTIME_SHARE = 0.15
+BILLABLE_SHARE = 0.8
+FUEL_SPIKES_PER_YEAR = 3
+
+LOCATIONS = ["Los Angeles, CA", "Chicago, IL", "Austin, TX", "Denver, CO", "Seattle, WA", "Phoenix, AZ", "Atlanta, GA"]
+MANAGERS = ["Sarah Jenkins", "Michael Chen", "Elena Rodriguez", "David Okafor", "Priya Natarajan", "Tom Becker"]
+PROJECT_KINDS = ["Plaza", "Transit Hub", "Apartments", "Medical Center", "Warehouse", "School", "Bridge"]
+PROJECT_NAMES = ["Riverside", "Downtown", "Skyline", "Harbor", "Northgate", "Lakeview", "Summit", "Cedar"]
+# category: (vendors, typical amount)
+INVOICE_CATEGORIES = {
+    "Fuel": (["Texaco", "Shell Fleet", "Chevron"], 3000.0),
+    "Materials": (["Home Depot", "BuildPro Supply", "Concrete Co"], 8000.0),
+    "Equipment Rental": (["United Rentals", "Sunbelt Rentals"], 5000.0),
+    "Subcontractor": (["Structural Steel Inc", "Apex Electrical", "Metro Plumbing"], 20000.0),
+}
+EXPENSE_CATEGORIES = ["materials", "payroll", "equipment", "administration", "other"]
+MEDIA_FILES = [
+    ("Site_Survey.pdf", "document", "https://example.com/docs/survey.pdf"),
+    ("Structural_Blueprints.pdf", "document", "https://example.com/docs/blueprints.pdf"),
+    ("Progress_Photo.jpg", "image", "https://images.unsplash.com/photo-1541888946425-d81bb19240f5?auto=format&fit=crop&q=80&w=800"),
+]
+
+HISTORY_DAYS = 730
+
+def _rng(seed, *stream):
+    """Independent random stream per (seed, table, chunk), so chunks reproduce in isolation."""
+    return np.random.default_rng([seed, *stream])
+
+def _counts(scale: float) -> Dict[str, int]:
+    return {
+        "projects": max(1, round(PROJECTS_PER_SCALE * scale)),
+        "employees": max(5, round(EMPLOYEES_PER_SCALE * scale)),
+        "labor": round(LABOR_ROWS_PER_SCALE * scale),
+        "invoices": round(INVOICES_PER_SCALE * scale),
+    }
+
+# Children first; the change log and table versions are reset in generate, not cleared
+GENERATED_TABLES = [
+    model.__table__ for model in (
+        models.LaborActual, models.LaborDailyRollup, models.DispatcherData, models.ProjectEvent,
+        models.ProjectMedia, models.Invoice, models.InvoiceCategoryStats, models.Project,
+        models.UnionRate, models.Union
+    )
+]
+
+def _clear(connection):
+    for table in GENERATED_TABLES:
+        connection.execute(delete(table))
+
+def _reset_sequences(connection):
+    """
+    Moves the PostgreSQL id sequences of the generated tables just past their largest id:
+    back to 1 once cleared, so rows without explicit ids (labor, invoices) are numbered the
+    same on every run, and past the explicit ids once loaded. SQLite needs nothing, it
+    numbers new rows from the largest id in the table.
+    """
+    if connection.dialect.name != "postgresql":
+        return
+    for table in GENERATED_TABLES:
+        if "id" in table.c:
+            connection.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), COALESCE(MAX(id), 0) + 1, false) "
+                f"FROM {table.name}"
+            ))
+
+def _unions(connection):
+    connection.execute(insert(models.Union.__table__), [
+        {"id": 1, "name": "IBEW Local 11", "description": "International Brotherhood of Electrical Workers"},
+        {"id": 2, "name": "LIUNA Local 300", "description": "Laborers' International Union of North America"},
+        {"id": 3, "name": "Carpenters Local 409", "description": "United Brotherhood of Carpenters and Joiners"},
+    ])
+    rates = (("REG", 45.0, "pension"), ("REG", 15.0, "health"), ("OT", 67.5, "pension"))
+    connection.execute(insert(models.UnionRate.__table__), [
+        {"id": (union_id - 1) * len(rates) + i + 1, "union_id": union_id, "payroll_code": code, "rate": rate,
+         "benefit_type": benefit}
+        for union_id in (1, 2, 3)
+        for i, (code, rate, benefit) in enumerate(rates)
+    ])
+
+def _projects(connection, n, today, seed):
+    """Inserts projects 1..n; returns their ids and (start, end) day offsets from today."""
+    rng = _rng(seed, 0)
+    start = -rng.integers(30, HISTORY_DAYS, n)
+    duration = rng.integers(180, 720, n)
+    budget_hours = np.round(rng.lognormal(np.log(4000), 0.6, n), -1)
+    delay = rng.choice([-7, 0, 0, 0, 7, 14, 30], n)
+    rows = [
+        {
+            "id": i + 1,
+            "name": f"{PROJECT_NAMES[i % len(PROJECT_NAMES)]} {PROJECT_KINDS[(i // len(PROJECT_NAMES)) % len(PROJECT_KINDS)]} {i + 1}",
+            "location": LOCATIONS[int(rng.integers(len(LOCATIONS)))],
+            "manager": MANAGERS[int(rng.integers(len(MANAGERS)))],
+            "total_budget": float(budget_hours[i] * rng.uniform(600, 1200)),
+            "budget_hours": float(budget_hours[i]),
+            "actual_hours": 0.0,
+            "status_notes": "On track." if delay[i] <= 0 else f"Delayed by {int(delay[i])} days.",
+            "start_date": today + datetime.timedelta(days=int(start[i])),
+            "original_completion_date": today + datetime.timedelta(days=int(start[i] + duration[i])),
+            "estimated_completion_date": today + datetime.timedelta(days=int(start[i] + duration[i] + delay[i])),
+        }
+        for i in range(n)
+    ]
+    connection.execute(insert(models.Project.__table__), rows)
+    ids = np.arange(1, n + 1)
+    # Labor and invoices are generated up to today
+    return ids, start, np.minimum(start + duration, 0)
+
+def _season(day_offsets, today):
+    """Workload factor by day of year: about +25% in July, -25% in January."""
+    day_of_year = (today.timetuple().tm_yday + day_offsets) % 365
+    return 1.0 + 0.25 * np.sin(2 * np.pi * (day_of_year - 105) / 365)
+
+def _weekdays(day_offsets, today, rng):
+    """Moves 90% of weekend days to a random weekday of the same week."""
+    weekday = (today.weekday() + day_offsets) % 7
+    weekend = (weekday >= 5) & (rng.random(len(day_offsets)) < 0.9)
+    return np.where(weekend, day_offsets - weekday + rng.integers(0, 5, len(day_offsets)), day_offsets)
+
+def _labor_chunk(rng, n, project_ids, starts, ends, weights, n_employees, today):
+    p = rng.choice(len(project_ids), n, p=weights)
+    days = _weekdays(rng.integers(starts[p], ends[p] + 1), today, rng)
+    days = np.clip(days, starts[p], ends[p])
+
+    # Crew of project i: a block of employees starting at i * stride; neighbouring blocks overlap
+    crew_size = max(5, n_employees // 10)
+    stride = max(1, crew_size // 2)
+    crew_member = (p * stride + rng.integers(0, crew_size, n)) % n_employees
+    floater = rng.integers(0, n_employees, n)
+    employee = np.where(rng.random(n) < CREW_SHARE, crew_member, floater)
+
+    overtime = rng.random(n) < OVERTIME_SHARE
+    hours = np.where(
+        overtime,
+        rng.uniform(1, 4, n),
+        np.clip(rng.normal(8 * _season(days, today), 1.5), 1, 12)
+    ).round(2)
+    billable = rng.random(n) < BILLABLE_SHARE
+
+    dates = {int(d): today + datetime.timedelta(days=int(d), hours=7) for d in np.unique(days)}
+    codes = np.where(overtime, "OT", "REG")
+    return list(zip(
+        project_ids[p].tolist(),
+        [f"EMP{e:05d}" for e in employee.tolist()],
+        [dates[d] for d in days.tolist()],
+        hours.tolist(),
+        codes.tolist(),
+        billable.tolist(),
+    ))
+
+def _labor(engine, n, project_ids, starts, ends, budget_weights, n_employees, today, seed):
+    table = models.LaborActual.__table__
+    # Maintaining the secondary indexes row by row costs several times the insert itself;
+    # building them once over the loaded table is much cheaper
+    with engine.begin() as connection:
+        for index in table.indexes:
+            index.drop(connection, checkfirst=True)
+    try:
+        for chunk, offset in enumerate(range(0, n, CHUNK_SIZE)):
+            rows = _labor_chunk(_rng(seed, 1, chunk), min(CHUNK_SIZE, n - offset), project_ids, starts, ends,
+                                budget_weights, n_employees, today)
+            with engine.begin() as connection:
+                bulk_insert(connection, table,
+                            ("project_id", "employee_id", "date", "hours", "payroll_code", "is_billable"), rows)
+            print(f"  labor_actuals: {offset + len(rows):,} / {n:,}")
+    finally:
+        with engine.begin() as connection:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+def _events_and_media(connection, project_ids, starts, ends, total_budgets, today, seed):
+    rng = _rng(seed, 2)
+    events, media = [], []
+    for i, project_id in enumerate(project_ids.tolist()):
+        span = max(1, int(ends[i] - starts[i]))
+        days = np.sort(starts[i] + rng.integers(0, span + 1, EVENTS_PER_PROJECT))
+        kinds = rng.choice(["inspection", "milestone", "payment", "expense", "expense"], EVENTS_PER_PROJECT)
+        for day, kind in zip(days.tolist(), kinds.tolist()):
+            date = today + datetime.timedelta(days=day, hours=int(rng.integers(7, 18)))
+            if kind == "payment":
+                events.append((project_id, "Progress Payment Received", date, kind, None,
+                               round(float(total_budgets[i] * rng.uniform(0.02, 0.08)), 2)))
+            elif kind == "expense":
+                category = EXPENSE_CATEGORIES[int(rng.integers(len(EXPENSE_CATEGORIES)))]
+                events.append((project_id, f"Expense - {category.title()}", date, kind, category,
+                               round(float(rng.lognormal(np.log(5000), 0.8)), 2)))
+            else:
+                events.append((project_id, "Site Inspection" if kind == "inspection" else "Milestone Reached",
+                               date, kind, None, None))
+        for j in range(MEDIA_PER_PROJECT):
+            filename, file_type, url = MEDIA_FILES[j % len(MEDIA_FILES)]
+            media.append((project_id, filename, file_type, url))
+    # Explicit ids, numbered in project and date order
+    bulk_insert(connection, models.ProjectEvent.__table__,
+                ("id", "project_id", "title", "date", "event_type", "category", "amount"),
+                [(i + 1, *event) for i, event in enumerate(events)])
+    bulk_insert(connection, models.ProjectMedia.__table__, ("id", "project_id", "filename", "file_type", "url"),
+                [(i + 1, *item) for i, item in enumerate(media)])
+
+def _invoices(engine, n, today, seed):
+    rng = _rng(seed, 3)
+    names = list(INVOICE_CATEGORIES)
+    category = rng.choice(len(names), n, p=[0.35, 0.3, 0.2, 0.15])
+    days = np.sort(-rng.integers(0, HISTORY_DAYS, n))
+    typical = np.array([INVOICE_CATEGORIES[name][1] for name in names])[category]
+    years = (days + HISTORY_DAYS) / 365.0
+    # Tight enough that only the injected spikes and a few outliers cross the detector's margin
+    amount = typical * rng.lognormal(0, 0.07, n) * (1 + 0.05) ** years
+
+    # Fuel price spikes: a few 5-15 day windows where fuel invoices cost 1.6-2.2x
+    spikes = max(1, round(FUEL_SPIKES_PER_YEAR * HISTORY_DAYS / 365))
+    for start in rng.integers(-HISTORY_DAYS, -15, spikes).tolist():
+        window = (days >= start) & (days < start + int(rng.integers(5, 16))) & (category == names.index("Fuel"))
+        amount = np.where(window, amount * rng.uniform(1.6, 2.2), amount)
+
+    seconds = rng.integers(7 * 3600, 18 * 3600, n)
+    records = [
+        (INVOICE_CATEGORIES[names[c]][0][int(v) % len(INVOICE_CATEGORIES[names[c]][0])], names[c], round(float(a), 2),
+         today + datetime.timedelta(days=int(d), seconds=int(s)))
+        for c, v, a, d, s in zip(category.tolist(), rng.integers(0, 1000, n).tolist(), amount.tolist(),
+                                 days.tolist(), seconds.tolist())
+    ]
+    # Chunks in date order, so each invoice is scored against the earlier ones
+    seen, report = set(), {"duplicates": 0}
+    for offset in range(0, n, CHUNK_SIZE):
+        invoice_import._write_chunk(engine, records[offset:offset + CHUNK_SIZE], seen, report)
+    return n - report["duplicates"]
+
+def generate(engine, scale: float = 1.0, seed: int = 42, as_of: datetime.date = AS_OF) -> Dict[str, int]:
+    """
+    Replaces the database contents with the dataset for (scale, seed), with history up to
+    `as_of`. Returns row counts.
+    """
+    counts = _counts(scale)
+    today = datetime.datetime.combine(as_of, datetime.time())
+
+    with engine.begin() as connection:
+        _clear(connection)
+        _reset_sequences(connection)
+        _unions(connection)
+        project_ids, starts, ends = _projects(connection, counts["projects"], today, seed)
+        budgets = connection.execute(
+            models.Project.__table__.select()
+            .with_only_columns(models.Project.budget_hours, models.Project.total_budget)
+            .order_by(models.Project.id)
+        ).all()
+        _events_and_media(connection, project_ids, starts, ends, [b[1] for b in budgets], today, seed)
+
+    # Bigger projects log proportionally more hours
+    weights = np.array([b[0] for b in budgets])
+    _labor(engine, counts["labor"], project_ids, starts, ends, weights / weights.sum(),
+           counts["employees"], today, seed)
+    counts["invoices"] = _invoices(engine, counts["invoices"], today, seed)
+
+    with engine.begin() as connection:
+        _reset_sequences(connection)
+        data_versions.bump(connection, [table.name for table in models.Base.metadata.sorted_tables])
+    db = SessionLocal()
+    try:
+        # Also marks a delta sync reset: the bulk loads above bypassed the change log
+        labor_rollup.rebuild(db)
+    finally:
+        db.close()
+    return counts
+
+if __name__ == "__main__":
+    from database import engine
+    import migrate
+
+    parser = argparse.ArgumentParser(description="Replaces the database contents with a synthetic dataset")
+    parser.add_argument("scale", type=float)
+    parser.add_argument("seed", type=int, nargs="?", default=42)
+    parser.add_argument("--as-of", type=datetime.date.fromisoformat, default=AS_OF,
+                        help=f"last day of generated history (default {AS_OF})")
+    args = parser.parse_args()
+
+    migrate.upgrade()
+    started = time.perf_counter()
+    counts = generate(engine, args.scale, args.seed, args.as_of)
+    print(f"Done in {time.perf_counter() - started:.1f} s: " + ", ".join(f"{v:,} {k}" for k, v in counts.items()))
@@ -0,0 +1,58 @@
+"""
+Checks that finance_service applies a date range in whole days to events and labor alike:
+an event timestamped during the end date counts, one on the next day does not.
+Runs against a throwaway SQLite database: python test_finance_date_range.py
+"""
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'finance_range.db')}"
+
+# labor_rollup registers the flush hook that keeps the daily labor rollup current
+import migrate, models, finance_service, labor_rollup
+from database import SessionLocal, AsyncSessionLocal
+
+def _seed():
+    with SessionLocal() as db:
+        project = models.Project(name="Range Test")
+        db.add(project)
+        db.flush()
+        db.add_all([
+            models.ProjectEvent(project_id=project.id, title="Draw 1", event_type="payment",
+                                amount=1000.0, date=datetime(2026, 1, 15, 9, 0)),
+            # Later on the end date: inside the range
+            models.ProjectEvent(project_id=project.id, title="Draw 2", event_type="payment",
+                                amount=500.0, date=datetime(2026, 1, 31, 16, 30)),
+            models.ProjectEvent(project_id=project.id, title="Concrete", event_type="expense",
+                                category="materiales", amount=200.0, date=datetime(2026, 1, 31, 23, 59)),
+            # The day after the end date: outside it
+            models.ProjectEvent(project_id=project.id, title="Draw 3", event_type="payment",
+                                amount=700.0, date=datetime(2026, 2, 1, 0, 0)),
+            models.LaborActual(project_id=project.id, employee_id="E1", hours=8.0,
+                               payroll_code="CARP", is_billable=True, date=datetime(2026, 1, 31, 7, 0)),
+            models.LaborActual(project_id=project.id, employee_id="E1", hours=6.0,
+                               payroll_code="CARP", is_billable=True, date=datetime(2026, 2, 1, 7, 0)),
+        ])
+        db.commit()
+
+async def _analytics():
+    async with AsyncSessionLocal() as db:
+        return await finance_service.get_project_financial_analytics(
+            db, start_date=datetime(2026, 1, 1), end_date=datetime(2026, 1, 31)
+        )
+
+def test_end_date_covers_the_whole_day():
+    migrate.upgrade()
+    _seed()
+    [result] = asyncio.run(_analytics())
+    print(f"revenue={result['revenue']} expenses={result['expenses']} billable_hours={result['billable_hours']}")
+    assert result["revenue"] == 1500.0
+    assert result["expenses"] == 200.0
+    assert result["billable_hours"] == 8.0
+
+if __name__ == "__main__":
+    test_end_date_covers_the_whole_day()
+    print("ok")
@@ -0,0 +1,148 @@
+"""
+Bulk timesheet import into `labor_actuals`.
+
+Files are read and validated column-wise (bulk_import.run_column_import), so each distinct
+project id, employee, date or flag in a chunk is parsed once. Valid rows go into an
+index-free temporary staging table with one executemany and then into labor_actuals with
+one INSERT ... SELECT, which updates the labor_actuals indexes in a single statement
+instead of row by row from Python. Every chunk is its own transaction: the rows and the
+matching labor rollup deltas commit together, so a failed chunk leaves no partial rollup
+behind and earlier chunks stay committed.
+
+Columns: project_id, employee_id, date (ISO date or datetime), hours, payroll_code
+(optional), is_billable (optional, defaults to true).
+
+Usage: python timesheet_import.py <file.csv|file.ndjson> [chunk_size]
+"""
+import sys
+import datetime
+from typing import Dict, List, Tuple
+from sqlalchemy import select, insert, delete, func, Table, MetaData, Column
+import models
+import labor_rollup
+import data_versions
+from bulk_import import RowError, parse_bool, parse_date, parse_text, parse_column
+import bulk_import
+from database import bulk_insert_columns
+
+labor_table = models.LaborActual.__table__
+project_table = models.Project.__table__
+
+COLUMNS = ("project_id", "employee_id", "date", "hours", "payroll_code", "is_billable")
+MAX_HOURS_PER_ENTRY = 24.0
+# Larger than bulk_import's default: every commit rewrites the index pages the chunk
+# touched, so fewer, bigger chunks load payroll exports markedly faster
+CHUNK_SIZE = 50000
+
+staging_table = Table(
+    "labor_import_staging", MetaData(),
+    *(Column(name, labor_table.c[name].type) for name in COLUMNS),
+    prefixes=["TEMPORARY"]
+)
+
+def _project_id(value, project_ids) -> int:
+    try:
+        project_id = int(value)
+    except (TypeError, ValueError):
+        raise RowError(f"project_id: expected an integer, got '{value}'")
+    if project_id not in project_ids:
+        raise RowError(f"project_id: unknown project {project_id}")
+    return project_id
+
+def _hours(value) -> float:
+    try:
+        hours = float(value)
+    except (TypeError, ValueError):
+        raise RowError(f"hours: expected a number, got '{value}'")
+    if not 0 < hours <= MAX_HOURS_PER_ENTRY:
+        raise RowError(f"hours: must be between 0 and {MAX_HOURS_PER_ENTRY:g}, got {hours:g}")
+    return hours
+
+def validate_columns(values: Dict[str, List], project_ids) -> Tuple[List[List], Dict[int, str]]:
+    """
+    Validates a chunk of raw rows held column-wise ({column: values}). Returns the
+    labor_actuals values of the valid rows as one list per column, in COLUMNS order, and
+    {row index: error} for the others; a row failing several checks reports the first.
+    """
+    checks = (
+        ("project_id", lambda value: _project_id(value, project_ids)),
+        ("employee_id", lambda value: parse_text("employee_id", value)),
+        ("hours", _hours),
+        ("date", lambda value: parse_date("date", value)),
+        ("payroll_code", lambda value: parse_text("payroll_code", value, required=False)),
+        ("is_billable", lambda value: parse_bool("is_billable", value)),
+    )
+    parsed, errors = {}, {}
+    for name, parse in checks:
+        parsed[name], failed = parse_column(values[name], parse)
+        for i, message in failed.items():
+            errors.setdefault(i, message)
+    columns = [parsed[name] for name in COLUMNS]
+    if errors:
+        keep = [i for i in range(len(columns[0])) if i not in errors]
+        columns = [[column[i] for i in keep] for column in columns]
+    return columns, errors
+
+def _rollup_deltas(connection) -> Dict:
+    """Rollup deltas of the staged rows, summed by the database."""
+    day = func.date(staging_table.c.date)
+    rows = connection.execute(
+        select(staging_table.c.project_id, staging_table.c.is_billable, day,
+               func.sum(staging_table.c.hours), func.count())
+        .group_by(staging_table.c.project_id, staging_table.c.is_billable, day)
+    )
+    return {
+        # SQLite returns date() as text
+        (project_id, is_billable, datetime.date.fromisoformat(day) if isinstance(day, str) else day): (hours, count)
+        for project_id, is_billable, day, hours, count in rows
+    }
+
+def _insert_chunk(engine, columns) -> int:
+    with engine.begin() as connection:
+        staging_table.create(connection, checkfirst=True)
+        connection.execute(delete(staging_table))
+        bulk_insert_columns(connection, staging_table, COLUMNS, columns)
+        connection.execute(
+            insert(labor_table).from_select(COLUMNS, select(*(staging_table.c[name] for name in COLUMNS)))
+        )
+        labor_rollup.apply_deltas(connection, _rollup_deltas(connection))
+        data_versions.bump(connection, [labor_table.name])
+    return len(columns[0])
+
+def import_timesheets(engine, stream, fmt: str = "csv", chunk_size: int = CHUNK_SIZE) -> Dict:
+    """
+    Imports timesheet rows from a text stream. Returns the bulk_import report
+    (rows read, inserted, rejected, and per-row errors as {line, error}).
+    """
+    with engine.connect() as connection:
+        project_ids = set(connection.execute(select(project_table.c.id)).scalars())
+
+    return bulk_import.run_column_import(
+        stream,
+        fmt,
+        COLUMNS,
+        lambda values: validate_columns(values, project_ids),
+        lambda columns, report: _insert_chunk(engine, columns),
+        chunk_size
+    )
+
+def import_file(engine, binary_stream, fmt: str = "csv", chunk_size: int = CHUNK_SIZE) -> Dict:
+    """Decodes a binary stream (e.g. an upload) as UTF-8 and imports it."""
+    with bulk_import.decoded(binary_stream) as text:
+        return import_timesheets(engine, text, fmt, chunk_size)
+
+if __name__ == "__main__":
+    from database import engine
+    import migrate
+
+    if len(sys.argv) < 2:
+        print("Usage: python timesheet_import.py <file.csv|file.ndjson> [chunk_size]")
+        sys.exit(1)
+
+    path = sys.argv[1]
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else CHUNK_SIZE
+    migrate.upgrade()
+    with open(path, "rb") as f:
+        result = import_file(engine, f, bulk_import.detect_format(path), chunk_size)
+    bulk_import.print_report(result)
+    sys.exit(1 if result["rejected"] else 0)
@@ -40,7 +40,8 @@ const AppContent: React.FC = () => {
     }
 
     try {
-      let url = `${API_BASE_URL}/agent/insights?view=${activeTab}`;
+      // Streaming endpoint: tokens are rendered as they arrive (Server-Sent Events)
+      let url = `${API_BASE_URL}/agent/insights/stream?view=${activeTab}`;
 
       if (activeTab === 'finance') {
         url += `&project_filter=${selectedProject}`;
@@ -57,13 +58,46 @@ const AppContent: React.FC = () => {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(body)
       });
-      const data = await res.json();
+      if (!res.ok || !res.body) {
+        throw new Error(`Insight stream failed with status ${res.status}`);
+      }
 
       if (query) {
-        setChatHistory(prev => [...prev, { role: 'ai', content: data.insight }]);
         setUserQuery('');
-      } else {
-        setInsight(data.insight);
+      }
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let text = '';
+      let started = false;
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // SSE events are separated by a blank line; keep the trailing partial event in the buffer
+        const events = buffer.split('\n\n');
+        buffer = events.pop() || '';
+        for (const evt of events) {
+          const dataLine = evt.split('\n').find(line => line.startsWith('data: '));
+          if (!dataLine) continue;
+          const payload = JSON.parse(dataLine.slice(6));
+          if (!payload.token) continue;
+
+          text += payload.token;
+          const content = text;
+          const isFirst = !started;
+          if (query) {
+            setChatHistory(prev => isFirst
+              ? [...prev, { role: 'ai', content }]
+              : [...prev.slice(0, -1), { role: 'ai', content }]);
+          } else {
+            setInsight(content);
+          }
+          started = true;
+        }
       }
     } catch (err) {
       console.error('Error fetching insights:', err);
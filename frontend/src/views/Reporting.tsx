@@ -9,6 +9,7 @@ import { API_BASE_URL } from '../api';
 
 interface ProjectEvent {
     id: number;
+    project_id?: number;
     title: string;
     date: string;
     event_type: string;
@@ -18,9 +19,12 @@ interface ProjectEvent {
 
 interface ProjectMedia {
     id: number;
+    project_id?: number;
     filename: string;
     file_type: string;
     url: string;
+    thumbnail_url?: string;
+    preview_url?: string;
 }
 
 interface Project {
@@ -37,13 +41,61 @@ interface Project {
     estimated_completion_date?: string;
     events: ProjectEvent[];
     media: ProjectMedia[];
+    event_count?: number;
+    media_count?: number;
 }
 
+// Changes since a sync token (/reporting/projects?since=)
+interface ReportingDelta {
+    token: number;
+    reset: boolean;
+    projects: Project[];
+    events: ProjectEvent[];
+    media: ProjectMedia[];
+    deleted_projects: number[];
+    deleted_events: number[];
+    deleted_media: number[];
+}
+
+// Server-relative media URLs are served by the backend, outside /api
+const mediaUrl = (url: string) => url.startsWith('/') ? `${API_BASE_URL.replace('/api', '')}${url}` : url;
+
+// Replaces changed items in place, drops deleted ones and adds new ones (first or last)
+const mergeById = <T extends { id: number }>(items: T[], changed: T[], deleted: number[], prependNew: boolean): T[] => {
+    const byId: Record<number, T> = {};
+    changed.forEach(item => { byId[item.id] = item; });
+    const known = new Set(items.map(item => item.id));
+    const added = changed.filter(item => !known.has(item.id));
+    const kept = items.filter(item => !deleted.includes(item.id)).map(item => byId[item.id] ?? item);
+    return prependNew ? [...added, ...kept] : [...kept, ...added];
+};
+
+const applyDelta = (projects: Project[], delta: ReportingDelta): Project[] => {
+    // Changed projects arrive without their events and media; keep the ones already loaded.
+    // Their counts are current (a project changes whenever an event or media row is added,
+    // deleted or moved), which the loaded children cannot tell when only the newest are loaded
+    const previous: Record<number, Project> = {};
+    projects.forEach(p => { previous[p.id] = p; });
+    const changed = delta.projects.map(p => ({
+        ...p,
+        events: previous[p.id]?.events ?? [],
+        media: previous[p.id]?.media ?? [],
+        event_count: p.event_count ?? previous[p.id]?.event_count ?? 0,
+        media_count: p.media_count ?? previous[p.id]?.media_count ?? 0
+    }));
+    return mergeById(projects, changed, delta.deleted_projects, false).map(p => ({
+        ...p,
+        events: mergeById(p.events, delta.events.filter(e => e.project_id === p.id), delta.deleted_events, true),
+        media: mergeById(p.media, delta.media.filter(m => m.project_id === p.id), delta.deleted_media, true)
+    }));
+};
+
 const Reporting: React.FC = () => {
     const [projects, setProjects] = useState<Project[]>([]);
     const [selectedProject, setSelectedProject] = useState<Project | null>(null);
     const [activeModalTab, setActiveModalTab] = useState<'general' | 'timeline' | 'history' | 'media'>('general');
     const [isLoading, setIsLoading] = useState(true);
+    const syncToken = useRef<string | null>(null);
 
     // Form States
     const [isAddingEvent, setIsAddingEvent] = useState(false);
@@ -80,8 +132,18 @@ const Reporting: React.FC = () => {
     const fetchProjects = useCallback(async () => {
         setIsLoading(true);
         try {
-            const res = await fetch(`${API_BASE_URL}/reporting/projects`);
-            const data = await res.json();
+            // Pages are chained through the X-Next-Cursor header; each project carries its most recent events and media
+            const data: Project[] = [];
+            let cursor: string | null = null;
+            let token: string | null = null;
+            do {
+                const res = await fetch(`${API_BASE_URL}/reporting/projects${cursor ? `?cursor=${cursor}` : ''}`);
+                data.push(...await res.json());
+                // The first page's token covers every later page
+                token = token ?? res.headers.get('X-Sync-Token');
+                cursor = res.headers.get('X-Next-Cursor');
+            } while (cursor);
+            syncToken.current = token;
             setProjects(data);
             if (selectedProject) {
                 const updated = data.find((p: Project) => p.id === selectedProject.id);
@@ -94,6 +156,21 @@ const Reporting: React.FC = () => {
         }
     }, [selectedProject]);
 
+    // After a write, fetch only what changed since the last load
+    const syncProjects = useCallback(async () => {
+        if (!syncToken.current) return fetchProjects();
+        try {
+            const res = await fetch(`${API_BASE_URL}/reporting/projects?since=${syncToken.current}`);
+            const delta: ReportingDelta = await res.json();
+            if (delta.reset) return fetchProjects();
+            syncToken.current = String(delta.token);
+            setProjects(prev => applyDelta(prev, delta));
+            setSelectedProject(prev => prev ? (applyDelta([prev], { ...delta, projects: delta.projects.filter(p => p.id === prev.id) })[0] ?? null) : prev);
+        } catch (err) {
+            console.error('Error syncing projects:', err);
+        }
+    }, [fetchProjects]);
+
     useEffect(() => {
         fetchProjects();
     }, []);
@@ -118,7 +195,7 @@ const Reporting: React.FC = () => {
             });
 
             if (res.ok) {
-                await fetchProjects();
+                await syncProjects();
                 setIsAddingEvent(false);
                 setEditingEventId(null);
                 setEventForm({
@@ -149,7 +226,7 @@ const Reporting: React.FC = () => {
             });
 
             if (res.ok) {
-                await fetchProjects();
+                await syncProjects();
                 setIsAddingMedia(false);
                 setSelectedFile(null);
             }
@@ -181,7 +258,7 @@ const Reporting: React.FC = () => {
             });
 
             if (res.ok) {
-                await fetchProjects();
+                await syncProjects();
                 setIsCreatingProject(false);
                 setProjectForm({
                     name: '',
@@ -677,12 +754,13 @@ const Reporting: React.FC = () => {
                                             {selectedProject.media.filter(m => m.file_type === 'image').map(img => (
                                                 <div
                                                     key={img.id}
-                                                    onClick={() => setSelectedImage(img.url.startsWith('/') ? `${API_BASE_URL.replace('/api', '')}${img.url}` : img.url)}
+                                                    onClick={() => setSelectedImage(mediaUrl(img.preview_url || img.url))}
                                                     className="relative group overflow-hidden rounded-xl border border-white/10 aspect-video bg-white/5 cursor-pointer"
                                                 >
                                                     <img
-                                                        src={img.url.startsWith('/') ? `${API_BASE_URL.replace('/api', '')}${img.url}` : img.url}
+                                                        src={mediaUrl(img.thumbnail_url || img.url)}
                                                         alt={img.filename}
+                                                        loading="lazy"
                                                         className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-700"
                                                     />
                                                     <div className="absolute inset-0 bg-gradient-to-t from-black/80 via-transparent to-transparent opacity-0 group-hover:opacity-100 transition-opacity flex items-end p-4">
@@ -702,7 +780,7 @@ const Reporting: React.FC = () => {
                                             {selectedProject.media.filter(m => m.file_type === 'document').map(doc => (
                                                 <a
                                                     key={doc.id}
-                                                    href={doc.url.startsWith('/') ? `${API_BASE_URL.replace('/api', '')}${doc.url}` : doc.url}
+                                                    href={mediaUrl(doc.url)}
                                                     target="_blank"
                                                     rel="noopener noreferrer"
                                                     className="flex items-center justify-between p-4 bg-white/5 rounded-xl border border-white/5 hover:border-primary-500/50 hover:bg-primary-500/5 transition-all group"